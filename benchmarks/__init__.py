@@ -0,0 +1 @@
+"""Benchmarks for dsl_agent (see run.py for the microbenchmark runner)."""
@@ -0,0 +1,206 @@
+"""Microbenchmark cases.
+
+Each case is a factory registered with `@case(name)`: it does its setup once
+and returns a zero-argument callable that performs one operation. The
+runner (run.py) times that callable.
+
+Sub-microsecond cases swing by tens of percent between runs even after
+calibration (allocator and cache state dominate), so they can register a
+looser `threshold`; the runner uses the larger of it and the global one.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.LLM_integration import LLMIntentService, StubIntentService
+from dsl_agent.parser import DSLParser, ScenarioBuilder, parse_script
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CASES: Dict[str, Callable[[], Callable[[], Any]]] = {}
+# 用例自带的放宽阈值（name -> 允许的变慢比例）
+THRESHOLDS: Dict[str, float] = {}
+
+_loop = None
+_tmpdir = None
+
+
+def case(
+    name: str, threshold: Optional[float] = None
+) -> Callable[[Callable[[], Callable[[], Any]]], Callable[[], Callable[[], Any]]]:
+    def register(factory: Callable[[], Callable[[], Any]]) -> Callable[[], Callable[[], Any]]:
+        CASES[name] = factory
+        if threshold is not None:
+            THRESHOLDS[name] = threshold
+        return factory
+
+    return register
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    # 所有异步用例共用一个事件循环，避免把创建循环的开销计入每次操作
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        atexit.register(_loop.close)
+    return _loop
+
+
+def _scratch(name: str, text: str) -> str:
+    global _tmpdir
+    if _tmpdir is None:
+        _tmpdir = tempfile.mkdtemp(prefix="dsl-bench-")
+        atexit.register(shutil.rmtree, _tmpdir, True)
+    path = Path(_tmpdir) / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def _catalog(states: int) -> str:
+    lines = []
+    for i in range(states):
+        lines.append(f"price_{i} = {i} * 2 + 1")
+        lines.append(f'response item{i}.ask->item{i}: "商品 {i} 价格 {{price_{i}}}"')
+        lines.append(f'response item{i}.buy->item{(i + 1) % states}: "已下单 " + user_input')
+    return "\n".join(lines) + "\n"
+
+
+TURN_SCRIPT = """
+visits = 0
+response start.hello->start: "您好"
+visits = visits + 1
+if visits > 3 {
+    tier = "vip"
+} else {
+    tier = "normal"
+}
+response start.balance->start: "您的余额为 10000 CNY（{tier}，第 {visits} 次）"
+"""
+
+
+# -- 解析 --
+@case("parser.parse_small")
+def parse_small():
+    text = (ROOT / "scenario" / "banking_scenario.dsl").read_text(encoding="utf-8") + TURN_SCRIPT
+    parser = DSLParser()
+    return lambda: parser.parse(text)
+
+
+@case("parser.parse_long_expression")
+def parse_long_expression():
+    text = "x = " + " + ".join(f"a{i}" for i in range(200)) + "\n"
+    parser = DSLParser()
+    return lambda: parser.parse(text)
+
+
+@case("parser.parse_nested_parens")
+def parse_nested_parens():
+    text = "x = " + "(" * 60 + "1 + y" + ")" * 60 + "\n"
+    parser = DSLParser()
+    return lambda: parser.parse(text)
+
+
+@case("parser.parse_nested_blocks")
+def parse_nested_blocks():
+    depth = 30
+    lines = [f"if x > {i} {{" for i in range(depth)] + ["y = 1"] + ["}"] * depth
+    text = "\n".join(lines) + "\n"
+    parser = DSLParser()
+    return lambda: parser.parse(text)
+
+
+@case("parser.parse_quoted_strings")
+def parse_quoted_strings():
+    text = "".join(f'response s{i}.a: "say \\"hi\\" + (not an op) \\"{i}\\""\n' for i in range(100))
+    parser = DSLParser()
+    return lambda: parser.parse(text)
+
+
+@case("parser.parse_script")
+def parse_script_small():
+    path = str(ROOT / "scenario" / "banking_scenario.dsl")
+    return lambda: parse_script(path)
+
+
+@case("parser.parse_script_catalog")
+def parse_script_catalog():
+    path = _scratch("catalog.dsl", _catalog(500))
+    return lambda: parse_script(path)
+
+
+# -- 解释执行 --
+def _turn_bot() -> Interpreter:
+    builder = ScenarioBuilder("bench")
+    for node in DSLParser().parse(TURN_SCRIPT):
+        builder.add(node)
+    service = StubIntentService({"start": {"你好": "hello", "余额": "balance"}})
+    return Interpreter(builder.build(), service)
+
+
+@case("interpreter.turn_plain")
+def turn_plain():
+    bot = _turn_bot()
+    loop = _event_loop()
+    return lambda: loop.run_until_complete(bot.process_input_async("你好"))
+
+
+@case("interpreter.turn_actions")
+def turn_actions():
+    bot = _turn_bot()
+    loop = _event_loop()
+    # 先走一次 hello 转换以初始化会话变量 visits
+    loop.run_until_complete(bot.process_input_async("你好"))
+    return lambda: loop.run_until_complete(bot.process_input_async("查询余额"))
+
+
+# -- LLM 意图服务（不发请求） --
+def _llm_service() -> LLMIntentService:
+    return LLMIntentService(
+        api_base="http://localhost:1",
+        api_key="bench",
+        model="bench",
+        intent_descriptions={"balance": "查询余额", "transfer": "转账", "loss": "挂失银行卡"},
+    )
+
+
+@case("llm.build_prompt", threshold=1.0)
+def build_prompt():
+    service = _llm_service()
+    intents = ["balance", "transfer", "loss"]
+    return lambda: service._build_prompt("start", intents, '我想查一下"工资卡"的余额')
+
+
+@case("llm.normalize_result", threshold=1.0)
+def normalize_result():
+    service = _llm_service()
+    intents = service._intent_set(["balance", "transfer", "loss"])
+    return lambda: service._normalize_result("  Balance.\n", intents)
+
+
+# -- AST 求值 --
+_EXPRESSION = '(a + b) * 2 > 10 and name == "vip" or len(items) > 3'
+
+
+def _expression_context() -> Dict[str, Any]:
+    return {"a": 3, "b": 4, "name": "vip", "items": [1, 2, 3, 4], "variables": {}, "functions": {}}
+
+
+@case("ast.execute")
+def ast_execute():
+    node = DSLParser()._parse_expression('(a + b) * 2 > 10 and name == "vip"')
+    context = _expression_context()
+    return lambda: node.execute(context)
+
+
+@case("ast.execute_async")
+def ast_execute_async():
+    node = DSLParser()._parse_expression(_EXPRESSION)
+    context = _expression_context()
+    loop = _event_loop()
+    return lambda: loop.run_until_complete(node.execute_async(context))
@@ -0,0 +1,335 @@
+"""Local OpenAI-compatible stand-in server for offline load and latency tests.
+
+`FakeLLMServer` serves `POST /v1/chat/completions` (also `/chat/completions`)
+over real HTTP from a background thread, so `LLMIntentService` with the
+OpenAI SDK (`api_base=server.base_url`) and `AliyunShim`
+(`api_base=server.url`) run their full request path with no network.
+
+- answers: a script (consumed in order), then regex rules on the last user
+  (or system) message, then `default_reply`;
+- `stream: true` is answered with server-sent events (`chat.completion.chunk`
+  deltas, then `data: [DONE]`), optionally paced per chunk;
+- latency: a sampler per request, e.g. `lognormal(0.2, 0.5)`;
+- failures: `error_rate` injects random 429/5xx, `fail_next()` queues
+  deterministic ones; 429 carries `Retry-After`;
+- every response carries an approximate `usage` block.
+
+CLI::
+
+    python -m benchmarks.fake_server --port 8000 --rules rules.json \\
+        --latency lognormal:0.2:0.5 --error-rate 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Union
+
+Messages = List[Dict[str, Any]]
+Latency = Callable[[random.Random], float]
+
+_ERROR_TYPES = {429: "rate_limit_error", 500: "server_error", 502: "bad_gateway", 503: "service_unavailable"}
+# 粗略的 token 切分：单个汉字、单词或标点各算一个
+_TOKEN = re.compile(r"[\u4e00-\u9fff]|\w+|[^\s\w]")
+
+
+@dataclass
+class Rule:
+    """最后一条 role 消息匹配 pattern（正则，search）时返回 reply；reply 可为函数(messages) -> str。"""
+
+    pattern: str
+    reply: Union[str, Callable[[Messages], str]]
+    role: str = "user"
+    _regex: Any = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._regex = re.compile(self.pattern, re.S)
+
+    def match(self, messages: Messages) -> Optional[str]:
+        content = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == self.role), None)
+        if content is None or not self._regex.search(content):
+            return None
+        return self.reply(messages) if callable(self.reply) else self.reply
+
+
+# -- 延迟分布（单位：秒） --
+def fixed(seconds: float) -> Latency:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Latency:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float) -> Latency:
+    """长尾延迟：中位数为 median。"""
+    import math
+
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def parse_latency(spec: str) -> Latency:
+    """"fixed:0.2" / "uniform:0.05:0.3" / "lognormal:0.2:0.5" """
+    kind, *args = spec.split(":")
+    factories = {"fixed": fixed, "uniform": uniform, "lognormal": lognormal}
+    if kind not in factories:
+        raise ValueError(f"unknown latency distribution {kind!r}")
+    return factories[kind](*(float(a) for a in args))
+
+
+def count_tokens(text: str) -> int:
+    return len(_TOKEN.findall(text or ""))
+
+
+class FakeLLMServer:
+    def __init__(
+        self,
+        rules: Optional[Iterable[Rule]] = None,
+        default_reply: str = "none",
+        script: Optional[Sequence[str]] = None,
+        latency: Optional[Latency] = None,
+        chunk_delay: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: Sequence[int] = (429, 500, 503),
+        seed: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        model: str = "fake-model",
+    ) -> None:
+        self.rules = list(rules or ())
+        self.default_reply = default_reply
+        self.script: Deque[str] = deque(script or ())
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.model = model
+        self.stats: Dict[str, int] = {"requests": 0, "streamed": 0, "errors": 0}
+        # 最近收到的请求体，便于断言
+        self.requests: Deque[Dict[str, Any]] = deque(maxlen=1000)
+        self._failures: Deque[int] = deque()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    # -- 生命周期 --
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        """OpenAI SDK 的 base_url（含 /v1）。"""
+        return f"{self.url}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-llm-server", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # -- 行为 --
+    def fail_next(self, status: int = 429, count: int = 1) -> None:
+        """接下来的 count 个请求返回 status。"""
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def reply_for(self, messages: Messages) -> str:
+        with self._lock:
+            if self.script:
+                return self.script.popleft()
+        for rule in self.rules:
+            reply = rule.match(messages)
+            if reply is not None:
+                return reply
+        return self.default_reply
+
+    def _next_failure(self) -> Optional[int]:
+        with self._lock:
+            if self._failures:
+                return self._failures.popleft()
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self._rng.choice(self.error_statuses)
+            return None
+
+    def _sample_latency(self) -> float:
+        if self.latency is None:
+            return 0.0
+        with self._lock:
+            return max(0.0, self.latency(self._rng))
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: FakeLLMServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _Server
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - 基类签名
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") in ("/v1/models", "/models"):
+            fake = self.server.fake
+            self._send_json(200, {"object": "list", "data": [{"id": fake.model, "object": "model", "owned_by": "fake"}]})
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}", "type": "not_found"}})
+
+    def do_POST(self) -> None:
+        if self.path.split("?")[0].rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}", "type": "not_found"}})
+            return
+        fake = self.server.fake
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            messages = payload["messages"]
+        except (ValueError, KeyError, TypeError) as exc:
+            self._send_json(400, {"error": {"message": f"invalid request: {exc}", "type": "invalid_request_error"}})
+            return
+        fake._count("requests")
+        fake.requests.append(payload)
+
+        delay = fake._sample_latency()
+        if delay:
+            time.sleep(delay)
+        status = fake._next_failure()
+        if status is not None:
+            fake._count("errors")
+            fake._count(str(status))
+            headers = {"Retry-After": "0"} if status == 429 else {}
+            error = {"message": f"injected {status}", "type": _ERROR_TYPES.get(status, "server_error"), "code": status}
+            self._send_json(status, {"error": error}, headers)
+            return
+
+        reply = fake.reply_for(messages)
+        prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": count_tokens(reply),
+            "total_tokens": prompt_tokens + count_tokens(reply),
+        }
+        model = payload.get("model") or fake.model
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "created": int(time.time()), "model": model}
+        if payload.get("stream"):
+            fake._count("streamed")
+            include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+            self._stream(base, reply, usage if include_usage else None, fake.chunk_delay)
+            return
+        body = dict(base, object="chat.completion")
+        body["choices"] = [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}]
+        body["usage"] = usage
+        self._send_json(200, body)
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, base: Dict[str, Any], reply: str, usage: Optional[Dict[str, int]], chunk_delay: float) -> None:
+        # SSE 响应长度未知：发送完毕后关闭连接
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def event(choices: List[Dict[str, Any]], **extra: Any) -> None:
+            chunk = dict(base, object="chat.completion.chunk", choices=choices, **extra)
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for piece in re.findall(r"\s*\S+", reply) or [reply]:
+            if chunk_delay:
+                time.sleep(chunk_delay)
+            event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if usage is not None:
+            event([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def load_rules(path: str) -> List[Rule]:
+    """规则文件：[{"pattern": "...", "reply": "...", "role": "user"}, ...]"""
+    with open(path, encoding="utf-8") as f:
+        return [Rule(item["pattern"], item["reply"], item.get("role", "user")) for item in json.load(f)]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible fake chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--rules", help="JSON file with [{pattern, reply, role?}] rules")
+    parser.add_argument("--default-reply", default="none", help="Reply when no rule matches")
+    parser.add_argument("--latency", help="Latency distribution in seconds: fixed:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/5xx")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--model", default="fake-model")
+    args = parser.parse_args(argv)
+    server = FakeLLMServer(
+        rules=load_rules(args.rules) if args.rules else None,
+        default_reply=args.default_reply,
+        latency=parse_latency(args.latency) if args.latency else None,
+        chunk_delay=args.chunk_delay,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+        model=args.model,
+    )
+    server.start()
+    print(f"fake LLM server listening on {server.base_url} (Ctrl-C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
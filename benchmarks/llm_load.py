@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Offline end-to-end load test of the LLM intent path.
+
+Starts a local `FakeLLMServer` (or uses --base-url) and drives concurrent
+`LLMIntentService.identify` calls through the real OpenAI client over HTTP,
+then reports throughput, latency percentiles and the server's counters.
+
+Usage:
+  python benchmarks/llm_load.py --requests 500 --concurrency 32 --latency lognormal:0.2:0.5
+  python benchmarks/llm_load.py --error-rate 0.05 --max-retries 2
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.fake_server import FakeLLMServer, Rule, parse_latency  # noqa: E402
+from dsl_agent.LLM_integration import LLMIntentService  # noqa: E402
+
+INTENTS = ["balance", "transfer", "loss"]
+TEXTS = ["我想查余额", "帮我转账给张三", "银行卡丢了要挂失", "今天天气怎么样"]
+RULES = [Rule("余额", "balance"), Rule("转账", "transfer"), Rule("挂失", "loss")]
+
+
+async def _drive(svc: LLMIntentService, total: int, concurrency: int):
+    latencies = []
+    results = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            intent = await svc.identify(TEXTS[i % len(TEXTS)], "start", INTENTS)
+            latencies.append(time.perf_counter() - started)
+            results[intent] = results.get(intent, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - started, latencies, results
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test LLMIntentService against a local fake server")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", default="lognormal:0.05:0.5", help="Fake server latency distribution (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-retries", type=int, default=1, help="LLMIntentService retries per call")
+    parser.add_argument("--base-url", help="Use an already running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from openai import OpenAI
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = FakeLLMServer(
+            rules=RULES, latency=parse_latency(args.latency), error_rate=args.error_rate, seed=args.seed
+        ).start()
+        base_url = server.base_url
+    try:
+        client = OpenAI(api_key="load-test", base_url=base_url, max_retries=0)
+        svc = LLMIntentService(api_base=base_url, api_key="load-test", model="fake-model", client=client, max_retries=args.max_retries)
+        elapsed, latencies, results = asyncio.run(_drive(svc, args.requests, args.concurrency))
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}: {elapsed:.2f} s, {args.requests / elapsed:.1f} req/s")
+    print(
+        f"latency ms: p50 {statistics.median(latencies) * 1000:.1f}  p90 {_percentile(latencies, 0.9) * 1000:.1f}  "
+        f"p99 {_percentile(latencies, 0.99) * 1000:.1f}  max {max(latencies) * 1000:.1f}"
+    )
+    print(f"intents: {json.dumps(results, ensure_ascii=False)}")
+    if server is not None:
+        print(f"server: {json.dumps(server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
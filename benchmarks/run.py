@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Microbenchmark runner with checked-in baselines.
+
+Times every case in cases.py and compares it with benchmarks/baseline.json.
+The run fails (exit code 1) when a case is slower than its baseline by more
+than the threshold (default from the baseline file, else 0.5 = 50%; a
+case registered with a looser threshold of its own uses that instead);
+cases over the threshold are re-measured (`--retries`) before failing.
+
+To make baselines portable across machines, a fixed pure-Python
+calibration loop is timed right before each case, and the case is recorded
+as a score relative to it (`ns / calibration_ns`). Scores, not raw
+timings, are compared, which also absorbs CPU frequency drift during a run.
+
+Usage:
+  python -m benchmarks.run                      # compare with the baseline
+  python -m benchmarks.run --filter parser      # only cases containing "parser"
+  python -m benchmarks.run --threshold 0.5
+  python -m benchmarks.run --update             # rewrite the baseline
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    # 允许直接运行 python benchmarks/run.py
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.cases import CASES, THRESHOLDS  # noqa: E402
+
+BASELINE = Path(__file__).with_name("baseline.json")
+DEFAULT_THRESHOLD = 0.5
+
+
+def _calibration() -> int:
+    total = 0
+    for i in range(1000):
+        total += i * i
+    return total
+
+
+def measure(op: Callable[[], Any], min_time: float = 0.1, repeat: int = 5) -> float:
+    """返回每次操作的最短耗时（纳秒）：先自动确定循环次数，再取多轮中的最小值。"""
+    timer = timeit.Timer(op)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+    return min(timer.repeat(repeat, number)) / number * 1e9
+
+
+def run_cases(names: List[str], min_time: float = 0.1, repeat: int = 5) -> Dict[str, Tuple[float, float]]:
+    """返回 name -> (每次操作耗时 ns, 紧邻其前测得的校准循环耗时 ns)。"""
+    results = {}
+    for name in names:
+        op = CASES[name]()
+        calibration = measure(_calibration, min_time / 2, repeat)
+        results[name] = (measure(op, min_time, repeat), calibration)
+    return results
+
+
+def compare(
+    results: Dict[str, Tuple[float, float]],
+    baseline: Dict[str, Any],
+    threshold: float,
+    thresholds: Optional[Dict[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """按归一化得分与基线比较，返回每个用例的结果行；thresholds 中的用例阈值只会放宽全局阈值。"""
+    base_cases = baseline.get("benchmarks", {})
+    thresholds = thresholds or {}
+    rows = []
+    for name, (ns, calibration) in results.items():
+        row: Dict[str, Any] = {"name": name, "ns": ns, "baseline_ns": None, "ratio": None, "status": "new"}
+        base = base_cases.get(name)
+        if base:
+            ratio = (ns / calibration) / base["score"]
+            row.update(baseline_ns=base["ns"], ratio=ratio)
+            allowed = max(threshold, thresholds.get(name, threshold))
+            row["status"] = "REGRESSED" if ratio > 1 + allowed else ("improved" if ratio < 1 - threshold else "ok")
+        rows.append(row)
+    return rows
+
+
+def _format_ns(ns: Optional[float]) -> str:
+    if ns is None:
+        return "-"
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} us"
+    return f"{ns:.0f} ns"
+
+
+def load_baseline(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run dsl_agent microbenchmarks and compare with the checked-in baseline")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this string")
+    parser.add_argument("--baseline", default=str(BASELINE), help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=None, help="Allowed slowdown ratio (default: from baseline, else 0.5)")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per timing round")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per case (minimum is kept)")
+    parser.add_argument("--retries", type=int, default=2, help="Re-measure regressed cases this many times before failing")
+    parser.add_argument("--update", action="store_true", help="Write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    names = [name for name in CASES if args.filter in name]
+    if not names:
+        print(f"no benchmark matches {args.filter!r}", file=sys.stderr)
+        return 2
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    threshold = args.threshold if args.threshold is not None else baseline.get("threshold", DEFAULT_THRESHOLD)
+
+    results = run_cases(names, args.min_time, args.repeat)
+
+    if args.update:
+        # 基线取多轮中最好的一次，避免把抖动写进基线
+        for _ in range(args.retries):
+            for name, again in run_cases(names, args.min_time, args.repeat).items():
+                results[name] = min(results[name], again, key=lambda r: r[0] / r[1])
+        merged = dict(baseline.get("benchmarks", {})) if args.filter else {}
+        for name, (ns, calibration) in results.items():
+            merged[name] = {"ns": round(ns, 1), "score": round(ns / calibration, 6)}
+        data = {
+            "threshold": threshold,
+            "python": platform.python_version(),
+            "benchmarks": dict(sorted(merged.items())),
+        }
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {baseline_path} ({len(results)} cases)")
+        return 0
+
+    rows = compare(results, baseline, threshold, THRESHOLDS)
+    for _ in range(args.retries):
+        # 共享机器上的瞬时抖动：只对疑似退化的用例重测，保留最好的一次
+        suspects = [row["name"] for row in rows if row["status"] == "REGRESSED"]
+        if not suspects:
+            break
+        for name, again in run_cases(suspects, args.min_time, args.repeat).items():
+            results[name] = min(results[name], again, key=lambda r: r[0] / r[1])
+        rows = compare(results, baseline, threshold, THRESHOLDS)
+    print(f"threshold {threshold:.0%} (baseline recorded on Python {baseline.get('python', '?')})")
+    for row in rows:
+        ratio = f"{row['ratio']:.2f}x" if row["ratio"] is not None else "-"
+        print(f"  {row['name']:<32} {_format_ns(row['ns']):>10}  base {_format_ns(row['baseline_ns']):>10}  {ratio:>6}  {row['status']}")
+    regressed = [row["name"] for row in rows if row["status"] == "REGRESSED"]
+    if regressed:
+        print(f"performance regression: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
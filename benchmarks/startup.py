@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Startup benchmark for the CLI.
+
+Measures two things in fresh interpreters:
+  * import cost of a module (parsed from `python -X importtime`), with the
+    slowest imports listed, so a heavy dependency pulled in at import time
+    shows up immediately;
+  * time-to-prompt of `main.py` (process start until the "ready" banner is
+    printed) with the stub intent service.
+
+Both medians are checked against a cold-start budget (`--max-import-ms`,
+`--max-prompt-ms`; the defaults leave several times today's cost as
+headroom for slow CI machines). The run exits with status 1 when a budget
+is exceeded or an LLM SDK is imported at startup, so it can gate CI like
+benchmarks/run.py.
+
+Usage:
+  python benchmarks/startup.py
+  python benchmarks/startup.py --module dsl_agent.parser --runs 10 --top 15
+  python benchmarks/startup.py --max-import-ms 200 --max-prompt-ms 500
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# 冷启动预算（毫秒）：目前约 110 ms 导入、150 ms 到提示符
+DEFAULT_MAX_IMPORT_MS = 300.0
+DEFAULT_MAX_PROMPT_MS = 1000.0
+HEAVY_MODULES = {"openai", "requests", "httpx"}
+
+
+def import_profile(module: str):
+    """返回 (总耗时 us, [(累计耗时 us, 模块名), ...])。"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative), name.strip()))
+    total = next((us for us, name in entries if name == module), 0)
+    return total, entries
+
+
+def time_to_prompt(script: str) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-u", "main.py", script, "--use-stub", "--log-file", os.path.join(tmp, "bench.log")],
+            cwd=ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        try:
+            for line in proc.stdout:
+                if "ready." in line:
+                    break
+            elapsed = time.perf_counter() - started
+            proc.communicate("exit\n", timeout=10)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+        return elapsed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure import cost and CLI time-to-prompt against a budget")
+    parser.add_argument("--module", default="dsl_agent.logic", help="Module whose import cost is measured")
+    parser.add_argument("--script", default="scenario/banking_scenario.dsl", help="DSL script used for time-to-prompt")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    parser.add_argument("--max-import-ms", type=float, default=DEFAULT_MAX_IMPORT_MS, help="Budget for the median import time (<=0 disables)")
+    parser.add_argument("--max-prompt-ms", type=float, default=DEFAULT_MAX_PROMPT_MS, help="Budget for the median time-to-prompt (<=0 disables)")
+    args = parser.parse_args(argv)
+    failures = []
+
+    totals = []
+    entries = []
+    for _ in range(args.runs):
+        total, entries = import_profile(args.module)
+        totals.append(total)
+    import_ms = statistics.median(totals) / 1000
+    print(f"import {args.module}: median {import_ms:.1f} ms, min {min(totals) / 1000:.1f} ms")
+    if 0 < args.max_import_ms < import_ms:
+        failures.append(f"import {args.module} {import_ms:.1f} ms > budget {args.max_import_ms:.0f} ms")
+    print("slowest imports (cumulative, last run):")
+    for us, name in sorted(entries, reverse=True)[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    heavy = sorted({name.split(".")[0] for _, name in entries} & HEAVY_MODULES)
+    if heavy:
+        failures.append(f"heavy SDK modules imported at startup: {', '.join(heavy)}")
+
+    prompts = [time_to_prompt(args.script) for _ in range(args.runs)]
+    prompt_ms = statistics.median(prompts) * 1000
+    print(f"time-to-prompt ({args.script}): median {prompt_ms:.1f} ms, min {min(prompts) * 1000:.1f} ms")
+    if 0 < args.max_prompt_ms < prompt_ms:
+        failures.append(f"time-to-prompt {prompt_ms:.1f} ms > budget {args.max_prompt_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"startup regression: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
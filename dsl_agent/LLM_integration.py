@@ -1,15 +1,53 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import json
 import logging
 import re
-from typing import Dict, List, Optional, Protocol
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Protocol, Tuple
 import time
 
-from openai import OpenAI
+from .admission import AdmissionController, LoadShedError
+from .cache import GenerationCache
+from .circuit_breaker import OPEN, CircuitBreaker
+from . import deadline
+from .hedging import HedgePolicy
+
+if TYPE_CHECKING:
+    # openai SDK 导入耗时较长，只在首次真正需要默认客户端时加载
+    from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
+# 固定的 system 消息：放在请求最前面，保证各次请求共享稳定前缀，便于服务端 prompt 缓存命中
+_INTENT_SYSTEM_PROMPT = (
+    "You are an intent classifier. "
+    "Pick exactly one label from the allowed list. "
+    "If unsure, answer 'none'. "
+    "Do not add punctuation or explanation."
+)
+_GENERATE_SYSTEM_PROMPT = "You are a helpful assistant. Respond concisely and only with the requested output."
+_STRUCTURED_SYSTEM_PROMPT = (
+    "You are an intent classifier and entity extractor. "
+    "Reply with a single JSON object only, without markdown or explanation."
+)
+# 从 '{' 处解码一个完整的 JSON 对象，后面的文字（代码块结尾、补充说明）被忽略
+_JSON_DECODER = json.JSONDecoder()
+# 预渲染 intent_detection_prompt 时 {user_input} 的占位标记
+_USER_INPUT_MARK = "\x00user_input\x00"
+
+
+@dataclass
+class IntentResult:
+    """结构化意图识别结果：意图（None 表示未知）、置信度与抽取出的实体。"""
+
+    intent: Optional[str]
+    confidence: Optional[float] = None
+    entities: Dict[str, Any] = field(default_factory=dict)
+
 
 class IntentService(Protocol):
     async def identify(self, text: str, state: str, intents: List[str]) -> Optional[str]:
@@ -72,6 +110,16 @@ class LLMIntentService:
         max_retries: int = 1,
         intent_descriptions: Optional[Dict[str, str]] = None,
         client: Optional[OpenAI] = None,
+        generation_cache: Optional[GenerationCache] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        hedge_client: Optional[OpenAI] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        fallback_service: Optional[IntentService] = None,
+        admission: Optional[AdmissionController] = None,
+        structured: bool = False,
+        structured_prompt: Optional[str] = None,
+        structured_max_tokens: int = 256,
+        min_confidence: float = 0.0,
     ) -> None:
         self.api_base = api_base
         self.api_key = api_key
@@ -81,58 +129,249 @@ class LLMIntentService:
         self.temperature = temperature
         self.max_retries = max_retries
         self.intent_descriptions = intent_descriptions or {}
-        self.client = client or OpenAI(api_key=api_key, base_url=api_base)
+        self._client = client
+        self._client_lock = threading.Lock()
+        # 可选：确定性生成结果缓存（仅 temperature == 0 时生效）
+        self.generation_cache = generation_cache
+        # 可选：对冲请求策略；hedge_client 为对冲请求使用的备用端点（默认同一客户端）
+        self.hedge_policy = hedge_policy
+        self.hedge_client = hedge_client
+        # 可选：熔断器；熔断打开或调用失败时改用本地 fallback_service（如 StubIntentService）分类
+        self.circuit_breaker = circuit_breaker
+        self.fallback_service = fallback_service
+        # 可选：出站调用的限流/准入控制；排队超时的请求被丢弃并按“无意图”处理
+        self.admission = admission
+        # 可选：结构化模式，一次调用返回意图、置信度与实体（见 identify_structured）；
+        # structured_prompt 为含 {user_input}/{available_intents}/{state} 占位符的模板，
+        # 置信度低于 min_confidence 的意图按“无意图”处理
+        self.structured = structured
+        self.structured_prompt = structured_prompt
+        self.structured_max_tokens = structured_max_tokens
+        self.min_confidence = min_confidence
+        # 按 (state, intents) 预计算的提示前缀与小写意图集合；intent_descriptions 在构造后视为只读
+        self._prompt_prefixes: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        self._structured_prefixes: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        # structured_prompt 按 (state, intents) 预渲染并在 {user_input} 处切开；空元组表示模板无效
+        self._structured_templates: Dict[Tuple[str, Tuple[str, ...]], Tuple[str, ...]] = {}
+        self._intent_sets: Dict[Tuple[str, ...], FrozenSet[str]] = {}
+
+    @property
+    def client(self) -> Any:
+        # 未注入客户端时才在首次调用 LLM 时导入并构造 OpenAI 客户端；
+        # 首次调用可能来自多个工作线程（对冲、并发求值），加锁保证只构造一个
+        client = self._client
+        if client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.api_base)
+                client = self._client
+        return client
+
+    @client.setter
+    def client(self, value: Any) -> None:
+        self._client = value
+
+    def for_scenario(
+        self,
+        intent_descriptions: Optional[Dict[str, str]] = None,
+        fallback_service: Optional[IntentService] = None,
+    ) -> "LLMIntentService":
+        """为另一个场景创建服务实例：共享客户端（连接池）、缓存、对冲、熔断与准入控制，
+        仅意图描述与本地降级映射按场景区分。"""
+        return LLMIntentService(
+            api_base=self.api_base,
+            api_key=self.api_key,
+            model=self.model,
+            timeout=self.timeout,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            max_retries=self.max_retries,
+            intent_descriptions=intent_descriptions,
+            client=self.client,
+            generation_cache=self.generation_cache,
+            hedge_policy=self.hedge_policy,
+            hedge_client=self.hedge_client,
+            circuit_breaker=self.circuit_breaker,
+            fallback_service=fallback_service,
+            admission=self.admission,
+            structured=self.structured,
+            structured_prompt=self.structured_prompt,
+            structured_max_tokens=self.structured_max_tokens,
+            min_confidence=self.min_confidence,
+        )
 
     async def identify(self, text: str, state: str, intents: List[str]) -> Optional[str]:
+        if self.circuit_breaker is not None and self.circuit_breaker.state == OPEN:
+            # 快速失败：不占用线程、不等待超时
+            return await self._identify_fallback(text, state, intents)
         sanitized = text.strip()[:200]
         prompt = self._build_prompt(state, intents, sanitized)
-        content = await asyncio.to_thread(self._call_llm, prompt)
-        if content is None:
+        try:
+            content = await self._classify(prompt, self._call_llm)
+        except LoadShedError as exc:
+            # 丢弃负载：返回 None，由解释器走当前状态的默认转换
+            logger.warning("Intent call shed: %s", exc)
             return None
+        if content is None:
+            return await self._identify_fallback(text, state, intents)
         # 统一使用小写意图进行匹配
-        norm_intents = [i.lower() for i in intents]
-        return self._normalize_result(content, norm_intents)
+        return self._normalize_result(content, self._intent_set(intents))
+
+    async def identify_structured(self, text: str, state: str, intents: List[str]) -> IntentResult:
+        """一次调用同时返回意图、置信度与实体（JSON 输出）。
 
-    def _call_llm(self, prompt: str) -> Optional[str]:
+        与 identify 共用熔断、准入与对冲；模型未按 JSON 回复时退化为按标签解析，
+        降级路径只有意图、没有实体。
+        """
+        if self.circuit_breaker is not None and self.circuit_breaker.state == OPEN:
+            return IntentResult(await self._identify_fallback(text, state, intents))
+        prompt = self._build_structured_prompt(state, intents, text.strip()[:200])
+        try:
+            content = await self._classify(prompt, self._call_llm_structured)
+        except LoadShedError as exc:
+            logger.warning("Intent call shed: %s", exc)
+            return IntentResult(None)
+        if content is None:
+            return IntentResult(await self._identify_fallback(text, state, intents))
+        return self._parse_structured(content, self._intent_set(intents))
+
+    async def _classify(self, prompt: str, call: Callable[..., Optional[str]]) -> Optional[str]:
+        async with self._admitted():
+            if self.hedge_policy is not None:
+                return await self._call_llm_hedged(prompt, self.hedge_policy, call)
+            return await asyncio.to_thread(call, prompt)
+
+    def _admitted(self):
+        if self.admission is None:
+            return contextlib.nullcontext()
+        return self.admission.admit()
+
+    async def _identify_fallback(self, text: str, state: str, intents: List[str]) -> Optional[str]:
+        if self.fallback_service is None:
+            return None
+        try:
+            return await self.fallback_service.identify(text, state, intents)
+        except Exception:
+            logger.exception("Fallback intent service failed")
+            return None
+
+    async def _call_llm_hedged(
+        self, prompt: str, policy: HedgePolicy, call: Optional[Callable[..., Optional[str]]] = None
+    ) -> Optional[str]:
+        """主请求超过对冲阈值仍未返回时发出第二个相同请求，先返回可用结果者胜出。
+
+        被取消的请求所在线程无法强制中断，但其结果会被丢弃。
+        """
+        call = call or self._call_llm
+        loop = asyncio.get_running_loop()
+        policy.record_request()
+        started = loop.time()
+        primary = asyncio.ensure_future(asyncio.to_thread(call, prompt))
+        done, _ = await asyncio.wait({primary}, timeout=policy.delay())
+        if done or not policy.try_acquire():
+            content = await primary
+            policy.record_latency(loop.time() - started)
+            return content
+
+        hedge_started = loop.time()
+        hedge = asyncio.ensure_future(asyncio.to_thread(call, prompt, self.hedge_client))
+        pending = {primary, hedge}
+        content: Optional[str] = None
+        try:
+            while pending and content is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result is None:
+                        continue
+                    content = result
+                    if task is hedge:
+                        policy.record_hedge_won()
+                        policy.record_latency(loop.time() - hedge_started)
+                    else:
+                        policy.record_latency(loop.time() - started)
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+        if content is not None:
+            logger.debug("hedged intent call finished: %s", policy.metrics())
+        return content
+
+    def _call_llm(self, prompt: str, client: Optional[OpenAI] = None) -> Optional[str]:
+        return self._chat_completion(
+            _INTENT_SYSTEM_PROMPT, prompt, self.max_tokens, self.temperature, "intent", client
+        )
+
+    def _call_llm_structured(self, prompt: str, client: Optional[OpenAI] = None) -> Optional[str]:
+        return self._chat_completion(
+            _STRUCTURED_SYSTEM_PROMPT, prompt, self.structured_max_tokens, self.temperature, "intent", client
+        )
+
+    def _chat_completion(
+        self,
+        system_prompt: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        label: str,
+        client: Optional[OpenAI] = None,
+    ) -> Optional[str]:
+        """带重试的单次 chat completion；失败返回 None。熔断打开时不再重试。"""
+        client = client or self.client
+        breaker = self.circuit_breaker
         last_exc: Optional[Exception] = None
         for attempt in range(self.max_retries):
+            if deadline.expired():
+                # 本轮已放弃：不再消耗线程与配额
+                logger.info("LLM %s call skipped: turn deadline exceeded", label)
+                break
+            if breaker is not None and not breaker.allow_request():
+                logger.info("LLM %s call rejected by open circuit breaker", label)
+                break
+            started = time.monotonic()
             try:
-                completion = self.client.chat.completions.create(
+                completion = client.chat.completions.create(
                     model=self.model,
                     messages=[
-                        {
-                            "role": "system",
-                            "content": (
-                                "You are an intent classifier. "
-                                "Pick exactly one label from the allowed list. "
-                                "If unsure, answer 'none'. "
-                                "Do not add punctuation or explanation."
-                            ),
-                        },
+                        {"role": "system", "content": system_prompt},
                         {"role": "user", "content": prompt},
                     ],
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    timeout=self.timeout,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=deadline.cap_timeout(self.timeout),
                 )
-                # 尝试多个常见返回字段以兼容不同 SDK
-                try:
-                    return completion.choices[0].message.content
-                except Exception:
-                    try:
-                        return completion.choices[0].text
-                    except Exception:
-                        return str(completion)
             except Exception as exc:  # pragma: no cover - network errors vary
                 last_exc = exc
-                logger.warning("LLM intent call failed (attempt %s): %s", attempt + 1, exc)
-                # 简单退避
-                time.sleep(0.5 * (2 ** attempt))
+                if breaker is not None:
+                    breaker.record_failure()
+                logger.warning("LLM %s call failed (attempt %s): %s", label, attempt + 1, exc)
+                if attempt + 1 < self.max_retries:
+                    # 简单退避（不超过剩余时间）
+                    time.sleep(deadline.cap_timeout(0.5 * (2 ** attempt)))
+                continue
+            if breaker is not None:
+                breaker.record_success(time.monotonic() - started)
+            # 尝试多个常见返回字段以兼容不同 SDK
+            try:
+                return completion.choices[0].message.content
+            except Exception:
+                try:
+                    return completion.choices[0].text
+                except Exception:
+                    return str(completion)
         if last_exc:
-            logger.error("LLM intent call failed after retries: %s", last_exc)
+            logger.error("LLM %s call failed after retries: %s", label, last_exc)
         return None
 
     def _build_prompt(self, state: str, intents: List[str], text: str) -> str:
+        # 前缀按 (state, intents) 缓存，用户文本最后拼接，保持稳定前缀
+        text_esc = text.replace('"', '\\"')
+        return f"{self._prompt_prefix(state, intents)}User said: \"{text_esc}\"."
+
+    def _describe_intents(self, intents: Iterable[str]) -> str:
         # 构造带描述的意图列表
         parts = []
         for intent in intents:
@@ -141,27 +380,103 @@ class LLMIntentService:
                 parts.append(f"{intent}: {desc}")
             else:
                 parts.append(intent)
-        intent_list = "; ".join(parts)
+        return "; ".join(parts)
+
+    def _prompt_prefix(self, state: str, intents: Iterable[str]) -> str:
+        key = (state, tuple(intents))
+        prefix = self._prompt_prefixes.get(key)
+        if prefix is None:
+            intent_list = self._describe_intents(key[1])
+            prefix = (
+                f"Current state: {state}. Allowed intents: [{intent_list}]. "
+                f"Respond with exactly one intent label from the allowed intents, "
+                f"or 'none' if you are not sure. "
+            )
+            self._prompt_prefixes[key] = prefix
+        return prefix
+
+    def _build_structured_prompt(self, state: str, intents: List[str], text: str) -> str:
+        key = (state, tuple(intents))
+        if self.structured_prompt:
+            parts = self._structured_templates.get(key)
+            if parts is None:
+                parts = self._structured_templates[key] = self._split_template(state, key[1])
+            if parts:
+                return text.join(parts)
+        prefix = self._structured_prefixes.get(key)
+        if prefix is None:
+            prefix = (
+                f"Current state: {state}. Allowed intents: [{self._describe_intents(intents)}]. "
+                'Return a JSON object {"intent": <one allowed intent or "none">, '
+                '"confidence": <number between 0 and 1>, '
+                '"entities": {<snake_case name>: <value>}} '
+                "with the details (names, amounts, dates, places, ids) the user gave. "
+            )
+            self._structured_prefixes[key] = prefix
         text_esc = text.replace('"', '\\"')
-        return (
-            f"Current state: {state}. Allowed intents: [{intent_list}]. "
-            f"User said: \"{text_esc}\". Respond with exactly one intent label from the allowed intents, "
-            f"or 'none' if you are not sure."
-        )
+        return f"{prefix}User said: \"{text_esc}\"."
+
+    def _split_template(self, state: str, intents: Tuple[str, ...]) -> Tuple[str, ...]:
+        """渲染除 {user_input} 外的占位符并在其位置切开，每轮只需拼接用户文本。"""
+        try:
+            rendered = self.structured_prompt.format(
+                user_input=_USER_INPUT_MARK, available_intents=self._describe_intents(intents), state=state
+            )
+        except (KeyError, IndexError, ValueError) as exc:
+            logger.warning("Invalid structured intent prompt template (%s); using the built-in prompt", exc)
+            return ()
+        return tuple(rendered.split(_USER_INPUT_MARK))
 
-    def _normalize_result(self, content: str, intents: List[str]) -> Optional[str]:
+    def _parse_structured(self, content: str, intents: FrozenSet[str]) -> IntentResult:
+        # 回复中的第一个 JSON 对象（兼容 ```json 代码块及前后的说明文字）
+        data: Any = None
+        start = content.find("{")
+        while start != -1:
+            try:
+                data, _ = _JSON_DECODER.raw_decode(content, start)
+                break
+            except ValueError:
+                start = content.find("{", start + 1)
+        if not isinstance(data, dict):
+            # 模型未按 JSON 回复：按普通标签解析
+            return IntentResult(self._normalize_result(content, intents))
+        raw_intent = data.get("intent")
+        intent = self._normalize_result(raw_intent, intents) if isinstance(raw_intent, str) else None
+        try:
+            confidence: Optional[float] = min(1.0, max(0.0, float(data["confidence"])))
+        except (KeyError, TypeError, ValueError):
+            confidence = None
+        if intent is not None and confidence is not None and confidence < self.min_confidence:
+            logger.info("Intent %s below confidence threshold (%.2f < %.2f)", intent, confidence, self.min_confidence)
+            intent = None
+        entities = data.get("entities")
+        if not isinstance(entities, dict):
+            entities = {}
+        return IntentResult(intent, confidence, entities)
+
+    def _intent_set(self, intents: Iterable[str]) -> FrozenSet[str]:
+        key = tuple(intents)
+        intent_set = self._intent_sets.get(key)
+        if intent_set is None:
+            intent_set = frozenset(i.lower() for i in key)
+            self._intent_sets[key] = intent_set
+        return intent_set
+
+    def _normalize_result(self, content: str, intents: Iterable[str]) -> Optional[str]:
         if content is None:
             return None
+        if not isinstance(intents, (frozenset, set)):
+            intents = frozenset(intents)
         normalized = content.strip().lower()
         if normalized == "none":
             return None
         if normalized in intents:
             return normalized
         # 只取第一个由字母数字下划线组成的 token
-        tokens = re.findall(r"[a-z0-9_]+", normalized)
-        if not tokens:
+        match = re.search(r"[a-z0-9_]+", normalized)
+        if not match:
             return None
-        first = tokens[0]
+        first = match.group(0)
         if first in intents:
             return first
         return None
@@ -171,39 +486,40 @@ class LLMIntentService:
 
         This method uses a more permissive system role suitable for general
         completions (not intent classification)."""
-        last_exc: Optional[Exception] = None
-        for attempt in range(self.max_retries):
-            try:
-                completion = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": (
-                                "You are a helpful assistant. Respond concisely and only with the requested output."
-                            ),
-                        },
-                        {"role": "user", "content": prompt},
-                    ],
-                    max_tokens=(max_tokens or self.max_tokens),
-                    temperature=(temperature if temperature is not None else self.temperature),
-                    timeout=self.timeout,
-                )
-                try:
-                    return completion.choices[0].message.content
-                except Exception:
-                    try:
-                        return completion.choices[0].text
-                    except Exception:
-                        return str(completion)
-            except Exception as exc:  # pragma: no cover - network errors vary
-                last_exc = exc
-                logger.warning("LLM generate call failed (attempt %s): %s", attempt + 1, exc)
-                time.sleep(0.5 * (2 ** attempt))
-        if last_exc:
-            logger.error("LLM generate call failed after retries: %s", last_exc)
-        return None
+        return self._chat_completion(
+            _GENERATE_SYSTEM_PROMPT,
+            prompt,
+            max_tokens or self.max_tokens,
+            temperature if temperature is not None else self.temperature,
+            "generate",
+        )
 
-    async def generate(self, prompt: str, max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> Optional[str]:
+    async def generate(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        use_cache: bool = True,
+    ) -> Optional[str]:
+        """生成文本；`use_cache=False` 可对单次调用绕过生成缓存。"""
         sanitized = prompt.strip()[:2000]
-        return await asyncio.to_thread(self._call_llm_generate, sanitized, max_tokens, temperature)
\ No newline at end of file
+        cache = self.generation_cache if use_cache else None
+        effective_temperature = temperature if temperature is not None else self.temperature
+        if cache is not None and cache.is_deterministic(effective_temperature):
+            key = cache.make_key(self.model, sanitized, max_tokens or self.max_tokens, effective_temperature)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            result = await self._generate_admitted(sanitized, max_tokens, temperature)
+            if result is not None:
+                cache.put(key, result)
+            return result
+        return await self._generate_admitted(sanitized, max_tokens, temperature)
+
+    async def _generate_admitted(self, prompt: str, max_tokens: Optional[int], temperature: Optional[float]) -> Optional[str]:
+        try:
+            async with self._admitted():
+                return await asyncio.to_thread(self._call_llm_generate, prompt, max_tokens, temperature)
+        except LoadShedError as exc:
+            logger.warning("Generate call shed: %s", exc)
+            return None
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""Admission control for outbound LLM calls.
+
+A token bucket enforces the configured request rate, a concurrency limit
+bounds the number of calls occupying worker threads, and a bounded
+priority queue orders waiting calls so interactive turns go before
+batch/replay traffic. When the expected queueing delay would exceed the
+caller's budget (including the remaining turn deadline) the call is shed
+with `LoadShedError`; `LLMIntentService` turns that into "no intent", so
+the interpreter answers with the state's default transition.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from . import deadline
+
+# 优先级：数值越小越优先
+INTERACTIVE = 0
+BATCH = 10
+
+current_priority: ContextVar[int] = ContextVar("dsl_request_priority", default=INTERACTIVE)
+
+
+class LoadShedError(RuntimeError):
+    """请求因排队过久或队列已满被丢弃。"""
+
+
+@contextlib.contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """在当前上下文中为出站 LLM 调用设置优先级。"""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, clock: Optional[Callable[[], float]] = None) -> None:
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock or time.monotonic
+        self._tokens = capacity
+        self._updated = self._clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def time_until_available(self, tokens: float = 1.0) -> float:
+        """再获得 `tokens` 个令牌需要等待的秒数。"""
+        self._refill()
+        missing = tokens - self._tokens
+        return max(0.0, missing / self.rate)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        bucket: Optional[TokenBucket] = None,
+        max_concurrency: int = 8,
+        max_queue: int = 64,
+        max_queue_delay: Optional[float] = None,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self.bucket = bucket
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_delay = max_queue_delay
+        self._clock = clock or time.monotonic
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.TimerHandle]] = None
+        # 调用占用时长的 EWMA，用于估算并发槽位的排队时间
+        self._service_time = 0.0
+        self.admitted = 0
+        self.shed = 0
+
+    @contextlib.asynccontextmanager
+    async def admit(self, priority: Optional[int] = None, max_wait: Optional[float] = None) -> AsyncIterator[None]:
+        await self.acquire(priority, max_wait)
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.release(self._clock() - started)
+
+    def estimate_wait(self, priority: int) -> float:
+        ahead = sum(1 for p, _, fut in self._waiters if p <= priority and not fut.done())
+        wait = 0.0
+        if self.bucket is not None:
+            wait = max(wait, self.bucket.time_until_available(ahead + 1))
+        if self._active + ahead >= self.max_concurrency:
+            rounds = (self._active + ahead - self.max_concurrency) // self.max_concurrency + 1
+            wait = max(wait, rounds * self._service_time)
+        return wait
+
+    async def acquire(self, priority: Optional[int] = None, max_wait: Optional[float] = None) -> None:
+        if priority is None:
+            priority = current_priority.get()
+        budget = self._budget(max_wait)
+        if not self._waiters and self._active < self.max_concurrency and (self.bucket is None or self.bucket.try_acquire()):
+            self._active += 1
+            self.admitted += 1
+            return
+        if budget is not None and self.estimate_wait(priority) > budget:
+            self._shed("expected queueing delay exceeds budget")
+        self._prune()
+        if len(self._waiters) >= self.max_queue:
+            worst = max(self._waiters)
+            if worst[0] <= priority:
+                self._shed("admission queue full")
+            # 队列已满时让位给更高优先级请求
+            self._waiters.remove(worst)
+            heapq.heapify(self._waiters)
+            self.shed += 1
+            worst[2].set_exception(LoadShedError("preempted by higher-priority request"))
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._dispatch()
+        try:
+            done, _ = await asyncio.wait({fut}, timeout=budget)
+        except asyncio.CancelledError:
+            self._abandon(fut)
+            raise
+        if not done:
+            self._abandon(fut)
+            self._shed("queueing delay exceeded budget")
+        fut.result()  # raises LoadShedError when preempted
+        self.admitted += 1
+
+    def release(self, held_for: Optional[float] = None) -> None:
+        self._active = max(0, self._active - 1)
+        if held_for is not None:
+            self._service_time = held_for if not self._service_time else self._service_time + 0.2 * (held_for - self._service_time)
+        self._dispatch()
+
+    def _budget(self, max_wait: Optional[float]) -> Optional[float]:
+        # 排队时间不得超过本轮对话的剩余时间
+        limits = [w for w in (max_wait, self.max_queue_delay, deadline.remaining()) if w is not None]
+        return min(limits) if limits else None
+
+    def _shed(self, reason: str) -> None:
+        self.shed += 1
+        raise LoadShedError(reason)
+
+    def _abandon(self, fut: asyncio.Future) -> None:
+        if fut.done() and not fut.cancelled() and fut.exception() is None:
+            # 槽位已分配但调用方放弃，归还
+            self.release()
+        else:
+            fut.cancel()
+        self._prune()
+
+    def _prune(self) -> None:
+        if any(f.done() for _, _, f in self._waiters):
+            self._waiters = [w for w in self._waiters if not w[2].done()]
+            heapq.heapify(self._waiters)
+
+    def _dispatch(self) -> None:
+        while self._waiters and self._active < self.max_concurrency:
+            fut = self._waiters[0][2]
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.bucket is not None and not self.bucket.try_acquire():
+                self._schedule(self.bucket.time_until_available())
+                return
+            heapq.heappop(self._waiters)
+            self._active += 1
+            fut.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer[0] is loop and not self._timer[1].cancelled():
+            return
+        self._timer = (loop, loop.call_later(delay, self._on_timer))
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
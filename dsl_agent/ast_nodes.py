@@ -1,12 +1,43 @@
 # ast_nodes.py
 from abc import ABC, abstractmethod
-from typing import Any, List, Dict, Optional, Union
+from typing import Any, List, Dict, Optional, Tuple, Union
 from dataclasses import dataclass
+import asyncio
+import inspect
 import json
 
+from .tracing import io_wait, traced
+
+# 无副作用、可安全并发执行的内置函数（I/O 型或纯计算）
+_PURE_BUILTINS = frozenset({"intent", "llm_generate", "len", "json_parse"})
+# 需要等待外部服务的内置函数
+_IO_BUILTINS = frozenset({"intent", "llm_generate"})
+
+
+def _accepts_keyword(func: Any, name: str) -> bool:
+    """func 是否接受关键字参数 name（含 **kwargs）；无法取得签名时视为不接受。"""
+    try:
+        params = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+    if name in params:
+        return params[name].kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+    return any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values())
+
+
 class ASTNode(ABC):
     """抽象语法树节点基类"""
-    
+
+    # 源码行号（由解析器设置，用于追踪与报错）
+    line: Optional[int] = None
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # 每个节点类的 execute_async 只包装一次；未采样时仅多一次 contextvar 读取
+        impl = cls.__dict__.get("execute_async")
+        if impl is not None and not getattr(impl, "_traced", False):
+            cls.execute_async = traced(impl)
+
     @abstractmethod
     def execute(self, context: Dict[str, Any]) -> Any:
         pass
@@ -20,6 +51,48 @@ class ASTNode(ABC):
     def __repr__(self) -> str:
         pass
 
+    def children(self) -> List["ASTNode"]:
+        """直接子节点（用于静态分析）"""
+        return []
+
+    def has_side_effects(self) -> bool:
+        """子树是否会修改上下文或触发外部可见行为（赋值、响应回调、用户函数等）"""
+        return any(child.has_side_effects() for child in self.children())
+
+    def performs_io(self) -> bool:
+        """子树是否包含需要等待外部服务的调用（intent/llm_generate）"""
+        return any(child.performs_io() for child in self.children())
+
+
+async def evaluate_all(nodes: List[ASTNode], context: Dict[str, Any]) -> List[Any]:
+    """按顺序语义求值一组兄弟节点。
+
+    当至少两个兄弟节点需要等待 I/O 且全部无副作用时，使用 asyncio.gather
+    并发调度，使多个 LLM 调用的耗时为 max(latency) 而非 sum(latency)；
+    否则保持从左到右的顺序求值。
+    """
+    if len(nodes) > 1:
+        profiles = [_eval_profile(n) for n in nodes]
+        if not any(side for side, _ in profiles) and sum(1 for _, io in profiles if io) > 1:
+            tasks = [asyncio.ensure_future(n.execute_async(context)) for n in nodes]
+            try:
+                return list(await asyncio.gather(*tasks))
+            except BaseException:
+                # 任一分支失败时取消其余分支，避免遗留的 LLM 调用继续占用配额
+                for task in tasks:
+                    task.cancel()
+                raise
+    return [await n.execute_async(context) for n in nodes]
+
+
+def _eval_profile(node: ASTNode) -> Tuple[bool, bool]:
+    # AST 在解析后不再变化，分析结果缓存在节点实例上
+    profile = node.__dict__.get("_eval_profile")
+    if profile is None:
+        profile = (node.has_side_effects(), node.performs_io())
+        node.__dict__["_eval_profile"] = profile
+    return profile
+
 @dataclass
 class NumberNode(ASTNode):
     value: float
@@ -95,9 +168,11 @@ class BinaryOpNode(ASTNode):
     def __repr__(self) -> str:
         return f"({self.left} {self.op} {self.right})"
 
+    def children(self) -> List[ASTNode]:
+        return [self.left, self.right]
+
     async def execute_async(self, context: Dict[str, Any]) -> Any:
-        left_val = await self.left.execute_async(context)
-        right_val = await self.right.execute_async(context)
+        left_val, right_val = await evaluate_all([self.left, self.right], context)
         ops = {
             '+': lambda a, b: a + b,
             '-': lambda a, b: a - b,
@@ -129,6 +204,12 @@ class AssignmentNode(ASTNode):
     def __repr__(self) -> str:
         return f"{self.var_name} = {self.value_expr}"
 
+    def children(self) -> List[ASTNode]:
+        return [self.value_expr]
+
+    def has_side_effects(self) -> bool:
+        return True
+
     async def execute_async(self, context: Dict[str, Any]) -> Any:
         value = await self.value_expr.execute_async(context)
         context[self.var_name] = value
@@ -164,6 +245,12 @@ class IfNode(ASTNode):
             result += "}"
         return result
 
+    def children(self) -> List[ASTNode]:
+        return [self.condition, *self.then_block, *(self.else_block or [])]
+
+    def has_side_effects(self) -> bool:
+        return True
+
     async def execute_async(self, context: Dict[str, Any]) -> Any:
         cond_result = await self.condition.execute_async(context)
         if bool(cond_result):
@@ -174,6 +261,35 @@ class IfNode(ASTNode):
                 await stmt.execute_async(context)
         return None
 
+@dataclass
+class WhileNode(ASTNode):
+    condition: ASTNode
+    body: List[ASTNode]
+
+    def execute(self, context: Dict[str, Any]) -> Any:
+        while bool(self.condition.execute(context)):
+            for stmt in self.body:
+                stmt.execute(context)
+        return None
+
+    def __repr__(self) -> str:
+        result = f"while {self.condition} {{\n"
+        for stmt in self.body:
+            result += f"  {stmt};\n"
+        return result + "}"
+
+    def children(self) -> List[ASTNode]:
+        return [self.condition, *self.body]
+
+    def has_side_effects(self) -> bool:
+        return True
+
+    async def execute_async(self, context: Dict[str, Any]) -> Any:
+        while bool(await self.condition.execute_async(context)):
+            for stmt in self.body:
+                await stmt.execute_async(context)
+        return None
+
 @dataclass
 class ResponseNode(ASTNode):
     """响应节点 - 核心客服功能"""
@@ -185,8 +301,8 @@ class ResponseNode(ASTNode):
         content_value = self.content.execute(context)
         
         # 触发响应回调
-        if "response_callback" in context:
-            callback = context["response_callback"]
+        callback = context.get("response_callback")
+        if callback is not None:
             callback(self.response_type, content_value, self.metadata)
         
         # 存储到上下文
@@ -201,10 +317,16 @@ class ResponseNode(ASTNode):
     def __repr__(self) -> str:
         return f"response {self.response_type}: {self.content}"
 
+    def children(self) -> List[ASTNode]:
+        return [self.content]
+
+    def has_side_effects(self) -> bool:
+        return True
+
     async def execute_async(self, context: Dict[str, Any]) -> Any:
         content_value = await self.content.execute_async(context)
-        if "response_callback" in context:
-            callback = context["response_callback"]
+        callback = context.get("response_callback")
+        if callback is not None:
             callback(self.response_type, content_value, self.metadata)
         context["last_response"] = {
             "type": self.response_type,
@@ -248,10 +370,24 @@ class FunctionCallNode(ASTNode):
         args_str = ", ".join(str(arg) for arg in self.args)
         return f"{self.func_name}({args_str})"
 
+    def children(self) -> List[ASTNode]:
+        return list(self.args)
+
+    def has_side_effects(self) -> bool:
+        # print 与用户注册函数可能有副作用，保守处理
+        if self.func_name not in _PURE_BUILTINS:
+            return True
+        return super().has_side_effects()
+
+    def performs_io(self) -> bool:
+        if self.func_name in _IO_BUILTINS:
+            return True
+        return super().performs_io()
+
     async def execute_async(self, context: Dict[str, Any]) -> Any:
         import asyncio as _asyncio
 
-        arg_values = [await arg.execute_async(context) for arg in self.args]
+        arg_values = await evaluate_all(self.args, context)
         # Async-capable builtins
         async def _intent_async(args_list):
             user_input = args_list[0] if args_list else ""
@@ -269,7 +405,8 @@ class FunctionCallNode(ASTNode):
                     # Use default state and intents if provided in context
                     state_name = context.get("state_name")
                     intents = context.get("state_intents", [])
-                    return await ident(user_input, state_name, intents)
+                    with io_wait():
+                        return await ident(user_input, state_name, intents)
                 else:
                     # sync identify
                     return ident(user_input, context.get("state_name"), context.get("state_intents", []))
@@ -290,10 +427,14 @@ class FunctionCallNode(ASTNode):
             if gen is None:
                 # fallback to None
                 return ""
-            if _asyncio.iscoroutinefunction(gen):
-                return await gen(prompt)
-            # if it's sync, call it in thread
-            return await _asyncio.to_thread(gen, prompt)
+            # optional second argument: use_cache (false bypasses the generation cache);
+            # only passed to implementations that accept it
+            kwargs = {"use_cache": bool(args_list[1])} if len(args_list) > 1 and _accepts_keyword(gen, "use_cache") else {}
+            with io_wait():
+                if _asyncio.iscoroutinefunction(gen):
+                    return await gen(prompt, **kwargs)
+                # if it's sync, call it in thread
+                return await _asyncio.to_thread(gen, prompt, **kwargs)
 
         async def _json_parse(args_list):
             import json as _json
@@ -0,0 +1,97 @@
+"""Response cache for deterministic LLM generations.
+
+`llm_generate` with temperature 0 returns effectively identical text for an
+identical prompt, so repeated prompts can be answered from memory. The cache
+is bounded by the total number of cached bytes (prompt + completion), not by
+entry count, and entries expire after a TTL.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+# 每个条目的估算固定开销（key 元组、OrderedDict 节点等）
+_ENTRY_OVERHEAD = 64
+
+CacheKey = Tuple[str, str, Optional[int], float]
+
+
+class GenerationCache:
+    """LRU + TTL cache keyed by (model, prompt, max_tokens, temperature)."""
+
+    def __init__(
+        self,
+        max_bytes: int = 4 * 1024 * 1024,
+        ttl: Optional[float] = 300.0,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._clock = clock or time.monotonic
+        # key -> (value, size, expires_at)
+        self._entries: "OrderedDict[Hashable, Tuple[str, int, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def is_deterministic(temperature: Optional[float]) -> bool:
+        """只有确定性参数（temperature == 0）才允许命中缓存。"""
+        return temperature is not None and float(temperature) == 0.0
+
+    @staticmethod
+    def make_key(model: str, prompt: str, max_tokens: Optional[int], temperature: float) -> CacheKey:
+        return (model, prompt, max_tokens, float(temperature))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                self._remove(key, size)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: CacheKey, value: str) -> None:
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            # 单个条目超过上限时不缓存
+            return
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                evicted_key, (_, evicted_size, _) = next(iter(self._entries.items()))
+                self._remove(evicted_key, evicted_size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: Hashable, size: int) -> None:
+        del self._entries[key]
+        self.current_bytes -= size
+
+    @staticmethod
+    def _entry_size(key: CacheKey, value: str) -> int:
+        model, prompt = key[0], key[1]
+        return len(model.encode("utf-8")) + len(prompt.encode("utf-8")) + len(value.encode("utf-8")) + _ENTRY_OVERHEAD
@@ -0,0 +1,110 @@
+"""Circuit breaker for outbound LLM calls.
+
+closed    -> calls pass through; consecutive failures (errors or calls slower
+             than `slow_call_threshold`) are counted.
+open      -> calls are rejected immediately for `open_duration` seconds so
+             callers can degrade to a local fallback instead of waiting for
+             timeouts and retries.
+half_open -> a limited number of probe calls are let through; enough
+             successes close the breaker, any failure re-opens it.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        slow_call_threshold: Optional[float] = None,
+        open_duration: float = 30.0,
+        half_open_max_calls: int = 1,
+        success_threshold: int = 1,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self.success_threshold = success_threshold
+        self._clock = clock or time.monotonic
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._successes = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """是否允许发出请求；open 状态下直接拒绝（快速失败）。"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        if latency is not None and self.slow_call_threshold is not None and latency > self.slow_call_threshold:
+            self.record_failure()
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                self._successes += 1
+                if self._successes >= self.success_threshold:
+                    logger.info("Circuit breaker closed after successful probe")
+                    self._reset(CLOSED)
+            else:
+                self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            if self._state == OPEN:
+                return
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open()
+
+    def metrics(self) -> Dict[str, object]:
+        return {"state": self.state, "rejected": self.rejected, "times_opened": self.times_opened}
+
+    def _open(self) -> None:
+        self._reset(OPEN)
+        self._opened_at = self._clock()
+        self.times_opened += 1
+        logger.warning("Circuit breaker opened; failing fast for %.1fs", self.open_duration)
+
+    def _reset(self, state: str) -> None:
+        self._state = state
+        self._failures = 0
+        self._successes = 0
+        self._probes = 0
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_duration:
+            self._reset(HALF_OPEN)
@@ -0,0 +1,439 @@
+"""Flat, memory-mappable compiled scenarios.
+
+`compile_scenario` turns a parsed `Scenario` into one binary blob (little
+endian)::
+
+    header       b"DSLC" u16 version u16 reserved
+                 u32 name u32 initial_state
+                 u32 n_strings u32 n_states u32 n_transitions
+                 u32 strings_off u32 states_off u32 transitions_off u32 code_off
+                 20s source_sha1 (all zero when unknown)
+    strings      u32 offset[n_strings + 1], UTF-8 blob (interned, deduplicated)
+    states       n_states x (u32 name, u32 first, u32 count, u32 default), sorted by name
+    transitions  n x (u32 intent, u32 next_state, u8 kind, 3x pad, u32 response, u32 actions)
+    code         serialized expression trees (prefix order, see _Encoder); every
+                 node is u8 opcode, u32 source line (NONE when unknown), operands
+
+`CompiledScenario` maps such a file read-only. Worker processes mapping the
+same file share its pages through the OS page cache; a state is looked up by
+binary search over the sorted state array and decoded into `State` /
+`Transition` / AST objects only when a conversation first enters it.
+`compile_cached` keeps compiled files next to the scripts (in
+`__dslcache__/`) and recompiles when the script's content hash no longer
+matches the one recorded in the header (mtimes are not trusted: `cp -p`,
+`rsync -a` or `tar x` can install new content with an older mtime).
+"""
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .ast_nodes import (
+    AssignmentNode,
+    ASTNode,
+    BinaryOpNode,
+    BoolNode,
+    FunctionCallNode,
+    IfNode,
+    NumberNode,
+    ResponseNode,
+    StringNode,
+    VariableNode,
+    WhileNode,
+)
+from .parser import Scenario, State, Transition, parse_script
+
+MAGIC = b"DSLC"
+VERSION = 5
+NONE = 0xFFFFFFFF
+CACHE_DIR = "__dslcache__"
+
+_HEADER = struct.Struct("<4sHH9I20s")
+_NO_DIGEST = bytes(20)
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+_STATE = struct.Struct("<4I")
+_TRANSITION = struct.Struct("<IIB3xII")
+
+# 响应类型
+_TEXT = 0
+_CODE = 1
+
+# 表达式操作码
+_OP_NUMBER = 1
+_OP_STRING = 2
+_OP_BOOL = 3
+_OP_VAR = 4
+_OP_BINARY = 5
+_OP_ASSIGN = 6
+_OP_IF = 7
+_OP_RESPONSE = 8
+_OP_CALL = 9
+_OP_WHILE = 10
+
+
+class CompileError(ValueError):
+    pass
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self._index: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        idx = self._index.get(value)
+        if idx is None:
+            idx = self._index[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+    def encode(self) -> bytes:
+        blobs = [v.encode("utf-8") for v in self.values]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        return struct.pack(f"<{len(offsets)}I", *offsets) + b"".join(blobs)
+
+
+class _Encoder:
+    def __init__(self, strings: _StringTable) -> None:
+        self.strings = strings
+        self.code = bytearray()
+        # 同一个 AST 对象（如默认转换复用的响应）只序列化一次
+        self._emitted: Dict[Any, int] = {}
+
+    def emit(self, node: ASTNode) -> int:
+        offset = self._emitted.get(id(node))
+        if offset is None:
+            offset = self._emitted[id(node)] = len(self.code)
+            self._node(node)
+        return offset
+
+    def emit_block(self, nodes: List[ASTNode]) -> int:
+        if not nodes:
+            return NONE
+        key = tuple(id(n) for n in nodes)
+        offset = self._emitted.get(key)
+        if offset is None:
+            offset = self._emitted[key] = len(self.code)
+            self._block(nodes)
+        return offset
+
+    def _u32(self, value: int) -> None:
+        self.code += _U32.pack(value)
+
+    def _block(self, nodes: Optional[List[ASTNode]]) -> None:
+        if nodes is None:
+            self._u32(NONE)
+            return
+        self._u32(len(nodes))
+        for child in nodes:
+            self._node(child)
+
+    def _op(self, op: int, node: ASTNode) -> None:
+        # 操作码后紧跟源码行号，追踪与报错信息在编译场景中保持一致
+        self.code.append(op)
+        self._u32(NONE if node.line is None else node.line)
+
+    def _node(self, node: ASTNode) -> None:
+        code = self.code
+        if isinstance(node, NumberNode):
+            self._op(_OP_NUMBER, node)
+            code += _F64.pack(node.value)
+        elif isinstance(node, StringNode):
+            self._op(_OP_STRING, node)
+            self._u32(self.strings.add(node.value))
+        elif isinstance(node, BoolNode):
+            self._op(_OP_BOOL, node)
+            code.append(1 if node.value else 0)
+        elif isinstance(node, VariableNode):
+            self._op(_OP_VAR, node)
+            self._u32(self.strings.add(node.name))
+        elif isinstance(node, BinaryOpNode):
+            self._op(_OP_BINARY, node)
+            self._u32(self.strings.add(node.op))
+            self._node(node.left)
+            self._node(node.right)
+        elif isinstance(node, AssignmentNode):
+            self._op(_OP_ASSIGN, node)
+            self._u32(self.strings.add(node.var_name))
+            self._node(node.value_expr)
+        elif isinstance(node, IfNode):
+            self._op(_OP_IF, node)
+            self._node(node.condition)
+            self._block(node.then_block)
+            self._block(node.else_block)
+        elif isinstance(node, WhileNode):
+            self._op(_OP_WHILE, node)
+            self._node(node.condition)
+            self._block(node.body)
+        elif isinstance(node, ResponseNode):
+            if node.metadata:
+                raise CompileError("response metadata cannot be compiled")
+            self._op(_OP_RESPONSE, node)
+            self._u32(self.strings.add(node.response_type))
+            self._node(node.content)
+        elif isinstance(node, FunctionCallNode):
+            self._op(_OP_CALL, node)
+            self._u32(self.strings.add(node.func_name))
+            self._block(node.args)
+        else:
+            raise CompileError(f"cannot compile node type {type(node).__name__}")
+
+
+def compile_scenario(scenario: Scenario, source_digest: bytes = _NO_DIGEST) -> bytes:
+    strings = _StringTable()
+    encoder = _Encoder(strings)
+    name_idx = strings.add(scenario.name)
+    initial_idx = strings.add(scenario.initial_state)
+
+    state_rows: List[Tuple[bytes, Tuple[int, int, int, int]]] = []
+    transitions = bytearray()
+    n_transitions = 0
+
+    def add_transition(intent: Optional[str], transition: Transition) -> int:
+        nonlocal n_transitions
+        if isinstance(transition.response, ASTNode):
+            kind, response = _CODE, encoder.emit(transition.response)
+        else:
+            kind, response = _TEXT, strings.add(transition.response or "")
+        actions = encoder.emit_block(getattr(transition, "actions", None) or [])
+        transitions.extend(
+            _TRANSITION.pack(strings.add(intent), strings.add(transition.next_state), kind, response, actions)
+        )
+        n_transitions += 1
+        return n_transitions - 1
+
+    for state_name, state in scenario._states.items():
+        first = n_transitions
+        for intent, transition in state.intents.items():
+            add_transition(intent, transition)
+        count = n_transitions - first
+        default = add_transition(None, state.default) if state.default is not None else NONE
+        state_rows.append((state_name.encode("utf-8"), (strings.add(state_name), first, count, default)))
+
+    # 按名称（UTF-8 字节序）排序，加载时二分查找
+    state_rows.sort(key=lambda row: row[0])
+    states = b"".join(_STATE.pack(*row) for _, row in state_rows)
+    string_blob = strings.encode()
+
+    strings_off = _HEADER.size
+    states_off = strings_off + len(string_blob)
+    transitions_off = states_off + len(states)
+    code_off = transitions_off + len(transitions)
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        0,
+        name_idx,
+        initial_idx,
+        len(strings.values),
+        len(state_rows),
+        n_transitions,
+        strings_off,
+        states_off,
+        transitions_off,
+        code_off,
+        source_digest,
+    )
+    return header + string_blob + states + bytes(transitions) + bytes(encoder.code)
+
+
+def write_compiled(scenario: Scenario, path: str, source_digest: bytes = _NO_DIGEST) -> None:
+    """原子写入：先写临时文件再 rename，已映射旧文件的进程不受影响。"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(compile_scenario(scenario, source_digest))
+    os.replace(tmp, path)
+
+
+class CompiledScenario:
+    """只读映射的编译场景，接口与 parser.Scenario 相同。"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            _,
+            name_idx,
+            initial_idx,
+            self._n_strings,
+            self._n_states,
+            _n_transitions,
+            self._strings_off,
+            self._states_off,
+            self._transitions_off,
+            self._code_off,
+            self.source_digest,
+        ) = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self._buf.close()
+            raise CompileError(f"Not a compiled scenario: {path}")
+        self._blob_off = self._strings_off + 4 * (self._n_strings + 1)
+        self._string_cache: Dict[int, str] = {}
+        self._states: Dict[str, State] = {}
+        self.name = self._string(name_idx)
+        self.initial_state = self._string(initial_idx)
+
+    def close(self) -> None:
+        self._buf.close()
+
+    # -- 字符串表 --
+    def _string_bytes(self, idx: int) -> bytes:
+        start, end = struct.unpack_from("<2I", self._buf, self._strings_off + 4 * idx)
+        return self._buf[self._blob_off + start : self._blob_off + end]
+
+    def _string(self, idx: int) -> Optional[str]:
+        if idx == NONE:
+            return None
+        value = self._string_cache.get(idx)
+        if value is None:
+            value = self._string_cache[idx] = self._string_bytes(idx).decode("utf-8")
+        return value
+
+    # -- 状态 --
+    def state_names(self) -> List[str]:
+        return [self._string(_STATE.unpack_from(self._buf, self._states_off + i * _STATE.size)[0]) for i in range(self._n_states)]
+
+    def _find_state(self, name: str) -> int:
+        key = name.encode("utf-8")
+        lo, hi = 0, self._n_states
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (name_idx,) = _U32.unpack_from(self._buf, self._states_off + mid * _STATE.size)
+            probe = self._string_bytes(name_idx)
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        raise KeyError(name)
+
+    def get_state(self, name: str) -> State:
+        state = self._states.get(name)
+        if state is None:
+            state = self._states[name] = self._decode_state(self._find_state(name))
+        return state
+
+    def _decode_state(self, index: int) -> State:
+        name_idx, first, count, default = _STATE.unpack_from(self._buf, self._states_off + index * _STATE.size)
+        code_nodes: Dict[Any, Any] = {}
+        intents: Dict[str, Transition] = {}
+        for t in range(first, first + count):
+            intent, transition = self._decode_transition(t, code_nodes)
+            intents[intent] = transition
+        default_transition = self._decode_transition(default, code_nodes)[1] if default != NONE else None
+        return State(self._string(name_idx), intents=intents, default=default_transition)
+
+    def _decode_transition(self, index: int, code_nodes: Dict[Any, Any]) -> Tuple[Optional[str], Transition]:
+        intent, next_state, kind, response, actions_off = _TRANSITION.unpack_from(
+            self._buf, self._transitions_off + index * _TRANSITION.size
+        )
+        actions = None
+        if actions_off != NONE:
+            actions = code_nodes.get(("block", actions_off))
+            if actions is None:
+                actions = code_nodes[("block", actions_off)] = _Decoder(self, self._code_off + actions_off)._block()
+        if kind == _CODE:
+            node = code_nodes.get(response)
+            if node is None:
+                node = code_nodes[response] = _Decoder(self, self._code_off + response).node()
+            value: Any = node
+        else:
+            value = self._string(response)
+        return self._string(intent), Transition(value, next_state=self._string(next_state), actions=actions)
+
+
+class _Decoder:
+    def __init__(self, scenario: CompiledScenario, pos: int) -> None:
+        self.buf = scenario._buf
+        self.string = scenario._string
+        self.pos = pos
+
+    def _u32(self) -> int:
+        (value,) = _U32.unpack_from(self.buf, self.pos)
+        self.pos += 4
+        return value
+
+    def _block(self) -> Optional[List[ASTNode]]:
+        count = self._u32()
+        if count == NONE:
+            return None
+        return [self.node() for _ in range(count)]
+
+    def node(self) -> ASTNode:
+        op = self.buf[self.pos]
+        self.pos += 1
+        line = self._u32()
+        node = self._operands(op)
+        if line != NONE:
+            node.line = line
+        return node
+
+    def _operands(self, op: int) -> ASTNode:
+        if op == _OP_NUMBER:
+            (value,) = _F64.unpack_from(self.buf, self.pos)
+            self.pos += 8
+            return NumberNode(value)
+        if op == _OP_STRING:
+            return StringNode(self.string(self._u32()))
+        if op == _OP_BOOL:
+            value = self.buf[self.pos] == 1
+            self.pos += 1
+            return BoolNode(value)
+        if op == _OP_VAR:
+            return VariableNode(self.string(self._u32()))
+        if op == _OP_BINARY:
+            operator = self.string(self._u32())
+            left = self.node()
+            return BinaryOpNode(operator, left, self.node())
+        if op == _OP_ASSIGN:
+            return AssignmentNode(self.string(self._u32()), self.node())
+        if op == _OP_IF:
+            condition = self.node()
+            then_block = self._block() or []
+            return IfNode(condition, then_block, self._block())
+        if op == _OP_WHILE:
+            condition = self.node()
+            return WhileNode(condition, self._block() or [])
+        if op == _OP_RESPONSE:
+            return ResponseNode(self.string(self._u32()), self.node())
+        if op == _OP_CALL:
+            return FunctionCallNode(self.string(self._u32()), self._block() or [])
+        raise CompileError(f"unknown opcode {op} at offset {self.pos - 5}")
+
+
+def load_compiled(path: str) -> CompiledScenario:
+    return CompiledScenario(path)
+
+
+def compile_cached(path: str, cache_dir: Optional[str] = None, parse: Callable[[str], Scenario] = parse_script) -> CompiledScenario:
+    """返回脚本对应的编译场景；缓存缺失或记录的源文件摘要与脚本内容不符时重新编译。
+    可作为 ScenarioRegistry 的 parse 函数。"""
+    source = Path(path)
+    directory = Path(cache_dir) if cache_dir else source.parent / CACHE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"{source.stem}.dslc"
+    digest = hashlib.sha1(source.read_bytes()).digest()
+    try:
+        cached = CompiledScenario(str(target))
+    except (FileNotFoundError, CompileError, ValueError, struct.error):
+        cached = None
+    if cached is not None:
+        if cached.source_digest == digest:
+            return cached
+        cached.close()
+    # 记录的是编译前读到的内容摘要：解析期间文件若再被修改，下次调用会发现不一致并重新编译
+    write_compiled(parse(str(source)), str(target), digest)
+    return CompiledScenario(str(target))
@@ -0,0 +1,66 @@
+"""Per-turn deadlines.
+
+The active deadline is kept in a context variable so it follows the turn
+into AST execution, builtins (`intent`, `llm_generate`), admission control
+and the worker threads started with `asyncio.to_thread` (which copy the
+current context). Code that performs I/O caps its timeouts with
+`remaining()` and stops retrying once the deadline has passed.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 绝对截止时间（time.monotonic() 时间轴）；None 表示不限时
+current_deadline: ContextVar[Optional[float]] = ContextVar("dsl_turn_deadline", default=None)
+
+
+def remaining() -> Optional[float]:
+    """距当前截止时间的剩余秒数（可能为负）；未设置截止时间时返回 None。"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def cap_timeout(timeout: float) -> float:
+    """把 I/O 超时限制在剩余时间内。"""
+    left = remaining()
+    if left is None:
+        return timeout
+    return max(0.0, min(timeout, left))
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """在 `seconds` 秒后到期的截止时间内运行；嵌套时取更早者。seconds 为空或 <= 0 时不限时。"""
+    if seconds is None or seconds <= 0:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    outer = current_deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """等待 awaitable；超过当前截止时间时取消它并抛出 asyncio.TimeoutError。"""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    return await asyncio.wait_for(awaitable, max(0.0, left))
@@ -0,0 +1,74 @@
+"""Hedged request policy for LLM intent classification.
+
+If a classification has not returned after an adaptive delay (by default
+the observed p95 latency), a second identical request is issued, optionally
+to a secondary endpoint. The first usable answer wins and the other request
+is cancelled. A token budget caps the fraction of requests that may hedge.
+"""
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Deque, Dict
+
+
+class HedgePolicy:
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.05,
+        max_hedge_ratio: float = 0.1,
+        max_burst: float = 5.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ) -> None:
+        if not 0.0 < percentile <= 1.0:
+            raise ValueError("percentile must be in (0, 1]")
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_burst = max_burst
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        # 每个请求为预算增加 max_hedge_ratio 个令牌，每次对冲消耗 1 个
+        self._budget = 0.0
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def delay(self) -> float:
+        """当前的对冲触发阈值（秒）。样本不足时使用 initial_delay。"""
+        if len(self._latencies) < self.min_samples:
+            return max(self.initial_delay, self.min_delay)
+        ordered = sorted(self._latencies)
+        idx = min(len(ordered) - 1, max(0, math.ceil(self.percentile * len(ordered)) - 1))
+        return max(ordered[idx], self.min_delay)
+
+    def record_request(self) -> None:
+        self.requests += 1
+        self._budget = min(self.max_burst, self._budget + self.max_hedge_ratio)
+
+    def record_latency(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def try_acquire(self) -> bool:
+        """预算允许时消耗一次对冲额度。"""
+        if self._budget < 1.0:
+            return False
+        self._budget -= 1.0
+        self.hedges_fired += 1
+        return True
+
+    def record_hedge_won(self) -> None:
+        self.hedges_won += 1
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "hedge_rate": self.hedges_fired / self.requests if self.requests else 0.0,
+            "delay": self.delay(),
+        }
@@ -0,0 +1,149 @@
+"""Incremental re-parsing of scenario files.
+
+`IncrementalParser` is a drop-in replacement for `parse_script` (and can be
+passed as `ScenarioRegistry(parse=...)` or `compile_cached(parse=...)`). It
+remembers, per file, the statements of the previous parse keyed by their
+source text. A file is split into chunks - one per top-level statement, an
+`if`/`while` block including its body being one chunk - and only chunks
+whose text is new are parsed again; the others reuse the previous AST
+nodes. A reused chunk that moved because lines were inserted or removed
+above it is copied with shifted line numbers rather than patched in place:
+the old nodes are still referenced by older scenario versions that live
+sessions may be running.
+
+States are then rebuilt from the statements, and a state whose statements
+are all reused unchanged keeps the previous `State` object (including its
+compiled action programs), so a few edited lines in a large generated scenario cost
+a few line parses plus a linear scan. Every call still returns a new
+`Scenario`, which keeps the registry's copy-on-write versioning intact.
+
+Not thread-safe; `ScenarioRegistry.refresh` serialises calls.
+"""
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .ast_nodes import ASTNode
+from .parser import _BLOCK_OPEN, _ELSE, _ELSE_IF, DSLParser, Scenario, ScenarioBuilder, State
+from .vm import DEFAULT_MAX_DEPTH
+
+# (起始行号, 语句；无法识别的行为 None)
+_Chunk = Tuple[int, Optional[ASTNode]]
+
+
+@dataclass
+class ParseStats:
+    chunks: int = 0
+    parsed: int = 0
+    states: int = 0
+    states_reused: int = 0
+
+
+@dataclass
+class _FileState:
+    chunks: Dict[str, List[_Chunk]]
+    states: Dict[str, Tuple[Tuple[ASTNode, ...], State]]
+
+
+def split_chunks(text: str) -> List[Tuple[int, str]]:
+    """把脚本切分为 (起始行号, 文本) 片段：每条顶层语句一段，if/while 块整体一段。"""
+    chunks: List[Tuple[int, str]] = []
+    lines: List[str] = []
+    start = 0
+    depth = 0
+    for lineno, raw in enumerate(text.split('\n'), start=1):
+        line = raw.strip()
+        if not lines:
+            if not line or line.startswith('#'):
+                continue
+            start = lineno
+        lines.append(line)
+        if _BLOCK_OPEN.match(line):
+            depth += 1
+        elif line.startswith('}'):
+            depth -= 1
+            rest = line[1:].strip()
+            if rest and (_ELSE.match(rest) or _ELSE_IF.match(rest)):
+                depth += 1
+        if depth <= 0:
+            chunks.append((start, '\n'.join(lines)))
+            lines = []
+            depth = 0
+    if lines:
+        # 未闭合的块：交给解析器报错
+        chunks.append((start, '\n'.join(lines)))
+    return chunks
+
+
+def _shift_lines(node: ASTNode, delta: int) -> ASTNode:
+    """返回行号平移 delta 后的副本；原节点可能仍属于旧版本场景，不能原地修改。"""
+    node = copy.deepcopy(node)
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if current.line is not None:
+            current.line += delta
+        pending.extend(current.children())
+    return node
+
+
+class IncrementalParser:
+    def __init__(self, parser: Optional[DSLParser] = None, max_depth: Optional[int] = DEFAULT_MAX_DEPTH) -> None:
+        self._parser = parser or DSLParser()
+        self.max_depth = max_depth
+        self._files: Dict[str, _FileState] = {}
+        self.stats = ParseStats()
+
+    def __call__(self, path: str) -> Scenario:
+        p = Path(path)
+        return self.parse_text(p.read_text(encoding="utf-8"), p.stem, key=str(p))
+
+    def forget(self, key: str) -> None:
+        """丢弃某个文件的缓存（文件被删除时调用）。"""
+        self._files.pop(key, None)
+
+    def parse_text(self, text: str, name: str, key: Optional[str] = None) -> Scenario:
+        key = key if key is not None else name
+        previous = self._files.get(key)
+        pool = previous.chunks if previous is not None else {}
+        # 同一文本可能出现多次，按出现顺序逐个复用
+        used: Dict[str, int] = {}
+        stats = ParseStats()
+        chunks: Dict[str, List[_Chunk]] = {}
+        builder = ScenarioBuilder(name, self.max_depth)
+        for start, source in split_chunks(text):
+            stats.chunks += 1
+            candidates = pool.get(source)
+            index = used.get(source, 0)
+            if candidates is not None and index < len(candidates):
+                used[source] = index + 1
+                old_start, node = candidates[index]
+                if node is not None and old_start != start:
+                    node = _shift_lines(node, start - old_start)
+            else:
+                stats.parsed += 1
+                nodes = list(self._parser.iter_statements(source.split('\n'), first_line=start))
+                node = nodes[0] if nodes else None
+            chunks.setdefault(source, []).append((start, node))
+            if node is not None:
+                builder.add(node)
+        old_states = previous.states if previous is not None else {}
+        signatures: Dict[str, Tuple[ASTNode, ...]] = {}
+        reused: Dict[str, State] = {}
+        for state_name, sources in builder.sources.items():
+            signature = signatures[state_name] = tuple(sources)
+            old = old_states.get(state_name)
+            if old is not None and len(old[0]) == len(signature) and all(a is b for a, b in zip(old[0], signature)):
+                reused[state_name] = old[1]
+        scenario = builder.build(reused)
+        stats.states = len(builder.sources)
+        stats.states_reused = len(reused)
+
+        self._files[key] = _FileState(
+            chunks, {name: (signatures[name], scenario.get_state(name)) for name in signatures}
+        )
+        self.stats = stats
+        return scenario
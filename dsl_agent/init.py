@@ -4,4 +4,21 @@ __all__ = [
     "interpreter",
     "LLM_integration",
     "logic",
+    "cache",
+    "hedging",
+    "routing",
+    "circuit_breaker",
+    "admission",
+    "deadline",
+    "logging_setup",
+    "journal",
+    "registry",
+    "router",
+    "workers",
+    "compiled",
+    "scope",
+    "tracing",
+    "vm",
+    "incremental",
+    "loader",
 ]
\ No newline at end of file
@@ -3,20 +3,85 @@ from __future__ import annotations
 import asyncio
 import inspect
 import logging
-from typing import List, Optional, Any
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
 
-from .LLM_integration import IntentService
+from .LLM_integration import IntentResult, IntentService
+from .admission import INTERACTIVE, current_priority
 from .ast_nodes import ASTNode
+from .deadline import deadline_scope, within_deadline
+from .journal import JournalWriter, TurnRecord
+from .scope import Scope
+from .vm import program_for
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
+# 纯文本回复中的 {name} 占位符，由会话变量或本轮变量（如 user_input）填充；{name.key} 取字典变量中的一项（如 {entities.origin}）
+_PLACEHOLDER = re.compile(r"\{(\w+)(?:\.(\w+))?\}")
+
+
+def _same_outcome(a, b) -> bool:
+    """两个转换是否执行相同的动作、给出相同的回复并进入同一状态。"""
+    return a is b or (a.response == b.response and a.next_state == b.next_state and a.actions == b.actions)
+
+
+def _intent_is_moot(state) -> bool:
+    # 结果缓存在 State 对象上（场景重新加载时会生成新的 State）
+    moot = getattr(state, "_intent_is_moot", None)
+    if moot is None:
+        moot = all(_same_outcome(t, state.default) for t in state.intents.values())
+        state._intent_is_moot = moot
+    return moot
+
 
 class Interpreter:
-    def __init__(self, scenario: Scenario, intent_service: IntentService):
+    def __init__(
+        self,
+        scenario: Scenario,
+        intent_service: IntentService,
+        priority: int = INTERACTIVE,
+        max_execution_time: Optional[float] = None,
+        journal: Optional[JournalWriter] = None,
+        session_id: Optional[str] = None,
+        tracer: Optional[tracing.Tracer] = None,
+        max_execution_depth: Optional[int] = None,
+        max_execution_steps: Optional[int] = None,
+        speculative_generation: bool = False,
+    ):
         self.scenario = scenario
         self.intent_service = intent_service
+        # 出站 LLM 调用的准入优先级（交互会话优先于批量/回放流量）
+        self.priority = priority
+        # 每轮对话的默认截止时间（秒）；None 或 <= 0 表示不限时
+        self.max_execution_time = max_execution_time
+        # 每轮对话写入二进制审计日志（见 journal.py）；写盘在后台线程完成
+        self.journal = journal
+        self.session_id = session_id or uuid.uuid4().hex
+        # 可选：对采样轮次记录逐节点耗时（见 tracing.py）
+        self.tracer = tracer
+        # 转换动作中 if/while 块的嵌套层数上限与每轮执行的指令数上限（见 vm.py）
+        self.max_execution_depth = max_execution_depth
+        self.max_execution_steps = max_execution_steps
+        # 推测执行：意图识别的同时开始生成默认转换的 llm_generate 回复，意图不同则丢弃；
+        # 识别结果不影响转换的状态跳过意图识别
+        self.speculative_generation = speculative_generation
+        self.speculation_stats = {"started": 0, "used": 0, "discarded": 0}
         self._current_state = scenario.initial_state
         self._ended = False
+        # 结构化意图识别跨轮收集的实体（槽位），与会话变量分开保存
+        self._entity_slots: Dict[str, Any] = {}
+        # 会话级执行环境：跨轮复用，DSL 赋值结果保存在其中
+        self.scope = Scope(
+            builtins={
+                "intent_service": intent_service,
+                "llm_client": intent_service,
+                # response_callback can be used by ResponseNode to report breadcrumbs
+                "response_callback": None,
+            }
+        )
 
     @property
     def current_state(self) -> str:
@@ -29,8 +94,10 @@ class Interpreter:
     def reset(self) -> None:
         self._current_state = self.scenario.initial_state
         self._ended = False
+        self._entity_slots.clear()
+        self.scope.clear_session()
 
-    def process_input(self, user_text: str) -> str:
+    def process_input(self, user_text: str, timeout: Optional[float] = None) -> str:
         # 提供同步入口，但在已有事件循环中不可调用
         try:
             running_loop = asyncio.get_running_loop()
@@ -38,17 +105,58 @@ class Interpreter:
             running_loop = None
         if running_loop is not None and running_loop.is_running():
             raise RuntimeError("process_input cannot be called from a running event loop; use process_input_async")
-        return asyncio.run(self.process_input_async(user_text))
+        return asyncio.run(self.process_input_async(user_text, timeout=timeout))
 
-    async def process_input_async(self, user_text: str) -> str:
+    async def process_input_async(self, user_text: str, timeout: Optional[float] = None) -> str:
+        """处理一轮输入。`timeout` 覆盖 max_execution_time；截止时间传递到意图识别、
+        llm_generate 与 HTTP 超时，超时后取消未完成的调用并回退到状态默认转换。"""
         if self._ended:
             raise RuntimeError("Conversation already ended")
+        token = current_priority.set(self.priority)
+        try:
+            with deadline_scope(timeout if timeout is not None else self.max_execution_time):
+                if self.tracer is None:
+                    return await self._process_turn(user_text)
+                with self.tracer.turn("turn", session=self.session_id, state=self._current_state):
+                    return await self._process_turn(user_text)
+        finally:
+            current_priority.reset(token)
 
+    async def _process_turn(self, user_text: str) -> str:
+        started_at = time.time()
+        started = time.perf_counter()
         state = self.scenario.get_state(self._current_state)
         available_intents: List[str] = list(state.intents.keys())
 
-        # 调用意图服务（awaitable）
-        intent = await self.intent_service.identify(user_text, state.name, available_intents)
+        scope = self.scope
+        scope.begin_turn(user_text, state.name, available_intents)
+        structured_mode = getattr(self.intent_service, "structured", False)
+        # 推测模式下，所有意图都与默认转换结果相同（含没有意图）时识别结果不影响本轮，
+        # 直接跳过这次往返；结构化模式仍需调用以抽取实体
+        skip_identify = self.speculative_generation and not structured_mode and _intent_is_moot(state)
+        speculation = None if skip_identify else self._speculate(state.default, scope)
+
+        # 调用意图服务（awaitable）；超过截止时间则取消并按默认转换处理。
+        # 结构化模式下同一次调用还返回置信度与实体，之后写入作用域
+        structured: Optional[IntentResult] = None
+        intent: Optional[str] = None
+        try:
+            if not skip_identify:
+                with tracing.span("identify", "llm", io=True, state=state.name):
+                    if structured_mode:
+                        structured = await within_deadline(
+                            self.intent_service.identify_structured(user_text, state.name, available_intents)
+                        )
+                        intent = structured.intent
+                    else:
+                        intent = await within_deadline(self.intent_service.identify(user_text, state.name, available_intents))
+        except asyncio.TimeoutError:
+            logger.warning("Intent identification exceeded turn deadline in state=%s; using default", state.name)
+        except BaseException:
+            if speculation is not None:
+                self._discard(speculation)
+            raise
+        intent_ms = (time.perf_counter() - started) * 1000.0
 
         # 统一意图 key 为小写以便匹配
         mapping = {k.lower(): v for k, v in state.intents.items()}
@@ -65,30 +173,31 @@ class Interpreter:
             transition = state.default
             matched = "default"
 
-        # Prepare runtime context for AST execution
-        context = {
-            "intent_service": self.intent_service,
-            "llm_client": self.intent_service,
-            "state_name": state.name,
-            "state_intents": available_intents,
-            "user_input": user_text,
-            "variables": {},
-            "functions": {},
-            # response_callback can be used by ResponseNode to report breadcrumbs
-            "response_callback": None,
-        }
-
-        # If the transition response is an ASTNode, execute it with the async API.
-        if isinstance(transition.response, ASTNode):
+        if structured_mode:
+            self._apply_entities(scope, structured)
+        if speculation is not None and not _same_outcome(transition, state.default):
+            # 意图不同：推测结果作废
+            self._discard(speculation)
+            speculation = None
+
+        actions = getattr(transition, "actions", None)
+        if actions or isinstance(transition.response, ASTNode):
             try:
-                reply_val = await transition.response.execute_async(context)
-                reply = str(reply_val)
+                if speculation is not None:
+                    self.speculation_stats["used"] += 1
+                    reply = str(await within_deadline(speculation))
+                else:
+                    reply = await within_deadline(self._run_transition(transition, actions, scope))
+            except asyncio.TimeoutError:
+                logger.warning("Response execution exceeded turn deadline in state=%s", state.name)
+                reply = self._fallback_reply(state, transition, user_text)
             except Exception:
                 # fallback to empty reply on execution error
+                logger.exception("Response execution failed in state=%s", state.name)
                 reply = ""
         else:
-            # Plain string -> use legacy behavior
-            reply = transition.response.replace("{user_input}", user_text)
+            # Plain string -> template replacement
+            reply = self._render(transition.response, scope)
 
         if transition.next_state is None:
             self._ended = True
@@ -107,15 +216,118 @@ class Interpreter:
                 # if the next state cannot be resolved, consider conversation ended
                 self._ended = True
 
-        logger.info(
-            "state=%s intent=%s next=%s ended=%s",
-            state.name,
-            matched,
-            next_state if next_state is not None else "end",
-            self._ended,
-        )
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "state=%s intent=%s next=%s ended=%s elapsed_ms=%.1f",
+                state.name,
+                matched,
+                next_state if next_state is not None else "end",
+                self._ended,
+                elapsed_ms,
+                # structured per-turn record (see logging_setup.JsonFormatter)
+                extra={
+                    "turn": {
+                        "scenario": getattr(self.scenario, "name", None),
+                        "state": state.name,
+                        "intent": matched,
+                        "next": next_state,
+                        "ended": self._ended,
+                        "elapsed_ms": round(elapsed_ms, 3),
+                    }
+                },
+            )
+        if self.journal is not None:
+            self.journal.append(
+                TurnRecord(
+                    session_id=self.session_id,
+                    scenario=getattr(self.scenario, "name", "") or "",
+                    state=state.name,
+                    intent=matched,
+                    next_state=next_state or "",
+                    user_input=user_text,
+                    reply=reply,
+                    started_at=started_at,
+                    elapsed_ms=elapsed_ms,
+                    intent_ms=intent_ms,
+                )
+            )
         return reply
 
+    async def _run_transition(self, transition, actions, scope: Scope) -> str:
+        if actions:
+            program = program_for(transition, self.max_execution_depth)
+            await program.run(scope, self.max_execution_steps)
+            # 块内的 response 语句覆盖该转换的回复；与顶层纯文本回复一样填充 {name} 占位符
+            override = scope.locals.get("last_response")
+            if override is not None:
+                content = override["content"]
+                return self._render(content, scope) if isinstance(content, str) else str(content)
+        if isinstance(transition.response, ASTNode):
+            return str(await transition.response.execute_async(scope))
+        return self._render(transition.response, scope)
+
+    def _speculate(self, transition, scope: Scope) -> Optional["asyncio.Future[Any]"]:
+        """默认转换的回复需要 LLM 生成且无副作用时，与意图识别并行开始求值。"""
+        if not self.speculative_generation or transition is None or getattr(transition, "actions", None):
+            return None
+        response = transition.response
+        if not isinstance(response, ASTNode) or not response.performs_io() or response.has_side_effects():
+            return None
+        self.speculation_stats["started"] += 1
+        return asyncio.ensure_future(response.execute_async(scope))
+
+    def _discard(self, speculation: "asyncio.Future[Any]") -> None:
+        # 已在线程中发出的 HTTP 请求无法中断，其结果被丢弃
+        self.speculation_stats["discarded"] += 1
+        if speculation.done():
+            if not speculation.cancelled():
+                speculation.exception()
+        else:
+            speculation.cancel()
+
+    def _apply_entities(self, scope: Scope, result: Optional[IntentResult]) -> None:
+        """实体收集在会话级的槽位字典中（跨轮保留，逐步补全槽位），只通过本轮局部变量
+        `entities` 暴露，纯文本回复中写作 `{entities.origin}`；置信度为本轮局部变量 `intent_confidence`。
+
+        实体不写入会话变量：模型输出无法设置或改写脚本读取的变量（如 `authorized`）。
+        空值不会清除之前收集到的值。
+        """
+        local = scope.locals
+        slots = self._entity_slots
+        if result is not None:
+            local["intent_confidence"] = result.confidence
+            for name, value in result.entities.items():
+                if not isinstance(name, str) or value is None or value == "" or isinstance(value, (dict, list)):
+                    continue
+                slots[name] = value
+        local["entities"] = dict(slots)
+
+    @staticmethod
+    def _render(template: str, scope: Scope) -> str:
+        if "{" not in template:
+            return template
+
+        variables, local = scope.variables, scope.locals
+
+        def substitute(match: "re.Match[str]") -> str:
+            name, key = match.group(1, 2)
+            value = variables.get(name, local.get(name))
+            if key is not None:
+                # {entities.origin}：取字典中的一项
+                value = value.get(key) if isinstance(value, dict) else None
+            return match.group(0) if value is None else str(value)
+
+        return _PLACEHOLDER.sub(substitute, template)
+
+    @staticmethod
+    def _fallback_reply(state, transition, user_text: str) -> str:
+        # 超时回退：使用状态默认转换的静态回复（若其本身也需要执行 AST 则返回空串）
+        default = state.default
+        if default is not None and default is not transition and isinstance(default.response, str):
+            return default.response.replace("{user_input}", user_text)
+        return ""
+
     def _resolve_intent(self, user_text: str, state: str, intents: List[str]) -> Optional[str]:
         # 旧接口兼容：保留同步调用路径（尽可能不使用）
         result = self.intent_service.identify(user_text, state, intents)
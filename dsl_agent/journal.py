@@ -0,0 +1,278 @@
+"""Append-only binary conversation journal.
+
+File layout (little endian)::
+
+    header   b"DSLJ" u16 version u16 reserved
+    record*  u32 payload_len  u32 crc32(payload)  payload
+    footer   u32 count  u64 offset[count]  u64 footer_offset  b"DSLI"
+
+A record payload is ``f64 started_at, f32 elapsed_ms, f32 intent_ms``
+followed by seven length-prefixed UTF-8 strings (session, scenario, state,
+intent, next_state, input, reply). The index footer is written on clean
+close; a journal without footer (crash) is still readable by scanning, and
+reopening it for writing truncates any torn tail record.
+
+`JournalWriter` encodes and writes records on a background thread and
+commits every batch that accumulated since the previous write with a single
+write + flush (+ fsync), i.e. group commit. `JournalReader` memory-maps the
+file and decodes records lazily.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Any, Iterator, List, Optional
+
+MAGIC = b"DSLJ"
+INDEX_MAGIC = b"DSLI"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHH")
+_RECORD_HEAD = struct.Struct("<II")
+_FIXED = struct.Struct("<dff")
+_STR_LEN = struct.Struct("<I")
+_TRAILER = struct.Struct("<Q4s")
+_COUNT = struct.Struct("<I")
+
+_STRING_FIELDS = ("session_id", "scenario", "state", "intent", "next_state", "user_input", "reply")
+
+
+@dataclass
+class TurnRecord:
+    session_id: str
+    scenario: str
+    state: str
+    intent: str
+    next_state: str
+    user_input: str
+    reply: str
+    started_at: float
+    elapsed_ms: float
+    intent_ms: float = 0.0
+
+    def encode(self) -> bytes:
+        parts = [_FIXED.pack(self.started_at, self.elapsed_ms, self.intent_ms)]
+        for name in _STRING_FIELDS:
+            raw = (getattr(self, name) or "").encode("utf-8")
+            parts.append(_STR_LEN.pack(len(raw)))
+            parts.append(raw)
+        payload = b"".join(parts)
+        return _RECORD_HEAD.pack(len(payload), zlib.crc32(payload)) + payload
+
+    @classmethod
+    def decode(cls, payload: memoryview) -> "TurnRecord":
+        started_at, elapsed_ms, intent_ms = _FIXED.unpack_from(payload, 0)
+        pos = _FIXED.size
+        values = []
+        for _ in _STRING_FIELDS:
+            (length,) = _STR_LEN.unpack_from(payload, pos)
+            pos += _STR_LEN.size
+            values.append(bytes(payload[pos : pos + length]).decode("utf-8"))
+            pos += length
+        return cls(*values, started_at=started_at, elapsed_ms=elapsed_ms, intent_ms=intent_ms)
+
+
+class JournalError(RuntimeError):
+    pass
+
+
+def _scan(buf: Any, start: int, end: int) -> List[int]:
+    """顺序扫描 [start, end) 内完整且校验通过的记录，返回其偏移。"""
+    offsets = []
+    pos = start
+    while pos + _RECORD_HEAD.size <= end:
+        length, crc = _RECORD_HEAD.unpack_from(buf, pos)
+        body = pos + _RECORD_HEAD.size
+        if body + length > end or zlib.crc32(buf[body : body + length]) != crc:
+            break
+        offsets.append(pos)
+        pos = body + length
+    return offsets
+
+
+def _read_footer(buf: Any, size: int) -> Optional[tuple]:
+    """返回 (footer_offset, offsets)；没有有效索引时返回 None。"""
+    if size < _HEADER.size + _TRAILER.size + _COUNT.size:
+        return None
+    footer_offset, magic = _TRAILER.unpack_from(buf, size - _TRAILER.size)
+    if magic != INDEX_MAGIC or footer_offset >= size:
+        return None
+    (count,) = _COUNT.unpack_from(buf, footer_offset)
+    expected = footer_offset + _COUNT.size + 8 * count + _TRAILER.size
+    if expected != size:
+        return None
+    offsets = list(struct.unpack_from(f"<{count}Q", buf, footer_offset + _COUNT.size))
+    return footer_offset, offsets
+
+
+class JournalWriter:
+    def __init__(self, path: str, sync: bool = True, max_batch: int = 1024) -> None:
+        self.path = path
+        self.sync = sync
+        self.max_batch = max_batch
+        self._offsets: List[int] = []
+        self._file = self._open(path)
+        self._queue: "queue.Queue[Optional[TurnRecord]]" = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self.commits = 0
+        self._thread = threading.Thread(target=self._run, name="dsl-journal-writer", daemon=True)
+        self._thread.start()
+
+    def _open(self, path: str):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            f = open(path, "wb")
+            f.write(_HEADER.pack(MAGIC, VERSION, 0))
+            f.flush()
+            return f
+        f = open(path, "r+b")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            magic, version, _ = _HEADER.unpack_from(buf, 0)
+            if magic != MAGIC or version != VERSION:
+                f.close()
+                raise JournalError(f"Not a journal file: {path}")
+            footer = _read_footer(buf, len(buf))
+            if footer is not None:
+                end, self._offsets = footer[0], footer[1]
+            else:
+                self._offsets = _scan(buf, _HEADER.size, len(buf))
+                end = _HEADER.size
+                if self._offsets:
+                    length, _ = _RECORD_HEAD.unpack_from(buf, self._offsets[-1])
+                    end = self._offsets[-1] + _RECORD_HEAD.size + length
+        # 去掉旧索引或崩溃留下的半条记录后继续追加
+        f.truncate(end)
+        f.seek(end)
+        return f
+
+    def append(self, record: TurnRecord) -> None:
+        if self._closed:
+            raise JournalError("journal is closed")
+        if self._error is not None:
+            raise JournalError("journal writer failed") from self._error
+        self._queue.put(record)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [r for r in batch if r is not None]
+            stop = len(records) != len(batch)
+            if records:
+                try:
+                    self._commit(records)
+                except BaseException as exc:  # pragma: no cover - disk errors
+                    self._error = exc
+                    return
+
+    def _commit(self, records: List[TurnRecord]) -> None:
+        pos = self._file.tell()
+        chunks = []
+        for record in records:
+            data = record.encode()
+            self._offsets.append(pos)
+            pos += len(data)
+            chunks.append(data)
+        # 组提交：一批记录一次写入、一次 flush/fsync
+        self._file.write(b"".join(chunks))
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self.commits += 1
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        footer_offset = self._file.tell()
+        self._file.write(_COUNT.pack(len(self._offsets)))
+        self._file.write(struct.pack(f"<{len(self._offsets)}Q", *self._offsets))
+        self._file.write(_TRAILER.pack(footer_offset, INDEX_MAGIC))
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+
+    def __enter__(self) -> "JournalWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class JournalReader:
+    """只读映射日志文件，按需解码记录。"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _HEADER.size:
+            self._file.close()
+            raise JournalError(f"Not a journal file: {path}")
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise JournalError(f"Not a journal file: {path}")
+        footer = _read_footer(self._buf, size)
+        self.indexed = footer is not None
+        self._offsets = footer[1] if footer is not None else _scan(self._buf, _HEADER.size, size)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, index: int) -> TurnRecord:
+        return self._decode_at(self._offsets[index])
+
+    def __iter__(self) -> Iterator[TurnRecord]:
+        for offset in self._offsets:
+            yield self._decode_at(offset)
+
+    def _decode_at(self, offset: int) -> TurnRecord:
+        length, _ = _RECORD_HEAD.unpack_from(self._buf, offset)
+        start = offset + _RECORD_HEAD.size
+        view = memoryview(self._buf)[start : start + length]
+        try:
+            return TurnRecord.decode(view)
+        finally:
+            view.release()
+
+    def close(self) -> None:
+        if getattr(self, "_buf", None) is not None:
+            self._buf.close()
+            self._buf = None
+        self._file.close()
+
+    def __enter__(self) -> "JournalReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Dump a DSL conversation journal as JSON lines")
+    parser.add_argument("journal", help="Path to journal file")
+    args = parser.parse_args(argv)
+    with JournalReader(args.journal) as reader:
+        for record in reader:
+            print(json.dumps(asdict(record), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Parallel bulk loading of a scenario directory.
+
+`load_scenarios(directory)` parses every `.dsl` file under `directory`
+(recursively) in a process pool and returns the scenarios together with a
+per-file report (parse time, errors). Two modes:
+
+- default: workers run `parse_script` and send the parsed `Scenario` back
+  (pickled);
+- `compiled=True`: workers run `compile_cached`, which writes (or reuses)
+  the flat compiled file next to the script, and send back only the
+  timing; the parent then maps the compiled files (or, with
+  `open_compiled=False`, only records their paths, for callers that just
+  warm the cache for other processes). Nothing large crosses the process
+  boundary, so cold loading many files scales with cores.
+
+The pool always uses the spawn start method: forking a parent that already
+runs threads (log listener, registry poller) can deadlock the children.
+
+With `workers=1` (or a single file) everything runs in-process.
+
+CLI::
+
+    python -m dsl_agent.loader scenario/ --workers 4 --compiled
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .parser import parse_script
+
+
+@dataclass
+class FileReport:
+    name: str
+    path: str
+    seconds: float
+    error: Optional[str] = None
+
+
+@dataclass
+class LoadReport:
+    scenarios: Dict[str, Any] = field(default_factory=dict)
+    files: List[FileReport] = field(default_factory=list)
+    elapsed: float = 0.0
+    workers: int = 1
+
+    @property
+    def errors(self) -> Dict[str, str]:
+        return {f.path: f.error for f in self.files if f.error}
+
+    def summary(self) -> str:
+        lines = [
+            f"{len(self.scenarios)} scenarios from {len(self.files)} files in "
+            f"{self.elapsed * 1000:.1f} ms ({self.workers} workers)"
+        ]
+        for f in sorted(self.files, key=lambda f: f.seconds, reverse=True):
+            status = f"ERROR {f.error}" if f.error else "ok"
+            lines.append(f"  {f.seconds * 1000:8.1f} ms  {f.path}  {status}")
+        return "\n".join(lines)
+
+
+def _load_one(path: str, compiled: bool, cache_dir: Optional[str]) -> Tuple[str, float, Any, Optional[str]]:
+    """在工作进程中执行：返回 (path, 耗时, Scenario 或编译文件路径, 错误)。"""
+    started = time.perf_counter()
+    try:
+        if compiled:
+            from .compiled import compile_cached
+
+            scenario = compile_cached(path, cache_dir=cache_dir)
+            result: Any = scenario.path
+            scenario.close()
+        else:
+            result = parse_script(path)
+    except Exception as exc:
+        return path, time.perf_counter() - started, None, f"{type(exc).__name__}: {exc}"
+    return path, time.perf_counter() - started, result, None
+
+
+def load_scenarios(
+    directory: str,
+    pattern: str = "*.dsl",
+    workers: Optional[int] = None,
+    compiled: bool = False,
+    cache_dir: Optional[str] = None,
+    recursive: bool = True,
+    open_compiled: bool = True,
+) -> LoadReport:
+    """并行加载目录（默认含子目录）下的全部场景；解析失败的文件记录在报告中，不影响其他文件。"""
+    started = time.perf_counter()
+    root = Path(directory)
+    found = root.rglob(pattern) if recursive else root.glob(pattern)
+    paths = sorted(str(p) for p in found if p.is_file())
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths) or 1))
+    report = LoadReport(workers=workers)
+
+    if workers == 1:
+        results = [_load_one(path, compiled, cache_dir) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(
+                pool.map(_load_one, paths, [compiled] * len(paths), [cache_dir] * len(paths), chunksize=max(1, len(paths) // (workers * 4)))
+            )
+
+    for path, seconds, result, error in results:
+        name = Path(path).stem
+        if error is None and name in report.scenarios:
+            error = f"duplicate scenario name {name!r}"
+        if error is None:
+            if compiled and open_compiled:
+                from .compiled import CompiledScenario
+
+                result = CompiledScenario(result)
+            report.scenarios[name] = result
+        report.files.append(FileReport(name, path, seconds, error))
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load all DSL scenarios in a directory and report parse times")
+    parser.add_argument("directory", help="Directory containing .dsl files (searched recursively)")
+    parser.add_argument("--pattern", default="*.dsl", help="Glob pattern for scenario files")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--compiled", action="store_true", help="Compile to the flat format (__dslcache__) and map the results")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+    report = load_scenarios(args.directory, args.pattern, args.workers, args.compiled)
+    if args.json:
+        print(
+            json.dumps(
+                {"elapsed": report.elapsed, "workers": report.workers, "files": [asdict(f) for f in report.files]},
+                ensure_ascii=False,
+            )
+        )
+    else:
+        print(report.summary())
+    if report.errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
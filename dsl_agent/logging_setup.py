@@ -0,0 +1,175 @@
+"""Non-blocking logging for the CLI.
+
+Log calls made on the event loop only enqueue the record (`QueueHandler`).
+A background `BatchingQueueListener` drains the queue in batches, writes
+them through a size-rotating file handler and flushes once per batch, so
+disk I/O never runs on the hot path. Per-turn records emitted by the
+interpreter carry a `turn` dict that `JsonFormatter` writes as one JSON
+object per line.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import Any, Dict, List, Optional
+
+DEFAULT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """按大小轮转的文件处理器；逐条写入时不 flush，由 listener 在批次结束时统一 flush。"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self._batching = False
+        # 自行记录文件大小，避免标准实现在每条记录上 seek/stat（会强制刷新缓冲）
+        self._size = 0
+        self._pending = 0
+        super().__init__(*args, **kwargs)
+
+    def _open(self):
+        stream = super()._open()
+        stream.seek(0, 2)
+        self._size = stream.tell()
+        return stream
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.stream is None:
+            self.stream = self._open()
+        self._pending = len((self.format(record) + self.terminator).encode(self.encoding or "utf-8"))
+        return self.maxBytes > 0 and self._size + self._pending >= self.maxBytes
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        self._size += self._pending
+
+    def flush(self) -> None:
+        if not self._batching:
+            super().flush()
+
+    def begin_batch(self) -> None:
+        self._batching = True
+
+    def end_batch(self) -> None:
+        self._batching = False
+        self.flush()
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出一行 JSON；解释器的 `turn` 字段会被展开。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        turn = getattr(record, "turn", None)
+        if isinstance(turn, dict):
+            data.update(turn)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class BatchingQueueListener:
+    """后台写入线程：一次取出队列中已有的全部记录（最多 batch_size 条），写完后统一 flush。
+
+    用法与 logging.handlers.QueueListener 相同（start/stop），线程与结束标记自行管理。
+    """
+
+    _STOP = object()
+
+    def __init__(self, log_queue: "queue.Queue[Any]", *handlers: logging.Handler, batch_size: int = 256) -> None:
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            raise RuntimeError("listener already started")
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """写完队列中已有的记录后结束线程。"""
+        thread = self._thread
+        if thread is None:
+            return
+        self.queue.put(self._STOP)
+        thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        q = self.queue
+        while True:
+            batch: List[Any] = [q.get()]
+            while len(batch) < self.batch_size and batch[-1] is not self._STOP:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._write_batch(batch)
+            for _ in batch:
+                q.task_done()
+            if stop:
+                break
+
+    def handle(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _write_batch(self, batch: List[Any]) -> bool:
+        for handler in self.handlers:
+            if isinstance(handler, BatchingRotatingFileHandler):
+                handler.begin_batch()
+        stop = False
+        try:
+            for record in batch:
+                if record is self._STOP:
+                    stop = True
+                    break
+                self.handle(record)
+        finally:
+            for handler in self.handlers:
+                if isinstance(handler, BatchingRotatingFileHandler):
+                    handler.end_batch()
+        return stop
+
+
+def setup_logging(
+    log_file: str,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    file_level: int = logging.INFO,
+    console_level: int = logging.WARNING,
+    fmt: str = DEFAULT_FORMAT,
+    datefmt: Optional[str] = None,
+    structured: bool = False,
+) -> BatchingQueueListener:
+    """把根 logger 切换为 QueueHandler，并启动后台写入线程。调用方负责在退出时 stop()。"""
+    file_handler = BatchingRotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+    )
+    file_handler.setLevel(file_level)
+    file_handler.setFormatter(JsonFormatter(datefmt=datefmt) if structured else logging.Formatter(fmt, datefmt))
+    # 控制台仅显示警告以上，避免干扰对话输出
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(logging.Formatter(fmt, datefmt))
+
+    log_queue: "queue.Queue[Any]" = queue.Queue(-1)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(min(file_level, console_level))
+
+    listener = BatchingQueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    return listener
@@ -1,17 +1,23 @@
 from __future__ import annotations
 
 import argparse
-import configparser
 import logging
 import os
 import pathlib
-import select
 import sys
 from typing import Any, Dict, Optional
 
 from . import interpreter
 from . import parser as dsl_parser
 from .LLM_integration import IntentService, LLMIntentService, StubIntentService
+from .admission import AdmissionController, TokenBucket
+from .cache import GenerationCache
+from .circuit_breaker import CircuitBreaker
+from .hedging import HedgePolicy
+from .journal import JournalWriter
+from .registry import ScenarioRegistry
+from .router import ROUTER_STATE, ScenarioRouter
+from .routing import Endpoint, EndpointPool
 
 
 def _str_to_bool(value: Optional[str], default: bool) -> bool:
@@ -20,9 +26,38 @@ def _str_to_bool(value: Optional[str], default: bool) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
+def _cfg_value(value: Optional[str]) -> Optional[str]:
+    """去掉 ini 值中的行内注释（如 `max_file_size = 10485760  # 10MB`）。"""
+    if value is None:
+        return None
+    return value.split(" #", 1)[0].strip()
+
+
+def _cfg_float(section: Dict[str, Any], key: str, default: float) -> float:
+    try:
+        raw = _cfg_value(section.get(key))
+        return float(raw) if raw else default
+    except (TypeError, ValueError):
+        logging.warning("Invalid %s config value: %s", key, section.get(key))
+        return default
+
+
+def _prompt_template(value: Optional[str]) -> Optional[str]:
+    """多行提示词模板：去掉 YAML 风格的开头 `|`（ini 续行已去除缩进）。"""
+    if not value:
+        return None
+    text = value.strip()
+    if text.startswith("|"):
+        text = text[1:].strip()
+    return text or None
+
+
 def _load_config(path: Optional[str]) -> Dict[str, Any]:
     if not path:
         return {}
+    # 只有指定配置文件时才需要 configparser
+    import configparser
+
     config = configparser.ConfigParser()
     config.read(path)
     data: Dict[str, Any] = {}
@@ -53,6 +88,34 @@ def _load_config(path: Optional[str]) -> Dict[str, Any]:
                 welcomes[scenario_name] = config[section][first_key]
     if welcomes:
         data["welcome_messages"] = welcomes
+    for section in ("cache", "hedging", "routing", "circuit_breaker", "security", "admission", "dsl_interpreter", "scenarios"):
+        if section in config:
+            data[section] = dict(config[section])
+    if "logging" in config:
+        # log_format contains %(...)s placeholders; read without interpolation
+        data["logging"] = dict(config.items("logging", raw=True))
+    # additional upstream endpoints: [endpoint.<name>] (missing keys inherit [DEFAULT])
+    endpoints: Dict[str, Dict[str, str]] = {}
+    endpoint_prefix = "endpoint."
+    for section in config.sections():
+        if section.startswith(endpoint_prefix):
+            endpoints[section[len(endpoint_prefix) :]] = dict(config[section])
+    if endpoints:
+        data["endpoints"] = endpoints
+    # local fallback classification: [fallback_intents.<scenario>] with "<state>.<trigger> = <intent>"
+    fallbacks: Dict[str, Dict[str, Dict[str, str]]] = {}
+    fallback_prefix = "fallback_intents."
+    for section in config.sections():
+        if section.startswith(fallback_prefix):
+            mapping: Dict[str, Dict[str, str]] = {}
+            for key, intent in config.items(section, raw=True):
+                if key in config.defaults() or "." not in key:
+                    continue
+                state, trigger = key.split(".", 1)
+                mapping.setdefault(state, {})[trigger] = _cfg_value(intent)
+            fallbacks[section[len(fallback_prefix) :]] = mapping
+    if fallbacks:
+        data["fallback_intents"] = fallbacks
     return data
 
 
@@ -71,6 +134,20 @@ def _resolve_settings(args: argparse.Namespace, cfg: Dict[str, Any]) -> Dict[str
         "use_real_llm": cfg.get("use_real_llm"),
         "provider": cfg.get("provider"),
         "api_secret": cfg.get("api_secret"),
+        "cache": cfg.get("cache", {}),
+        "hedging": cfg.get("hedging", {}),
+        "routing": cfg.get("routing", {}),
+        "endpoints": cfg.get("endpoints", {}),
+        "circuit_breaker": cfg.get("circuit_breaker", {}),
+        "fallback_intents": cfg.get("fallback_intents", {}),
+        "security": cfg.get("security", {}),
+        "admission": cfg.get("admission", {}),
+        "dsl_interpreter": cfg.get("dsl_interpreter", {}),
+        "logging": cfg.get("logging", {}),
+        "scenarios": cfg.get("scenarios", {}),
+        "structured_intents": cfg.get("structured_intents"),
+        "intent_detection_prompt": cfg.get("intent_detection_prompt"),
+        "min_intent_confidence": cfg.get("min_intent_confidence"),
     }
 
     if args.api_base:
@@ -91,6 +168,10 @@ def _resolve_settings(args: argparse.Namespace, cfg: Dict[str, Any]) -> Dict[str
         settings["log_file"] = args.log_file
     if args.idle_timeout is not None:
         settings["idle_timeout"] = args.idle_timeout
+    if getattr(args, "journal", None):
+        settings["journal"] = args.journal
+    if getattr(args, "workers", None):
+        settings["workers"] = args.workers
 
     # environment overrides everything
     settings["api_base"] = os.getenv("DSL_API_BASE", settings.get("api_base"))
@@ -130,13 +211,169 @@ def _resolve_settings(args: argparse.Namespace, cfg: Dict[str, Any]) -> Dict[str
     return settings
 
 
+def _service_options(settings: Dict[str, Any], scenario_name: str) -> Dict[str, Any]:
+    """LLMIntentService 的可选组件（缓存、对冲、熔断等），由配置决定是否启用。"""
+    options: Dict[str, Any] = {}
+    cache_cfg = settings.get("cache") or {}
+    if _str_to_bool(_cfg_value(cache_cfg.get("enable_generation_cache")), False):
+        options["generation_cache"] = GenerationCache(
+            max_bytes=int(_cfg_float(cache_cfg, "max_cache_bytes", 4 * 1024 * 1024)),
+            ttl=_cfg_float(cache_cfg, "cache_ttl", 300.0),
+        )
+    hedge_cfg = settings.get("hedging") or {}
+    if _str_to_bool(_cfg_value(hedge_cfg.get("enable_hedging")), False):
+        options["hedge_policy"] = HedgePolicy(
+            percentile=_cfg_float(hedge_cfg, "hedge_percentile", 0.95),
+            initial_delay=_cfg_float(hedge_cfg, "initial_delay", 1.0),
+            max_hedge_ratio=_cfg_float(hedge_cfg, "max_hedge_ratio", 0.1),
+        )
+        secondary = _cfg_value(hedge_cfg.get("secondary_api_base"))
+        if secondary:
+            options["hedge_client"] = _make_client(
+                settings.get("provider"),
+                secondary,
+                _cfg_value(hedge_cfg.get("secondary_api_key")) or settings.get("api_key") or "",
+                settings.get("api_secret"),
+            )
+    breaker_cfg = settings.get("circuit_breaker") or {}
+    if _str_to_bool(_cfg_value(breaker_cfg.get("enable_circuit_breaker")), False):
+        slow = _cfg_float(breaker_cfg, "slow_call_threshold", 0.0)
+        options["circuit_breaker"] = CircuitBreaker(
+            failure_threshold=int(_cfg_float(breaker_cfg, "failure_threshold", 5)),
+            slow_call_threshold=slow if slow > 0 else None,
+            open_duration=_cfg_float(breaker_cfg, "open_duration", 30.0),
+            half_open_max_calls=int(_cfg_float(breaker_cfg, "half_open_max_calls", 1)),
+        )
+    admission = _build_admission(settings)
+    if admission is not None:
+        options["admission"] = admission
+    if _str_to_bool(_cfg_value(settings.get("structured_intents")), False):
+        options["structured"] = True
+        options["structured_prompt"] = _prompt_template(settings.get("intent_detection_prompt"))
+        options["min_confidence"] = _cfg_float(settings, "min_intent_confidence", 0.0)
+    fallback_mapping = (settings.get("fallback_intents") or {}).get(scenario_name)
+    if fallback_mapping:
+        options["fallback_service"] = StubIntentService(mapping=fallback_mapping)
+    return options
+
+
+def _build_admission(settings: Dict[str, Any]) -> Optional[AdmissionController]:
+    """[admission] enable_admission = true 时构造准入控制（并发/排队限制）；
+    同时启用 [security] enable_rate_limit 时附加令牌桶限流。未启用时返回 None。"""
+    security = settings.get("security") or {}
+    admission_cfg = settings.get("admission") or {}
+    if not _str_to_bool(_cfg_value(admission_cfg.get("enable_admission")), False):
+        return None
+    bucket = None
+    if _str_to_bool(_cfg_value(security.get("enable_rate_limit")), False):
+        requests_per_period = _cfg_float(security, "rate_limit_requests", 100.0)
+        period = _cfg_float(security, "rate_limit_period", 3600.0)
+        burst = _cfg_float(admission_cfg, "burst", requests_per_period)
+        bucket = TokenBucket(rate=requests_per_period / period, capacity=max(1.0, burst))
+    max_delay = _cfg_float(admission_cfg, "max_queue_delay", 0.0)
+    return AdmissionController(
+        bucket=bucket,
+        max_concurrency=int(_cfg_float(admission_cfg, "max_concurrency", 8)),
+        max_queue=int(_cfg_float(admission_cfg, "max_queue", 64)),
+        max_queue_delay=max_delay if max_delay > 0 else None,
+    )
+
+
+def _make_client(provider: Optional[str], api_base: str, api_key: str, api_secret: Optional[str] = None) -> Any:
+    """按 provider 构造 chat.completions 兼容客户端。"""
+    if provider and provider.lower() == 'aliyun':
+        from .aliyun_shim import AliyunShim
+        return AliyunShim(api_base=api_base, api_key=api_key, api_secret=api_secret)
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=api_base)
+
+
+def _build_endpoint_pool(settings: Dict[str, Any]) -> Optional[EndpointPool]:
+    """配置了 [endpoint.<name>] 时构造多端点负载均衡客户端。"""
+    endpoint_cfgs = settings.get("endpoints") or {}
+    if not endpoint_cfgs:
+        return None
+    endpoints = []
+    for name, cfg in endpoint_cfgs.items():
+        api_base = _cfg_value(cfg.get("api_base"))
+        if not api_base:
+            logging.warning("Endpoint %s has no api_base; skipping", name)
+            continue
+        client = _make_client(
+            _cfg_value(cfg.get("provider")) or settings.get("provider"),
+            api_base,
+            _cfg_value(cfg.get("api_key")) or settings.get("api_key") or "",
+            _cfg_value(cfg.get("api_secret")) or settings.get("api_secret"),
+        )
+        endpoints.append(Endpoint(name, client, model=_cfg_value(cfg.get("model")) or None))
+    if not endpoints:
+        return None
+    routing_cfg = settings.get("routing") or {}
+    return EndpointPool(
+        endpoints,
+        strategy=_cfg_value(routing_cfg.get("strategy")) or "least_outstanding",
+        failure_threshold=int(_cfg_float(routing_cfg, "failure_threshold", 3)),
+        base_ejection=_cfg_float(routing_cfg, "ejection_time", 5.0),
+        max_ejection=_cfg_float(routing_cfg, "max_ejection_time", 60.0),
+    )
+
+
+def _max_depth(settings: Dict[str, Any]) -> int:
+    """解析场景时使用的块嵌套上限，与 Interpreter 的 max_execution_depth 保持一致。"""
+    from .vm import DEFAULT_MAX_DEPTH
+
+    limit = int(_cfg_float(settings.get("dsl_interpreter") or {}, "max_execution_depth", 0))
+    return limit if limit > 0 else DEFAULT_MAX_DEPTH
+
+
+def _interpreter_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Interpreter 的运行时限制（[dsl_interpreter]）。"""
+    interp_cfg = settings.get("dsl_interpreter") or {}
+    options: Dict[str, Any] = {}
+    max_time = _cfg_float(interp_cfg, "max_execution_time", 0.0)
+    if max_time > 0:
+        options["max_execution_time"] = max_time
+    for key in ("max_execution_depth", "max_execution_steps"):
+        limit = int(_cfg_float(interp_cfg, key, 0))
+        if limit > 0:
+            options[key] = limit
+    if _str_to_bool(_cfg_value(interp_cfg.get("speculative_generation")), False):
+        options["speculative_generation"] = True
+    if _str_to_bool(_cfg_value(interp_cfg.get("enable_tracing")), False):
+        from .tracing import Tracer
+
+        options["tracer"] = Tracer(
+            sample_rate=_cfg_float(interp_cfg, "trace_sample_rate", 0.01),
+            capacity=int(_cfg_float(interp_cfg, "trace_buffer_size", 100)),
+        )
+    return options
+
+
+def _intent_client(settings: Dict[str, Any], api_base: str, api_key: str) -> Any:
+    """多端点负载均衡客户端、阿里云 shim，或 None（由 LLMIntentService 按需构造 OpenAI 客户端）。"""
+    pool = _build_endpoint_pool(settings)
+    if pool is not None:
+        logging.info("Routing LLM calls across endpoints: %s", ", ".join(e.name for e in pool.endpoints))
+        return pool
+    # if a provider is specified and has a shim wrapper, construct a client wrapper
+    provider = settings.get("provider")
+    if provider and provider.lower() == 'aliyun':
+        try:
+            from .aliyun_shim import AliyunShim
+            return AliyunShim(api_base=api_base, api_key=api_key, api_secret=settings.get('api_secret'))
+        except Exception:
+            logging.exception("Failed to construct AliyunShim wrapper; falling back to OpenAI-compatible client")
+    return None
+
+
 def _build_intent_service(settings: Dict[str, Any], scenario_name: str) -> IntentService:
+    api_base = settings.get("api_base") or ""
+    api_key = settings.get("api_key") or ""
+    model = settings.get("model") or ""
+    complete = bool(api_base and api_key and model)
     # If explicitly forced, use a real LLM and fail early if config is incomplete
     if settings.get("use_real_llm"):
-        api_base = settings.get("api_base") or ""
-        api_key = settings.get("api_key") or ""
-        model = settings.get("model") or ""
-        if not (api_base and api_key and model):
+        if not complete:
             msg = (
                 "--use-real-llm specified but LLM configuration is incomplete. "
                 "Please set DSL_API_BASE, DSL_API_KEY, DSL_MODEL in environment or config.ini, or use --use-stub to fall back to stub service."
@@ -144,44 +381,195 @@ def _build_intent_service(settings: Dict[str, Any], scenario_name: str) -> Inten
             logging.error(msg)
             # Fail fast with a clear CLI-level message
             sys.exit(msg)
-        desc_all = settings.get("intent_descriptions") or {}
-        intent_descriptions = desc_all.get(scenario_name, {})
         logging.info("Forced use of real LLM intent service model=%s api_base=%s", model, api_base)
-        provider = settings.get("provider")
-        if provider and provider.lower() == 'aliyun':
-            try:
-                from .aliyun_shim import AliyunShim
-                client = AliyunShim(api_base=api_base, api_key=api_key, api_secret=settings.get('api_secret'))
-                return LLMIntentService(api_base=api_base, api_key=api_key, model=model, intent_descriptions=intent_descriptions, client=client)
-            except Exception:
-                logging.exception("Failed to construct AliyunShim wrapper for forced real LLM; falling back to standard client")
-        return LLMIntentService(api_base=api_base, api_key=api_key, model=model, intent_descriptions=intent_descriptions)
-    if settings["use_stub"]:
+    elif settings["use_stub"]:
         logging.info("Using stub intent service (use_stub=True)")
         return StubIntentService()
-    api_base = settings.get("api_base") or ""
-    api_key = settings.get("api_key") or ""
-    model = settings.get("model") or ""
-    if not (api_base and api_key and model):
+    elif not complete:
         logging.warning("LLM settings incomplete; falling back to stub intent service")
         return StubIntentService()
-    logging.info("Using LLM intent service model=%s api_base=%s", model, api_base)
+    else:
+        logging.info("Using LLM intent service model=%s api_base=%s", model, api_base)
     desc_all = settings.get("intent_descriptions") or {}
-    intent_descriptions = desc_all.get(scenario_name, {})
-    # if a provider is specified and has a shim wrapper, construct a client wrapper
-    provider = settings.get("provider")
-    if provider and provider.lower() == 'aliyun':
-        try:
-            from .aliyun_shim import AliyunShim
-            client = AliyunShim(api_base=api_base, api_key=api_key, api_secret=settings.get('api_secret'))
-            return LLMIntentService(api_base=api_base, api_key=api_key, model=model, intent_descriptions=intent_descriptions, client=client)
-        except Exception:
-            logging.exception("Failed to construct AliyunShim wrapper; falling back to OpenAI-compatible client")
     return LLMIntentService(
         api_base=api_base,
         api_key=api_key,
         model=model,
-        intent_descriptions=intent_descriptions,
+        intent_descriptions=desc_all.get(scenario_name, {}),
+        client=_intent_client(settings, api_base, api_key),
+        **_service_options(settings, scenario_name),
+    )
+
+
+def _build_router(settings: Dict[str, Any], registry: ScenarioRegistry) -> ScenarioRouter:
+    """多场景模式：顶层分类器（状态 "router"，标签为场景名）+ 各场景意图服务。
+
+    使用真实 LLM 时所有场景复用分类器的客户端、缓存、熔断与准入控制；
+    分类器的描述与关键词降级分别来自 [intent_descriptions.router] 与 [fallback_intents.router]。
+    """
+    classifier = _build_intent_service(settings, scenario_name=ROUTER_STATE)
+    fallbacks = settings.get("fallback_intents") or {}
+    descriptions = settings.get("intent_descriptions") or {}
+    if isinstance(classifier, LLMIntentService):
+        shared = classifier
+
+        def factory(name: str) -> IntentService:
+            mapping = fallbacks.get(name)
+            return shared.for_scenario(
+                intent_descriptions=descriptions.get(name, {}),
+                fallback_service=StubIntentService(mapping=mapping) if mapping else None,
+            )
+    else:
+        # 桩模式：按关键词路由
+        classifier = StubIntentService(mapping=fallbacks.get(ROUTER_STATE) or {})
+
+        def factory(name: str) -> IntentService:
+            return _build_intent_service(settings, scenario_name=name)
+
+    return ScenarioRouter(
+        registry,
+        classifier,
+        factory,
+        default_scenario=_cfg_value((settings.get("scenarios") or {}).get("default_scenario")),
+        interpreter_options=_interpreter_options(settings),
+    )
+
+
+def run_router(directory: str, settings: Dict[str, Any]) -> None:
+    """在一个进程中服务目录下的全部场景：每段新对话的首句决定所用场景，脚本修改后自动热加载。"""
+    import asyncio
+
+    from .incremental import IncrementalParser
+
+    registry = ScenarioRegistry(directory, parse=IncrementalParser(max_depth=_max_depth(settings)))
+    registry.start(interval=_cfg_float(settings.get("scenarios") or {}, "reload_interval", 2.0))
+    if not registry.names():
+        sys.exit(f"No .dsl scenarios found in {directory}")
+
+    if not settings.get("log_file"):
+        default_log_dir = pathlib.Path.cwd() / "logs"
+        default_log_dir.mkdir(parents=True, exist_ok=True)
+        settings["log_file"] = str(default_log_dir / "router.log")
+    log_listener = _setup_logging(settings)
+    journal = None
+    try:
+        workers = int(settings.get("workers") or 0)
+        if workers > 1:
+            registry.stop()
+            return _run_router_workers(directory, settings, workers, registry.names())
+        router = _build_router(settings, registry)
+        journal = JournalWriter(settings["journal"]) if settings.get("journal") else None
+
+        print(f"[router] {len(registry.names())} scenarios loaded: {', '.join(registry.names())}. Type 'exit' to quit.")
+        bot = None
+        while True:
+            user_text = input("> ")
+            if user_text.strip().lower() in {"exit", "quit"}:
+                break
+            if bot is None:
+                name, bot = asyncio.run(router.open_session(user_text, journal=journal))
+                if bot is None:
+                    print("抱歉，暂时无法判断您要办理的业务，请换个说法。")
+                    continue
+                logging.info("New conversation session=%s scenario=%s", bot.session_id, name)
+            print(bot.process_input(user_text))
+            if bot.ended:
+                print("Conversation ended.")
+                bot = None
+    except (EOFError, KeyboardInterrupt):
+        # Ctrl-C 也可能发生在等待 LLM 的过程中
+        print()
+    finally:
+        # 日志与审计日志的写入线程是守护线程：必须在退出前排空
+        registry.stop()
+        if journal is not None:
+            journal.close()
+        log_listener.stop()
+
+
+def _worker_router(directory: str, settings: Dict[str, Any]) -> ScenarioRouter:
+    """工作进程内构造路由器（各进程拥有独立的注册表、LLM 客户端与连接池）。
+    场景从父进程编译好的缓存只读映射，多个进程共享同一份页面；热重载时才用
+    parse_script 重新编译（原子替换，进程间无需协调）。"""
+    import functools
+
+    from .compiled import compile_cached
+
+    parse = functools.partial(dsl_parser.parse_script, max_depth=_max_depth(settings))
+    registry = ScenarioRegistry(directory, parse=functools.partial(compile_cached, parse=parse))
+    registry.start(interval=_cfg_float(settings.get("scenarios") or {}, "reload_interval", 2.0))
+    router = _build_router(settings, registry)
+    if settings.get("journal"):
+        # 每个工作进程写各自的日志文件，避免多进程同时追加同一文件
+        router.interpreter_options["journal"] = JournalWriter(f"{settings['journal']}.{os.getpid()}")
+    return router
+
+
+def _run_router_workers(directory: str, settings: Dict[str, Any], workers: int, names: Any) -> None:
+    """多进程模式：会话按 id 分片到各工作进程，对话轮次在对应进程中执行。"""
+    import functools
+    import uuid
+
+    from .loader import load_scenarios
+    from .workers import WorkerError, WorkerPool
+
+    # 启动工作进程前并行编译，工作进程只需映射编译结果
+    report = load_scenarios(directory, workers=workers, compiled=True, recursive=False, open_compiled=False)
+    for path, error in report.errors.items():
+        logging.error("Failed to compile scenario %s: %s", path, error)
+    pool = WorkerPool(
+        functools.partial(_worker_router, directory, settings),
+        num_workers=workers,
+        session_ttl=_cfg_float(settings.get("scenarios") or {}, "session_idle_ttl", 1800.0),
+    )
+    pool.start()
+    print(f"[router] {len(names)} scenarios loaded: {', '.join(names)}; {workers} worker processes. Type 'exit' to quit.")
+    session_id = uuid.uuid4().hex
+    try:
+        while True:
+            try:
+                user_text = input("> ")
+            except (EOFError, KeyboardInterrupt):
+                print()
+                break
+            if user_text.strip().lower() in {"exit", "quit"}:
+                break
+            try:
+                result = pool.handle(session_id, user_text)
+            except WorkerError as exc:
+                print("Error processing input:", exc)
+                session_id = uuid.uuid4().hex
+                continue
+            if result["reply"] is None:
+                print("抱歉，暂时无法判断您要办理的业务，请换个说法。")
+                continue
+            print(result["reply"])
+            if result["ended"]:
+                print("Conversation ended.")
+                session_id = uuid.uuid4().hex
+    finally:
+        pool.stop()
+
+
+def _setup_logging(settings: Dict[str, Any]) -> Any:
+    """按 [logging] 配置启动异步日志（队列 + 后台批量写入 + 按大小轮转）。"""
+    from .logging_setup import DEFAULT_FORMAT, setup_logging
+
+    log_cfg = settings.get("logging") or {}
+
+    def _level(key: str, default: int) -> int:
+        name = (_cfg_value(log_cfg.get(key)) or "").upper()
+        return getattr(logging, name, default) if name else default
+
+    return setup_logging(
+        settings["log_file"],
+        max_bytes=int(_cfg_float(log_cfg, "max_file_size", 10 * 1024 * 1024)),
+        backup_count=int(_cfg_float(log_cfg, "backup_count", 5)),
+        file_level=_level("file_level", logging.INFO),
+        console_level=_level("console_level", logging.WARNING),
+        fmt=log_cfg.get("log_format") or DEFAULT_FORMAT,
+        datefmt=log_cfg.get("date_format") or None,
+        structured=_str_to_bool(_cfg_value(log_cfg.get("structured")), False),
     )
 
 
@@ -217,8 +605,8 @@ def run_demo_scenario(scenario: str, args: argparse.Namespace) -> None:
         settings["model"] = args.model
 
     svc = _build_intent_service(settings, scenario_name=scenario)
-    scen = dsl_parser.parse_script(script_path)
-    bot = interpreter.Interpreter(scen, svc)
+    scen = dsl_parser.parse_script(script_path, _max_depth(settings))
+    bot = interpreter.Interpreter(scen, svc, **_interpreter_options(settings))
     print(f"Running scenario='{scenario}'. use_stub={settings.get('use_stub')}, use_real_llm={settings.get('use_real_llm')}")
     print("Type 'exit' to quit; empty input triggers default branch when idle timeout configured.")
     while True:
@@ -256,6 +644,17 @@ def run_logic() -> None:
     parser.add_argument("--model", help="LLM model name")
     parser.add_argument("--provider", help="LLM provider (openai/aliyun)")
     parser.add_argument("--log-file", dest="log_file", help="Write logs to file (console will show warnings only)")
+    parser.add_argument(
+        "--scenario-dir",
+        dest="scenario_dir",
+        help="Serve every .dsl scenario in this directory, routing each new conversation by its first message",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="With --scenario-dir: number of worker processes to shard conversations across",
+    )
+    parser.add_argument("--journal", help="Append every turn to a binary journal file (see dsl_agent.journal)")
     parser.add_argument(
         "--idle-timeout",
         type=float,
@@ -270,9 +669,11 @@ def run_logic() -> None:
     # If demo option specified, prefer demo flow
     if args.demo:
         return run_demo_scenario(args.demo, args)
+    if args.scenario_dir:
+        return run_router(args.scenario_dir, settings)
     if not args.script:
-        parser.error("script path or --demo must be specified")
-    dsl_scenario = dsl_parser.parse_script(args.script)
+        parser.error("script path, --demo or --scenario-dir must be specified")
+    dsl_scenario = dsl_parser.parse_script(args.script, _max_depth(settings))
 
     # 默认日志目录：项目当前工作目录下 logs/<scenario>.log
     if not settings.get("log_file"):
@@ -283,31 +684,40 @@ def run_logic() -> None:
         log_path = pathlib.Path(settings["log_file"])
         log_path.parent.mkdir(parents=True, exist_ok=True)
 
-    log_handlers = []
-    log_handlers.append(logging.FileHandler(settings["log_file"], encoding="utf-8"))
-    console_handler = logging.StreamHandler()
-    # 控制台仅显示警告以上，避免干扰对话输出
-    console_handler.setLevel(logging.WARNING)
-    log_handlers.append(console_handler)
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
-        handlers=log_handlers,
-    )
-
-    intent_service = _build_intent_service(settings, scenario_name=dsl_scenario.name)
-    bot = interpreter.Interpreter(dsl_scenario, intent_service)
-
+    log_listener = _setup_logging(settings)
+    journal = None
+    bot = None
+    try:
+        intent_service = _build_intent_service(settings, scenario_name=dsl_scenario.name)
+        journal = JournalWriter(settings["journal"]) if settings.get("journal") else None
+        bot = interpreter.Interpreter(dsl_scenario, intent_service, journal=journal, **_interpreter_options(settings))
+        _chat_loop(bot, dsl_scenario.name, settings)
+    except KeyboardInterrupt:
+        # Ctrl-C 也可能发生在等待 LLM 的过程中
+        print()
+    finally:
+        # 日志与审计日志的写入线程是守护线程：必须在退出前排空
+        if bot is not None:
+            print("Conversation ended.")
+        if journal is not None:
+            journal.close()
+        if bot is not None and bot.tracer is not None and bot.tracer.traces:
+            _dump_traces(bot.tracer, settings)
+        log_listener.stop()
+
+
+def _chat_loop(bot: Any, scenario_name: str, settings: Dict[str, Any]) -> None:
+    """单场景 REPL：读取输入直到 exit/EOF 或对话结束。"""
     if settings.get("log_file"):
-        print(f"[{dsl_scenario.name}] ready. Logs -> {settings['log_file']}. Type 'exit' to quit.")
+        print(f"[{scenario_name}] ready. Logs -> {settings['log_file']}. Type 'exit' to quit.")
     else:
-        print(f"[{dsl_scenario.name}] ready. Type 'exit' to quit.")
+        print(f"[{scenario_name}] ready. Type 'exit' to quit.")
 
-    welcome = settings.get("welcome_messages", {}).get(dsl_scenario.name)
+    welcome = settings.get("welcome_messages", {}).get(scenario_name)
     if welcome:
         print(welcome)
     else:
-        print(f"欢迎使用 {dsl_scenario.name}，请输入问题（输入 exit/quit 退出）。")
+        print(f"欢迎使用 {scenario_name}，请输入问题（输入 exit/quit 退出）。")
     idle_timeout = settings.get("idle_timeout")
 
     def read_input_with_timeout(prompt: str) -> Optional[str]:
@@ -318,6 +728,8 @@ def run_logic() -> None:
             except EOFError:
                 return None
         # use select to wait for stdin
+        import select
+
         print(prompt, end="", flush=True)
         rlist, _, _ = select.select([sys.stdin], [], [], idle_timeout)
         if not rlist:
@@ -328,11 +740,7 @@ def run_logic() -> None:
         return line.rstrip("\n")
 
     while True:
-        try:
-            user_text = read_input_with_timeout("> ")
-        except KeyboardInterrupt:
-            print()
-            break
+        user_text = read_input_with_timeout("> ")
         if user_text is None:
             print()
             break
@@ -348,7 +756,16 @@ def run_logic() -> None:
         if bot.ended:
             break
 
-    print("Conversation ended.")
+
+def _dump_traces(tracer: Any, settings: Dict[str, Any]) -> None:
+    """把采样到的轮次写成 Chrome trace JSON（默认与日志文件同目录）。"""
+    interp_cfg = settings.get("dsl_interpreter") or {}
+    path = _cfg_value(interp_cfg.get("trace_file")) or f"{os.path.splitext(settings['log_file'])[0]}.trace.json"
+    try:
+        tracer.dump(path)
+        logging.info("Wrote %d sampled turn traces to %s", len(tracer.traces), path)
+    except OSError:
+        logging.exception("Failed to write trace file %s", path)
 
 
 if __name__ == "__main__":
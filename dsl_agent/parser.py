@@ -1,7 +1,27 @@
 # parser.py
 import re
-from typing import List, Tuple, Optional
+from typing import Iterable, Iterator, List, Tuple, Optional
 from .ast_nodes import *
+from .vm import DEFAULT_MAX_DEPTH, block_depth
+
+# `if cond {` / `while cond {`；条件两侧的括号可省略
+_BLOCK_OPEN = re.compile(r'^(if|while)\s+(.+?)\s*\{$')
+_ELSE = re.compile(r'^else\s*\{$')
+_ELSE_IF = re.compile(r'^else\s+if\s+(.+?)\s*\{$')
+
+# 二元运算符按优先级从低到高分组；同组运算符左结合
+_OPERATOR_GROUPS = [
+    ('or',),
+    ('and',),
+    ('==', '!=', '>=', '<=', '>', '<'),
+    ('+', '-'),
+    ('*', '/'),
+]
+_OPERATOR_LEVEL = {op: level for level, group in enumerate(_OPERATOR_GROUPS) for op in group}
+# 先匹配较长的符号，避免把 '>=' 拆成 '>'
+_SYMBOL_OPERATORS = sorted((op for op in _OPERATOR_LEVEL if not op.isalpha()), key=len, reverse=True)
+_WORD_OPERATORS = [op for op in _OPERATOR_LEVEL if op.isalpha()]
+_OPERATOR_START = frozenset(op[0] for op in _OPERATOR_LEVEL)
 
 class DSLParser:
     """简单的DSL解析器（支持基础语法）"""
@@ -12,25 +32,84 @@ class DSLParser:
     
     def parse(self, script: str) -> List[ASTNode]:
         """解析DSL脚本为AST节点列表"""
-        lines = script.strip().split('\n')
-        statements = []
-        
-        for line in lines:
+        return list(self.iter_statements(script.split('\n')))
+
+    def iter_statements(self, lines: Iterable[str], first_line: int = 1) -> Iterator[ASTNode]:
+        """逐条产出顶层语句；if/while 块跨多行，以 `{` 开始、`}` 结束。
+        first_line 为第一行的行号（解析文件片段时使用）"""
+        stream = self._logical_lines(lines, first_line)
+        for lineno, line in stream:
+            node = self._parse_statement(lineno, line, stream)
+            if node is not None:
+                yield node
+
+    @staticmethod
+    def _logical_lines(lines: Iterable[str], first_line: int = 1) -> Iterator[Tuple[int, str]]:
+        for lineno, line in enumerate(lines, start=first_line):
             line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            # 解析不同类型的语句
-            if line.startswith('response '):
-                statements.append(self._parse_response(line))
-            elif '=' in line and not line.startswith('if') and not line.startswith('while'):
-                statements.append(self._parse_assignment(line))
-            elif line.startswith('if '):
-                # 暂时不支持多行 if 块；标记为未实现以便未来扩展
-                raise SyntaxError('Block statements (if/while) are not supported in this simplified parser')
-        
-        return statements
-    
+            if line and not line.startswith('#'):
+                yield lineno, line
+
+    def _parse_statement(self, lineno: int, line: str, stream: Iterator[Tuple[int, str]]) -> Optional[ASTNode]:
+        # 解析不同类型的语句
+        if line.startswith('response '):
+            return self._with_line(self._parse_response(line), lineno)
+        block = _BLOCK_OPEN.match(line)
+        if block:
+            keyword, condition = block.groups()
+            if keyword == 'if':
+                return self._parse_if(lineno, condition, stream)
+            body, closing, _ = self._parse_block(lineno, stream)
+            if closing != '}':
+                raise SyntaxError(f"line {lineno}: while block cannot have an else branch")
+            return self._with_line(WhileNode(self._parse_expression(condition), body), lineno)
+        if line.startswith('}'):
+            raise SyntaxError(f"line {lineno}: unexpected '}}'")
+        if line.startswith('if ') or line.startswith('while '):
+            raise SyntaxError(f"line {lineno}: block statement must end with '{{': {line}")
+        if '=' in line:
+            return self._with_line(self._parse_assignment(line), lineno)
+        return None
+
+    def _parse_block(self, lineno: int, stream: Iterator[Tuple[int, str]]) -> Tuple[List[ASTNode], str, int]:
+        """读取块内语句直到 `}` 开头的行；返回 (语句, 结束行, 结束行号)"""
+        body: List[ASTNode] = []
+        for inner_lineno, line in stream:
+            if line.startswith('}'):
+                return body, line, inner_lineno
+            node = self._parse_statement(inner_lineno, line, stream)
+            if node is not None:
+                body.append(node)
+        raise SyntaxError(f"line {lineno}: block is not closed with '}}'")
+
+    def _parse_if(self, lineno: int, condition: str, stream: Iterator[Tuple[int, str]]) -> IfNode:
+        then_block, closing, closing_lineno = self._parse_block(lineno, stream)
+        else_block = None
+        rest = closing[1:].strip()
+        if rest:
+            else_if = _ELSE_IF.match(rest)
+            if else_if:
+                # `} else if cond {` 共用外层的结束 `}`
+                else_block = [self._parse_if(closing_lineno, else_if.group(1), stream)]
+            elif _ELSE.match(rest):
+                else_block, end, end_lineno = self._parse_block(closing_lineno, stream)
+                if end != '}':
+                    raise SyntaxError(f"line {end_lineno}: unexpected '{end}' after else block")
+            else:
+                raise SyntaxError(f"line {closing_lineno}: unexpected '{closing}'")
+        return self._with_line(IfNode(self._parse_expression(condition), then_block, else_block), lineno)
+
+    @staticmethod
+    def _with_line(node: ASTNode, lineno: int) -> ASTNode:
+        """记录源码行号（追踪与报错用）"""
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            if current.line is None:
+                current.line = lineno
+            pending.extend(current.children())
+        return node
+
     def _parse_response(self, line: str) -> ResponseNode:
         """解析响应语句: response greeting: "Hello" """
         match = re.match(r'response\s+([^:]+):\s+(.+)', line)
@@ -79,35 +158,31 @@ class DSLParser:
             return BoolNode(expr_str.lower() == 'true')
 
         # 函数调用（支持空参数列表与简单的嵌套逗号分割）
-        if re.match(r"^\w+\(.*\)$", expr_str):
+        if re.match(r"^\w+\(.*\)$", expr_str) and self._is_single_call(expr_str):
             return self._parse_function_call(expr_str)
 
         # 变量名
         if re.match(r'^[A-Za-z_]\w*$', expr_str):
             return VariableNode(expr_str)
 
-        # 二元运算：在最外层(括号深度为0)查找最低优先级运算符
-        ops_precedence = [r'\bor\b', r'\band\b', '==', '!=', '>=', '<=', '>', '<', '\+', '-', '\*', '/']
-        for op in ops_precedence:
-            pos = self._find_top_level_operator(expr_str, op)
-            if pos != -1:
-                left = expr_str[:pos].strip()
-                op_str = expr_str[pos:pos + len(re.findall(op, expr_str[:pos+1]) and op or op)]
-                # For word ops like 'and'/'or' extract by regex match
-                if op.startswith('\\b'):
-                    # regex find at top-level
-                    m = re.search(op, expr_str)
-                    if m:
-                        left = expr_str[:m.start()].strip()
-                        right = expr_str[m.end():].strip()
-                        operator = m.group(0)
-                    else:
-                        continue
-                else:
-                    # symbol operator
-                    operator = expr_str[pos]
-                    right = expr_str[pos + 1:].strip()
-                return BinaryOpNode(operator.strip(), self._parse_expression(left), self._parse_expression(right))
+        # 二元运算：在最外层(括号深度为0、引号之外)查找最低优先级的一组运算符，
+        # 一次切分整条同级链 (a + b - c) 并左结合，避免逐个运算符递归重扫
+        operators = self._top_level_operators(expr_str)
+        if operators:
+            start = 0
+            operands = []
+            for pos, operator in operators:
+                operands.append(expr_str[start:pos])
+                start = pos + len(operator)
+            operands.append(expr_str[start:])
+            node = self._parse_expression(operands[0])
+            for (_, operator), operand in zip(operators, operands[1:]):
+                node = BinaryOpNode(operator, node, self._parse_expression(operand))
+            return node
+
+        # 整体加括号的表达式: (a + b)
+        if expr_str.startswith('(') and self._is_single_call(expr_str):
+            return self._parse_expression(expr_str[1:-1])
 
         # 默认回退为字符串字面量（保留原行为，但不吞掉明显的语法错误）
         return StringNode(expr_str)
@@ -142,47 +217,101 @@ class DSLParser:
 
         return FunctionCallNode(func_name, args)
 
-    def _find_top_level_operator(self, s: str, op_pattern: str) -> int:
-        """在字符串 s 中查找 top-level（不在括号内）的运算符位置，返回第一个匹配的起始索引或 -1。"""
+    def _is_single_call(self, expr_str: str) -> bool:
+        """判断 `f(...)` 的左括号是否与末尾右括号配对（排除 `f(a) + g(b)` 这类表达式）"""
         depth = 0
-        if op_pattern.startswith('\\b'):
-            # word operator handled separately by regex over full string
-            for m in re.finditer(op_pattern, s):
-                # ensure match is at top-level by checking parentheses before match.start()
-                prefix = s[:m.start()]
-                for ch in prefix:
-                    if ch == '(':
-                        depth += 1
-                    elif ch == ')':
-                        depth -= 1
+        quote = None
+        start = expr_str.index('(')
+        for i in range(start, len(expr_str)):
+            ch = expr_str[i]
+            if quote:
+                if ch == quote and expr_str[i - 1] != '\\':
+                    quote = None
+            elif ch in ('"', "'"):
+                quote = ch
+            elif ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
                 if depth == 0:
-                    return m.start()
-            return -1
+                    return i == len(expr_str) - 1
+        return False
 
-        # symbol operator
-        # op_pattern is a literal like '+' or '==' etc.; we search characters
+    def _top_level_operators(self, s: str) -> List[Tuple[int, str]]:
+        """扫描一遍 s，返回最外层（不在括号或引号内）优先级最低的那组运算符 [(位置, 运算符), ...]，没有则为空。"""
+        found: List[List[Tuple[int, str]]] = [[] for _ in _OPERATOR_GROUPS]
+        depth = 0
+        quote = None
         i = 0
-        while i < len(s):
+        n = len(s)
+        while i < n:
             ch = s[i]
-            if ch == '(':
+            if quote:
+                if ch == '\\':
+                    i += 1
+                elif ch == quote:
+                    quote = None
+            elif ch in ('"', "'"):
+                quote = ch
+            elif ch == '(':
                 depth += 1
             elif ch == ')':
                 depth -= 1
-            elif depth == 0:
-                # try to match multi-char ops at this position
-                for op in ['==', '!=', '>=', '<=', '+', '-', '*', '/', '>', '<']:
-                    if s.startswith(op, i):
-                        return i
+            elif depth == 0 and ch in _OPERATOR_START:
+                operator = self._operator_at(s, i)
+                if operator:
+                    found[_OPERATOR_LEVEL[operator]].append((i, operator))
+                    i += len(operator)
+                    continue
             i += 1
-        return -1
+        for group in found:
+            if group:
+                return group
+        return []
+
+    @staticmethod
+    def _operator_at(s: str, i: int) -> Optional[str]:
+        for word in _WORD_OPERATORS:
+            end = i + len(word)
+            if (
+                s.startswith(word, i)
+                and (i == 0 or not (s[i - 1].isalnum() or s[i - 1] == '_'))
+                and (end == len(s) or not (s[end].isalnum() or s[end] == '_'))
+            ):
+                return word
+        for op in _SYMBOL_OPERATORS:
+            if not s.startswith(op, i):
+                continue
+            end = i + len(op)
+            # '>' / '<' 不拆开 '>=' / '<='；单独的 '=' / '!' 不是运算符
+            if len(op) == 1 and s[end:end + 1] == '=':
+                continue
+            if op in ('+', '-'):
+                # 一元正负号（如 `x * -1`、`-2 + y`）不作为二元运算符
+                j = i - 1
+                while j >= 0 and s[j].isspace():
+                    j -= 1
+                if j < 0 or s[j] in '+-*/<>=!(,':
+                    continue
+                # 科学计数法中的指数符号（如 1e-3）
+                if j == i - 1 and s[j] in 'eE':
+                    k = j - 1
+                    while k >= 0 and (s[k].isdigit() or s[k] == '.'):
+                        k -= 1
+                    if k < j - 1 and (k < 0 or not (s[k].isalnum() or s[k] == '_')):
+                        continue
+            return op
+        return None
 
 
 # Lightweight scenario model for compatibility with Interpreter and CLI
 class Transition:
-    def __init__(self, response, next_state: Optional[str] = None):
+    def __init__(self, response, next_state: Optional[str] = None, actions: Optional[List[ASTNode]] = None):
         # response may be a plain string or an ASTNode (to be executed at runtime)
         self.response = response
         self.next_state = next_state
+        # statements (assignments) executed in the session scope before the response
+        self.actions = actions or []
 
 
 class State:
@@ -202,80 +331,127 @@ class Scenario:
         return self._states[name]
 
 
-def parse_script(path) -> Scenario:
-    """Read a simplified DSL file and return a lightweight Scenario.
+class ScenarioBuilder:
+    """按语句顺序构建 Scenario：response 行定义状态的转换，
+    其前面的赋值与 if/while 块作为该转换的动作。"""
 
-    The simplified DSL is expected to contain `response <type>: "..."` lines.
-    This helper maps the first response as the state's default reply and
-    exposes other response types as possible named responses (not used as intents).
-    """
-    from pathlib import Path
-    p = Path(path)
-    text = p.read_text(encoding="utf-8")
-    parser = DSLParser()
-    nodes = parser.parse(text)
-
-    # derive scenario name
-    name = p.stem
-
-    # build states and intents. support response types like "state.intent"
-    states: Dict[str, State] = {}
-    first_state: Optional[str] = None
-
-    try:
-        from .ast_nodes import ResponseNode, StringNode
-    except Exception:
-        ResponseNode = None
-        StringNode = None
-
-    for node in nodes:
-        if ResponseNode and isinstance(node, ResponseNode):
-            resp_type = getattr(node, 'response_type', 'default')
-            content_node = getattr(node, 'content', None)
+    def __init__(self, name: str, max_depth: Optional[int] = DEFAULT_MAX_DEPTH):
+        self.name = name
+        # if/while 块嵌套层数上限（None 或 <= 0 表示不检查）
+        self.max_depth = max_depth
+        # state -> 构成该状态的语句（动作与 response），按出现顺序
+        self.sources: Dict[str, List[ASTNode]] = {}
+        self._first_state: Optional[str] = None
+        self._pending: List[ASTNode] = []
+        self._referenced: List[str] = []
+
+    def add(self, node: ASTNode) -> None:
+        if isinstance(node, (AssignmentNode, IfNode, WhileNode)):
+            if self.max_depth and self.max_depth > 0 and block_depth([node]) > self.max_depth:
+                line = f"line {node.line}: " if node.line else ""
+                raise SyntaxError(f"{line}block nesting exceeds max_execution_depth={self.max_depth}")
+            self._pending.append(node)
+            return
+        if not isinstance(node, ResponseNode):
+            return
+        st, _, next_state = self._split_type(node.response_type)
+        if self._first_state is None:
+            self._first_state = st
+        if next_state:
+            # record reference to possibly forward-declared state
+            self._referenced.append(next_state)
+        sources = self.sources.get(st)
+        if sources is None:
+            sources = self.sources[st] = []
+        sources.extend(self._pending)
+        sources.append(node)
+        self._pending = []
+
+    def _split_type(self, resp_type: str) -> Tuple[str, str, Optional[str]]:
+        # support optional next state: state.intent->nextstate
+        next_state = None
+        if '->' in resp_type:
+            resp_type, next_state = resp_type.split('->', 1)
+        # split state.intent if provided
+        if '.' in resp_type:
+            st, intent = resp_type.split('.', 1)
+        else:
+            st, intent = self.name, resp_type
+        return st, intent, next_state
+
+    def build_state(self, name: str, sources: List[ASTNode]) -> State:
+        state = State(name, intents={}, default=Transition(''))
+        actions: List[ASTNode] = []
+        for node in sources:
+            if not isinstance(node, ResponseNode):
+                actions.append(node)
+                continue
+            _, intent, next_state = self._split_type(node.response_type)
+            content_node = node.content
             # Keep the AST node (do not eagerly execute at parse time) so the
             # interpreter can evaluate it with a runtime context (e.g. llm client).
+            # Literal string values stay plain strings for simple templating.
             if content_node is None:
                 txt = StringNode("")
+            elif isinstance(content_node, StringNode):
+                txt = content_node.value
             else:
-                # Keep literal string values as plain strings for backward
-                # compatibility with tests and simple templating replacement.
-                if StringNode and isinstance(content_node, StringNode):
-                    txt = content_node.value
-                else:
-                    txt = content_node
-
-            # support optional next state: state.intent->nextstate
-            next_state = None
-            if '->' in resp_type:
-                left, next_state = resp_type.split('->', 1)
-                resp_type = left
-                # record reference to possibly forward-declared state
-                if next_state:
-                    referenced_next_states = referenced_next_states if 'referenced_next_states' in locals() else set()
-                    referenced_next_states.add(next_state)
-
-            # split state.intent if provided
-            if '.' in resp_type:
-                st, intent = resp_type.split('.', 1)
-            else:
-                st, intent = name, resp_type
+                txt = content_node
+            state.intents[intent] = Transition(txt, next_state=next_state, actions=actions)
+            # if state has no default yet, set this as default
+            if not state.default.response:
+                state.default = Transition(txt, next_state=next_state, actions=actions)
+            actions = []
+        return state
+
+    def build(self, prebuilt: Optional[Dict[str, State]] = None) -> Scenario:
+        """prebuilt: 已构建好、可直接沿用的状态（增量解析时传入）"""
+        if self._pending:
+            # 动作只附加到其后的 response 行；末尾的动作永远不会执行
+            line = getattr(self._pending[0], "line", None)
+            where = f"line {line}: " if line else ""
+            raise SyntaxError(f"{where}statements after the last response line are never executed")
+        prebuilt = prebuilt or {}
+        states: Dict[str, State] = {}
+        for name, sources in self.sources.items():
+            state = prebuilt.get(name)
+            states[name] = state if state is not None else self.build_state(name, sources)
+        initial = 'start' if 'start' in states else (self._first_state or self.name)
+        # ensure any referenced next-states exist as placeholder states
+        for ns in self._referenced:
+            if ns not in states:
+                states[ns] = State(ns, intents={}, default=Transition(''))
+        return Scenario(name=self.name, initial_state=initial, states=states)
 
-            if first_state is None:
-                first_state = st
 
-            if st not in states:
-                states[st] = State(st, intents={}, default=Transition(''))
+def iter_script_lines(path) -> Iterator[str]:
+    """逐行读取脚本文件：文件以只读方式内存映射，每次只解码一行，
+    不在内存中保留整份文本或行列表。"""
+    import mmap
 
-            states[st].intents[intent] = Transition(txt, next_state=next_state)
-            # if state has no default yet, set this as default
-            if not states[st].default.response:
-                states[st].default = Transition(txt, next_state=next_state)
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            return
+        with mapped:
+            for raw in iter(mapped.readline, b''):
+                yield raw.decode('utf-8')
 
-    initial = 'start' if 'start' in states else (first_state or name)
-    # ensure any referenced next-states exist as placeholder states
-    if 'referenced_next_states' in locals():
-        for ns in referenced_next_states:
-            if ns not in states:
-                states[ns] = State(ns, intents={}, default=Transition(''))
-    scen = Scenario(name=name, initial_state=initial, states=states)
-    return scen
\ No newline at end of file
+
+def parse_script(path, max_depth: Optional[int] = DEFAULT_MAX_DEPTH) -> Scenario:
+    """Read a simplified DSL file and return a lightweight Scenario.
+
+    The simplified DSL is expected to contain `response <type>: "..."` lines.
+    `response state.intent->next: expr` adds a transition to `state`; the first
+    response of a state is also its default transition. The file is streamed:
+    statements are parsed and grouped into states as lines are read.
+    Blocks nested deeper than `max_depth` raise SyntaxError.
+    """
+    from pathlib import Path
+    p = Path(path)
+    builder = ScenarioBuilder(p.stem, max_depth)
+    for node in DSLParser().iter_statements(iter_script_lines(p)):
+        builder.add(node)
+    return builder.build()
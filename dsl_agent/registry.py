@@ -0,0 +1,199 @@
+"""Hot-reloading scenario registry.
+
+`ScenarioRegistry` watches a directory of `.dsl` files by polling. Each poll
+only `stat`s the files; a file is re-read and hashed when its mtime or size
+changed, and re-parsed only when its content hash changed, so reload cost is
+proportional to the files that actually changed. By default the re-parse is
+itself incremental (see incremental.py).
+
+The mapping of current versions is replaced as a whole (copy-on-write), so
+readers never see a half-updated registry and need no lock. Sessions keep a
+reference to the `Scenario` they started with and therefore stay on that
+version until they end; the registry itself only holds weak references to
+retired versions, so they are freed once the last session using them is gone.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .incremental import IncrementalParser
+from .parser import Scenario
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ScenarioVersion:
+    name: str
+    version: int
+    path: str
+    digest: str
+    scenario: Scenario
+
+
+@dataclass
+class _FileStat:
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+class ScenarioRegistry:
+    def __init__(
+        self,
+        directory: str,
+        pattern: str = "*.dsl",
+        parse: Optional[Callable[[str], Scenario]] = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.pattern = pattern
+        # 默认增量解析：只重新解析改动过的语句，未改动的状态沿用上一版本的对象
+        self._parse = parse if parse is not None else IncrementalParser()
+        self._current: Dict[str, ScenarioVersion] = {}
+        self._stats: Dict[str, _FileStat] = {}
+        self._retired: List[weakref.ref] = []
+        # 解析失败的文件：name -> 错误信息（保留旧版本继续服务）
+        self.errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[List[str]], Any]] = []
+
+    # -- 读取（无锁） --
+    def names(self) -> List[str]:
+        return sorted(self._current)
+
+    def get(self, name: str) -> ScenarioVersion:
+        return self._current[name]
+
+    def scenario(self, name: str) -> Scenario:
+        return self._current[name].scenario
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._current
+
+    def retired_alive(self) -> int:
+        """仍被会话引用、尚未释放的旧版本数量。"""
+        self._retired = [ref for ref in self._retired if ref() is not None]
+        return len(self._retired)
+
+    def open_session(self, name: str, intent_service: Any, **kwargs: Any) -> Any:
+        """用当前版本创建会话；会话在结束前一直使用该版本。"""
+        from .interpreter import Interpreter
+
+        return Interpreter(self._current[name].scenario, intent_service, **kwargs)
+
+    def on_reload(self, callback: Callable[[List[str]], Any]) -> None:
+        """注册回调，每次 refresh 有变化时以变化的场景名列表调用。"""
+        self._listeners.append(callback)
+
+    # -- 加载 --
+    def refresh(self) -> List[str]:
+        """扫描目录一次，返回新增、更新或删除的场景名。"""
+        with self._lock:
+            changed: List[str] = []
+            current = self._current
+            updated = dict(current)
+            seen = set()
+            for path in sorted(self.directory.glob(self.pattern)):
+                name = path.stem
+                seen.add(name)
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                key = str(path)
+                old = self._stats.get(key)
+                if old is not None and old.mtime_ns == st.st_mtime_ns and old.size == st.st_size:
+                    continue
+                try:
+                    data = path.read_bytes()
+                except OSError:
+                    continue
+                digest = hashlib.sha1(data).hexdigest()
+                self._stats[key] = _FileStat(st.st_mtime_ns, st.st_size, digest)
+                if name in current and current[name].digest == digest:
+                    # 仅 mtime 变化（如 touch），或解析失败后改回了当前版本的内容：不重新解析
+                    self.errors.pop(name, None)
+                    continue
+                try:
+                    scenario = self._parse_data(key, name, data, digest)
+                except Exception as exc:
+                    logger.exception("Failed to parse scenario %s; keeping previous version", key)
+                    self.errors[name] = str(exc)
+                    continue
+                if scenario is None:
+                    # 解析期间文件又被修改：下次轮询重试
+                    self._stats.pop(key, None)
+                    continue
+                self.errors.pop(name, None)
+                previous = current.get(name)
+                version = previous.version + 1 if previous is not None else 1
+                updated[name] = ScenarioVersion(name, version, key, digest, scenario)
+                if previous is not None:
+                    self._retired.append(weakref.ref(previous.scenario))
+                changed.append(name)
+            for name in list(updated):
+                if name not in seen:
+                    removed = updated.pop(name)
+                    self._retired.append(weakref.ref(removed.scenario))
+                    self._stats.pop(removed.path, None)
+                    forget = getattr(self._parse, "forget", None)
+                    if forget is not None:
+                        forget(removed.path)
+                    changed.append(name)
+            if changed:
+                # 原子替换：读取方要么看到旧映射，要么看到新映射
+                self._current = updated
+                logger.info("Scenario registry reloaded: %s", ", ".join(changed))
+        if changed:
+            for callback in list(self._listeners):
+                try:
+                    callback(changed)
+                except Exception:
+                    logger.exception("Scenario reload callback failed")
+        return changed
+
+    def _parse_data(self, key: str, name: str, data: bytes, digest: str) -> Optional[Scenario]:
+        """解析已读取并计算过摘要的内容，保证记录的摘要与解析结果一致。
+
+        只接受路径的解析函数会自己重新读取文件；此时解析后再校验一次摘要，
+        不一致（解析期间文件被修改）时返回 None。
+        """
+        parse_text = getattr(self._parse, "parse_text", None)
+        if parse_text is not None:
+            return parse_text(data.decode("utf-8"), name, key=key)
+        scenario = self._parse(key)
+        try:
+            current = hashlib.sha1(Path(key).read_bytes()).hexdigest()
+        except OSError:
+            return None
+        return scenario if current == digest else None
+
+    # -- 后台轮询 --
+    def start(self, interval: float = 1.0) -> None:
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval,), name="dsl-scenario-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Scenario registry poll failed")
@@ -0,0 +1,75 @@
+"""Route new conversations to one of many loaded scenarios.
+
+`ScenarioRouter` serves every scenario held by a `ScenarioRegistry` from one
+process. The first message of a conversation is classified with a
+top-level `IntentService` whose labels are the scenario names (state
+`"router"`); the conversation then continues in an `Interpreter` for the
+chosen scenario. Per-scenario intent services come from a factory and are
+created once, so they can share one pooled, rate-limited LLM client (see
+`LLMIntentService.for_scenario`).
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .LLM_integration import IntentService
+from .interpreter import Interpreter
+from .registry import ScenarioRegistry
+
+logger = logging.getLogger(__name__)
+
+ROUTER_STATE = "router"
+
+
+class ScenarioRouter:
+    def __init__(
+        self,
+        registry: ScenarioRegistry,
+        classifier: IntentService,
+        service_factory: Callable[[str], IntentService],
+        default_scenario: Optional[str] = None,
+        interpreter_options: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.registry = registry
+        self.classifier = classifier
+        self._service_factory = service_factory
+        self.default_scenario = default_scenario
+        self.interpreter_options = interpreter_options or {}
+        self._services: Dict[str, IntentService] = {}
+
+    def service_for(self, name: str) -> IntentService:
+        service = self._services.get(name)
+        if service is None:
+            service = self._services[name] = self._service_factory(name)
+        return service
+
+    async def route(self, text: str) -> Optional[str]:
+        """返回应处理该会话的场景名；无法判断且没有默认场景时返回 None。"""
+        names = self.registry.names()
+        if not names:
+            return None
+        try:
+            label = await self.classifier.identify(text, ROUTER_STATE, names)
+        except Exception:
+            logger.exception("Scenario classification failed; using default scenario")
+            label = None
+        if label:
+            # 分类器返回小写标签，按名称不区分大小写匹配
+            by_lower = {name.lower(): name for name in names}
+            chosen = by_lower.get(label.strip().lower())
+            if chosen is not None:
+                return chosen
+        if self.default_scenario in self.registry:
+            return self.default_scenario
+        return None
+
+    async def open_session(self, text: str, **kwargs: Any) -> Tuple[Optional[str], Optional[Interpreter]]:
+        """按首句选择场景并创建会话（固定在当前版本）；无法路由时返回 (None, None)。"""
+        name = await self.route(text)
+        if name is None:
+            return None, None
+        options = dict(self.interpreter_options)
+        options.update(kwargs)
+        logger.info("Routing new conversation to scenario=%s", name)
+        return name, self.registry.open_session(name, self.service_for(name), **options)
@@ -0,0 +1,151 @@
+"""Health-aware load balancing across several LLM endpoints.
+
+`EndpointPool` exposes the same `chat.completions.create` interface as the
+OpenAI SDK and `AliyunShim`, so it can be passed as the `client` of
+`LLMIntentService`. Each call is routed to one endpoint chosen by
+least-outstanding-requests (ties broken by latency EWMA) or by latency EWMA
+weighted by load. Endpoints that fail repeatedly are ejected for an
+exponentially growing period and automatically rejoin afterwards.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import types
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("least_outstanding", "ewma")
+
+
+class Endpoint:
+    """单个上游端点及其被动健康状态。"""
+
+    def __init__(self, name: str, client: Any, model: Optional[str] = None) -> None:
+        self.name = name
+        self.client = client
+        # 不同区域/厂商的模型名可能不同；为空时沿用调用方传入的 model
+        self.model = model
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.name!r}, outstanding={self.outstanding}, ewma={self.ewma_latency})"
+
+
+class NoEndpointAvailable(RuntimeError):
+    pass
+
+
+class EndpointPool:
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        strategy: str = "least_outstanding",
+        failure_threshold: int = 3,
+        base_ejection: float = 5.0,
+        max_ejection: float = 60.0,
+        ewma_alpha: float = 0.3,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("EndpointPool requires at least one endpoint")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+        self.endpoints = list(endpoints)
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.base_ejection = base_ejection
+        self.max_ejection = max_ejection
+        self.ewma_alpha = ewma_alpha
+        self._clock = clock or time.monotonic
+        self._lock = threading.Lock()
+        # 与 OpenAI SDK 相同的调用入口：pool.chat.completions.create(...)
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def select(self) -> Endpoint:
+        now = self._clock()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.is_available(now)]
+            if not candidates:
+                # 全部被剔除时选择最早恢复的端点，避免整体不可用
+                candidates = [min(self.endpoints, key=lambda e: e.ejected_until)]
+            endpoint = min(candidates, key=self._score)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _score(self, endpoint: Endpoint) -> Any:
+        # 尚无延迟样本的端点视为最快，以便尽快获得观测
+        latency = endpoint.ewma_latency or 0.0
+        if self.strategy == "ewma":
+            return latency * (endpoint.outstanding + 1)
+        return (endpoint.outstanding, latency)
+
+    def create(self, model: str, messages: Any, max_tokens: int, temperature: float, timeout: float = 15.0, **kwargs: Any):
+        endpoint = self.select()
+        started = self._clock()
+        try:
+            result = endpoint.client.chat.completions.create(
+                model=endpoint.model or model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                timeout=timeout,
+                **kwargs,
+            )
+        except Exception:
+            self._record_failure(endpoint)
+            raise
+        else:
+            self._record_success(endpoint, self._clock() - started)
+            return result
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def _record_success(self, endpoint: Endpoint, latency: float) -> None:
+        with self._lock:
+            if endpoint.ewma_latency is None:
+                endpoint.ewma_latency = latency
+            else:
+                endpoint.ewma_latency += self.ewma_alpha * (latency - endpoint.ewma_latency)
+            endpoint.consecutive_failures = 0
+            endpoint.ejections = 0
+
+    def _record_failure(self, endpoint: Endpoint) -> None:
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures < self.failure_threshold:
+                return
+            # 被动健康检查：连续失败达到阈值后剔除，剔除时长指数增长
+            duration = min(self.max_ejection, self.base_ejection * (2 ** endpoint.ejections))
+            endpoint.ejections += 1
+            endpoint.consecutive_failures = 0
+            endpoint.ejected_until = self._clock() + duration
+        logger.warning("Ejecting LLM endpoint %s for %.1fs after repeated failures", endpoint.name, duration)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        now = self._clock()
+        with self._lock:
+            return {
+                e.name: {
+                    "outstanding": e.outstanding,
+                    "ewma_latency": e.ewma_latency,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "available": e.is_available(now),
+                }
+                for e in self.endpoints
+            }
@@ -0,0 +1,88 @@
+"""Per-session execution environment for DSL code.
+
+A `Scope` lives as long as its `Interpreter` and is reused for every turn.
+Lookups go through three layers:
+
+1. session variables - written by DSL assignments and kept across turns
+   and states, so a value extracted once (e.g. `city = llm_generate(...)`)
+   can be used later without asking the LLM again. Structured intent
+   entities never land here - they are only reachable through the
+   `entities` turn local, so model output cannot set script state;
+2. turn locals - `user_input`, `state_name`, `state_intents` and
+   `last_response` (plus `intent_confidence` and `entities` when the
+   intent service runs in structured mode), reset in place at the start
+   of each turn;
+3. builtins - services and registered functions, fixed for the session.
+
+Writes go to the turn locals when the key already is a turn local and to
+the session variables otherwise. The scope behaves like the plain context
+dict the AST nodes were written against (`[]`, `in`, `get`).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, MutableMapping, Optional
+
+_MISSING = object()
+
+
+class Scope(MutableMapping):
+    __slots__ = ("variables", "locals", "builtins")
+
+    def __init__(self, builtins: Optional[Dict[str, Any]] = None, variables: Optional[Dict[str, Any]] = None) -> None:
+        self.variables: Dict[str, Any] = variables if variables is not None else {}
+        self.locals: Dict[str, Any] = {}
+        self.builtins: Dict[str, Any] = builtins if builtins is not None else {}
+        # 兼容旧的 context["variables"] / context["functions"] 约定
+        self.builtins.setdefault("variables", self.variables)
+        self.builtins.setdefault("functions", {})
+
+    def begin_turn(self, user_input: str, state_name: str, state_intents: List[str]) -> None:
+        """开始新一轮：原地重置本轮局部变量，会话变量保留。"""
+        local = self.locals
+        local.clear()
+        local["user_input"] = user_input
+        local["state_name"] = state_name
+        local["state_intents"] = state_intents
+        local["last_response"] = None
+
+    def clear_session(self) -> None:
+        self.variables.clear()
+        self.locals.clear()
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.variables.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.locals.get(key, _MISSING)
+            if value is _MISSING:
+                return self.builtins[key]
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self.locals:
+            self.locals[key] = value
+        else:
+            self.variables[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        for layer in (self.variables, self.locals):
+            if key in layer:
+                del layer[key]
+                return
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.variables or key in self.locals or key in self.builtins
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+        for layer in (self.variables, self.locals, self.builtins):
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"Scope(variables={self.variables!r}, locals={list(self.locals)!r})"
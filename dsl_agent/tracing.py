@@ -0,0 +1,186 @@
+"""Opt-in per-node tracing for sampled turns.
+
+`Tracer.should_sample()` decides per turn whether to trace. For a sampled
+turn the interpreter activates a `Trace` in a context variable; every node
+class that implements `execute_async` (wrapped once per class, see
+`ASTNode.__init_subclass__`; literals and variables are not traced) then
+records a span with the node type, source line, wall time and the time
+spent awaiting `intent()` / `llm_generate()`. For unsampled turns the
+wrapper costs one context-variable lookup per node.
+
+Finished traces go to a bounded ring buffer and can be written as Chrome
+trace-event JSON (open in chrome://tracing or Perfetto).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import json
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("dsl_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("dsl_trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "cat", "start", "end", "io", "args", "parent", "tid")
+
+    def __init__(self, name: str, cat: str, start: float, parent: Optional["Span"], tid: int, args: Dict[str, Any]) -> None:
+        self.name = name
+        self.cat = cat
+        self.start = start
+        self.end = start
+        self.io = 0.0
+        self.args = args
+        self.parent = parent
+        self.tid = tid
+
+
+class Trace:
+    def __init__(self, name: str, args: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.args = args or {}
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans: List[Span] = []
+        self._tids: Dict[int, int] = {}
+
+    def _tid(self) -> int:
+        # gather 并发的分支在不同 task 中运行，各自占一条 Chrome 轨道以保证嵌套正确
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task)
+        tid = self._tids.get(key)
+        if tid is None:
+            tid = self._tids[key] = len(self._tids) + 1
+        return tid
+
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str = "dsl", io: bool = False, **args: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        span = Span(name, cat, time.perf_counter(), parent, self._tid(), args)
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+            span.end = time.perf_counter()
+            if io:
+                add_io(span.end - span.start, parent)
+                span.io = span.end - span.start
+            self.spans.append(span)
+
+    def to_events(self, pid: int = 1) -> List[Dict[str, Any]]:
+        base = self.wall_started * 1e6 - self.started * 1e6
+        events = []
+        for span in self.spans:
+            args = dict(span.args)
+            args["io_ms"] = round(span.io * 1000.0, 3)
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.cat,
+                    "ph": "X",
+                    "ts": round(base + span.start * 1e6, 1),
+                    "dur": round((span.end - span.start) * 1e6, 1),
+                    "pid": pid,
+                    "tid": span.tid,
+                    "args": args,
+                }
+            )
+        return events
+
+
+def add_io(seconds: float, span: Optional[Span] = None) -> None:
+    """把等待 I/O 的时间计入当前 span 及其所有祖先。"""
+    span = span if span is not None else _current_span.get()
+    while span is not None:
+        span.io += seconds
+        span = span.parent
+
+
+@contextlib.contextmanager
+def io_wait() -> Iterator[None]:
+    """包裹对外部服务的 await；未采样时几乎无开销。"""
+    if current_trace.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_io(time.perf_counter() - started)
+
+
+@contextlib.contextmanager
+def span(name: str, cat: str = "dsl", io: bool = False, **args: Any) -> Iterator[Optional[Span]]:
+    """在当前追踪中记录一个 span；当前轮未采样时不做任何事。"""
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, cat, io=io, **args) as current:
+        yield current
+
+
+def traced(execute_async: Callable[..., Any]) -> Callable[..., Any]:
+    """包装 ASTNode.execute_async：仅在当前轮被采样时记录 span。"""
+
+    @functools.wraps(execute_async)
+    async def wrapper(self: Any, context: Any) -> Any:
+        trace = current_trace.get()
+        if trace is None:
+            return await execute_async(self, context)
+        with trace.span(type(self).__name__, "ast", line=getattr(self, "line", None), expr=repr(self)[:80]):
+            return await execute_async(self, context)
+
+    wrapper._traced = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+class Tracer:
+    def __init__(
+        self,
+        sample_rate: float = 1.0,
+        capacity: int = 100,
+        rng: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.traces: Deque[Trace] = deque(maxlen=capacity)
+        self._rng = rng or random.random
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or self._rng() < self.sample_rate)
+
+    @contextlib.contextmanager
+    def turn(self, name: str = "turn", **args: Any) -> Iterator[Optional[Trace]]:
+        """对采样到的轮次激活追踪；未采样时产出 None。"""
+        if not self.should_sample():
+            yield None
+            return
+        trace = Trace(name, args)
+        token = current_trace.set(trace)
+        try:
+            with trace.span(name, "turn", **args):
+                yield trace
+        finally:
+            current_trace.reset(token)
+            self.traces.append(trace)
+
+    def to_chrome(self) -> Dict[str, Any]:
+        events: List[Dict[str, Any]] = []
+        for pid, trace in enumerate(self.traces, start=1):
+            events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"{trace.name} #{pid}"}})
+            events.extend(trace.to_events(pid))
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f, ensure_ascii=False)
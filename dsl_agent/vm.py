@@ -0,0 +1,153 @@
+"""Flat execution of transition actions.
+
+`compile_program()` turns a list of statements (assignments, responses,
+calls and nested `if`/`while` blocks) into a flat instruction list. Control
+flow becomes jumps, so `Program.run()` is a single loop with no recursion
+per block or loop iteration, and branching on variables already in the
+session scope costs no LLM round trip. Expressions are still AST
+nodes evaluated with `execute_async`, so `intent()` / `llm_generate()` and
+tracing behave exactly as before.
+
+Instructions are `(opcode, node, target)` tuples:
+
+- `EXEC node`           evaluate a statement, discard the result;
+- `JUMP_IF_FALSE node`  evaluate a condition, jump to `target` if falsy;
+- `JUMP`                jump to `target`.
+
+Limits: block nesting is checked against `max_depth`
+(`[dsl_interpreter] max_execution_depth`) when the scenario is built -
+`ScenarioBuilder` rejects an over-deep block with `SyntaxError`, so a bad
+script fails to load instead of failing every turn - and again when a
+program is compiled; `max_steps`
+(`[dsl_interpreter] max_execution_steps`, `DEFAULT_MAX_STEPS` when not
+set) bounds the number of instructions executed per run, which stops
+runaway `while` loops. Node coroutines that only touch the scope never
+suspend, so `run()` also yields to the event loop every
+`YIELD_INTERVAL` instructions: other sessions keep running and the
+per-turn deadline can still cancel a long loop.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, List, MutableMapping, Optional, Sequence, Tuple
+
+from .ast_nodes import ASTNode, IfNode, WhileNode
+
+EXEC = 0
+JUMP_IF_FALSE = 1
+JUMP = 2
+
+_OPCODE_NAMES = {EXEC: "EXEC", JUMP_IF_FALSE: "JUMP_IF_FALSE", JUMP: "JUMP"}
+
+# 未配置 max_execution_steps 时每次执行的指令数上限
+DEFAULT_MAX_STEPS = 10000
+# 解析场景时默认允许的块嵌套层数（与 config.ini 中 max_execution_depth 的默认值一致）
+DEFAULT_MAX_DEPTH = 10
+# 每执行这么多条指令让出一次事件循环
+YIELD_INTERVAL = 1000
+
+Instruction = Tuple[int, Optional[ASTNode], int]
+
+
+class ExecutionLimitError(RuntimeError):
+    """超出 max_execution_depth / max_execution_steps 限制"""
+
+
+class Program:
+    __slots__ = ("code",)
+
+    def __init__(self, code: Sequence[Instruction]) -> None:
+        self.code: Tuple[Instruction, ...] = tuple(code)
+
+    def __len__(self) -> int:
+        return len(self.code)
+
+    async def run(self, context: MutableMapping[str, Any], max_steps: Optional[int] = None) -> int:
+        """执行指令序列，返回执行的指令数。max_steps 为 None 时使用 DEFAULT_MAX_STEPS，<= 0 表示不限。"""
+        code = self.code
+        end = len(code)
+        if max_steps is None:
+            max_steps = DEFAULT_MAX_STEPS
+        budget = max_steps if max_steps > 0 else -1
+        pc = 0
+        steps = 0
+        while pc < end:
+            if steps == budget:
+                raise ExecutionLimitError(f"exceeded max_execution_steps={max_steps}")
+            steps += 1
+            if steps % YIELD_INTERVAL == 0:
+                await asyncio.sleep(0)
+            op, node, target = code[pc]
+            if op == EXEC:
+                await node.execute_async(context)
+                pc += 1
+            elif op == JUMP_IF_FALSE:
+                pc = pc + 1 if await node.execute_async(context) else target
+            else:
+                pc = target
+        return steps
+
+    def disassemble(self) -> str:
+        lines = []
+        for pc, (op, node, target) in enumerate(self.code):
+            text = f"{pc:4d} {_OPCODE_NAMES[op]:<14}"
+            if op != EXEC:
+                text += f" -> {target}"
+            if node is not None:
+                text += f"  {node!r}".replace("\n", " ")
+            lines.append(text.rstrip())
+        return "\n".join(lines)
+
+
+def block_depth(statements: Sequence[ASTNode], depth: int = 1) -> int:
+    """语句的最大嵌套层数，计法与 compile_program 的 max_depth 检查相同（顶层为 1）。"""
+    deepest = depth
+    for stmt in statements:
+        if isinstance(stmt, IfNode):
+            deepest = max(deepest, block_depth(stmt.then_block, depth + 1), block_depth(stmt.else_block or [], depth + 1))
+        elif isinstance(stmt, WhileNode):
+            deepest = max(deepest, block_depth(stmt.body, depth + 1))
+    return deepest
+
+
+def compile_program(statements: Sequence[ASTNode], max_depth: Optional[int] = None) -> Program:
+    """把语句（含嵌套 if/while 块）编译为扁平指令序列。"""
+    code: List[list] = []
+
+    def emit(block: Sequence[ASTNode], depth: int) -> None:
+        if max_depth is not None and max_depth > 0 and depth > max_depth:
+            raise ExecutionLimitError(f"block nesting exceeds max_execution_depth={max_depth}")
+        for stmt in block:
+            if isinstance(stmt, IfNode):
+                branch = len(code)
+                code.append([JUMP_IF_FALSE, stmt.condition, -1])
+                emit(stmt.then_block, depth + 1)
+                if stmt.else_block:
+                    skip = len(code)
+                    code.append([JUMP, None, -1])
+                    code[branch][2] = len(code)
+                    emit(stmt.else_block, depth + 1)
+                    code[skip][2] = len(code)
+                else:
+                    code[branch][2] = len(code)
+            elif isinstance(stmt, WhileNode):
+                loop = len(code)
+                code.append([JUMP_IF_FALSE, stmt.condition, -1])
+                emit(stmt.body, depth + 1)
+                code.append([JUMP, None, loop])
+                code[loop][2] = len(code)
+            else:
+                code.append([EXEC, stmt, -1])
+
+    emit(statements, 1)
+    return Program([(op, node, target) for op, node, target in code])
+
+
+def program_for(transition: Any, max_depth: Optional[int] = None) -> Program:
+    """返回转换动作的编译结果；按 max_depth 缓存在转换对象上，场景内只编译一次。"""
+    cached = getattr(transition, "_program", None)
+    if cached is not None and cached[0] == max_depth:
+        return cached[1]
+    program = compile_program(transition.actions, max_depth)
+    transition._program = (max_depth, program)
+    return program
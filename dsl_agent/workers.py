@@ -0,0 +1,339 @@
+"""Multi-process serving.
+
+`WorkerPool` is a supervisor that shards conversations across N worker
+processes by `crc32(session_id) % N`, so every turn of a session lands on
+the same worker (sticky routing) where its `Interpreter` lives. Each worker
+runs its own event loop and builds its own `ScenarioRouter` (and therefore
+its own LLM client / connection pool) from a picklable factory.
+
+The supervisor pings every worker periodically; a worker that died or did
+not answer the previous ping within `health_timeout` (e.g. stuck in a
+CPU-bound evaluation) is terminated and restarted. Turns pending on that
+worker fail with `WorkerError`, and its sessions start over on the next
+message.
+
+Sessions normally end when the conversation ends or on `end_session`;
+sessions that receive no turn for `session_ttl` seconds (abandoned
+clients) are dropped by a periodic sweep in the worker.
+
+Spawned workers start with an unconfigured `logging`. With `forward_logs`
+(the default), each worker's root logger sends its records through a
+queue to the supervisor. The supervisor re-emits them through its own
+handlers, so per-turn records end up in the parent's log file, and that
+file keeps a single writer that rotates it.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import itertools
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerError(RuntimeError):
+    """工作进程崩溃、重启或拒绝了请求。"""
+
+
+def _worker_main(
+    factory: Callable[[], Any],
+    requests: Any,
+    responses: Any,
+    session_ttl: Optional[float] = None,
+    log_queue: Any = None,
+    log_level: int = logging.INFO,
+) -> None:
+    if log_queue is not None:
+        # spawn 出的进程没有日志配置：全部记录交给监督进程的 handler 写出
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(log_level)
+    asyncio.run(_serve(factory, requests, responses, session_ttl))
+
+
+async def _serve(factory: Callable[[], Any], requests: Any, responses: Any, session_ttl: Optional[float] = None) -> None:
+    router = factory()
+    sessions: Dict[str, Any] = {}
+    locks: Dict[str, asyncio.Lock] = {}
+    last_used: Dict[str, float] = {}
+    tasks: set = set()
+    loop = asyncio.get_running_loop()
+
+    def drop(session_id: str) -> None:
+        sessions.pop(session_id, None)
+        locks.pop(session_id, None)
+        last_used.pop(session_id, None)
+
+    async def sweep(ttl: float) -> None:
+        # 长时间没有新消息的会话（客户端已离开）释放其 Interpreter 与作用域
+        while True:
+            await asyncio.sleep(max(0.05, min(ttl / 2, 60.0)))
+            cutoff = loop.time() - ttl
+            for session_id in [sid for sid, t in last_used.items() if t < cutoff]:
+                lock = locks.get(session_id)
+                if lock is None or not lock.locked():
+                    drop(session_id)
+
+    async def handle_turn(req_id: int, session_id: str, text: str) -> None:
+        try:
+            lock = locks.setdefault(session_id, asyncio.Lock())
+            last_used[session_id] = loop.time()
+            # 同一会话的各轮按顺序执行
+            async with lock:
+                bot = sessions.get(session_id)
+                if bot is None:
+                    _, bot = await router.open_session(text, session_id=session_id)
+                    if bot is None:
+                        drop(session_id)
+                        responses.put((req_id, True, {"reply": None, "scenario": None, "state": None, "ended": True}))
+                        return
+                    sessions[session_id] = bot
+                reply = await bot.process_input_async(text)
+                payload = {
+                    "reply": reply,
+                    "scenario": getattr(bot.scenario, "name", None),
+                    "state": bot.current_state,
+                    "ended": bot.ended,
+                }
+                if bot.ended:
+                    drop(session_id)
+                else:
+                    last_used[session_id] = loop.time()
+            responses.put((req_id, True, payload))
+        except Exception as exc:
+            logger.exception("Worker failed to process turn for session=%s", session_id)
+            responses.put((req_id, False, repr(exc)))
+
+    sweeper = loop.create_task(sweep(session_ttl)) if session_ttl else None
+    while True:
+        msg = await loop.run_in_executor(None, requests.get)
+        if msg is None:
+            break
+        kind, req_id = msg[0], msg[1]
+        if kind == "ping":
+            # 在事件循环中直接应答：循环被阻塞时 ping 超时，监督进程据此判定卡死
+            responses.put((req_id, True, {"pid": os.getpid(), "sessions": len(sessions)}))
+        elif kind == "end":
+            drop(msg[2])
+            responses.put((req_id, True, None))
+        elif kind == "turn":
+            task = loop.create_task(handle_turn(req_id, msg[2], msg[3]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    if sweeper is not None:
+        sweeper.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class _Worker:
+    def __init__(self, index: int, generation: int, process: Any, requests: Any, responses: Any) -> None:
+        self.index = index
+        self.generation = generation
+        self.process = process
+        self.requests = requests
+        self.responses = responses
+        self.pending: Dict[int, concurrent.futures.Future] = {}
+        self.ping: Optional[concurrent.futures.Future] = None
+        self.ping_sent = 0.0
+        self.retired = False
+        self.reader: Optional[threading.Thread] = None
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        num_workers: Optional[int] = None,
+        health_interval: float = 5.0,
+        health_timeout: float = 10.0,
+        start_method: str = "spawn",
+        session_ttl: Optional[float] = 1800.0,
+        forward_logs: bool = True,
+    ) -> None:
+        # factory 需可 pickle（模块级函数或 functools.partial），在每个工作进程中构造 ScenarioRouter
+        self.factory = factory
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        # 会话空闲超过该秒数后在工作进程中释放；None 或 <= 0 表示不清理
+        self.session_ttl = session_ttl if session_ttl and session_ttl > 0 else None
+        # 工作进程的日志记录转发到本进程，由本进程已配置的 handler 写出
+        self.forward_logs = forward_logs
+        self._ctx = multiprocessing.get_context(start_method)
+        self._log_queue: Any = None
+        self._log_thread: Optional[threading.Thread] = None
+        self._workers: List[_Worker] = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+        self.restarts = 0
+
+    # -- 生命周期 --
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._stop.clear()
+        if self.forward_logs:
+            self._log_queue = self._ctx.Queue()
+            self._log_thread = threading.Thread(target=self._forward_logs, name="dsl-worker-logs", daemon=True)
+            self._log_thread.start()
+        self._workers = [self._spawn(i, 0) for i in range(self.num_workers)]
+        self._monitor = threading.Thread(target=self._health_loop, name="dsl-worker-health", daemon=True)
+        self._monitor.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+        for worker in self._workers:
+            worker.requests.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout)
+            self._retire(worker, "worker pool stopped")
+        self._workers = []
+        if self._log_thread is not None:
+            # 工作进程已退出，队列中剩余的记录写完后结束转发线程
+            self._log_queue.put(None)
+            self._log_thread.join()
+            self._log_thread = None
+            self._log_queue = None
+
+    def __enter__(self) -> "WorkerPool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # -- 请求 --
+    def worker_for(self, session_id: str) -> int:
+        return zlib.crc32(session_id.encode("utf-8")) % self.num_workers
+
+    def submit(self, session_id: str, text: str) -> concurrent.futures.Future:
+        """提交一轮对话；结果为 {"reply", "scenario", "state", "ended"}。"""
+        return self._send(self.worker_for(session_id), "turn", session_id, text)
+
+    def handle(self, session_id: str, text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.submit(session_id, text).result(timeout)
+
+    def end_session(self, session_id: str) -> None:
+        self._send(self.worker_for(session_id), "end", session_id)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "index": w.index,
+                "pid": w.process.pid,
+                "alive": w.process.is_alive(),
+                "generation": w.generation,
+                "pending": len(w.pending),
+            }
+            for w in self._workers
+        ]
+
+    def _send(self, index: int, kind: str, *args: Any) -> concurrent.futures.Future:
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            if not self._workers:
+                raise WorkerError("worker pool is not running")
+            worker = self._workers[index]
+            req_id = next(self._ids)
+            worker.pending[req_id] = fut
+        worker.requests.put((kind, req_id) + args)
+        return fut
+
+    # -- 内部 --
+    def _spawn(self, index: int, generation: int) -> _Worker:
+        requests = self._ctx.Queue()
+        responses = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.factory, requests, responses, self.session_ttl, self._log_queue, logging.getLogger().getEffectiveLevel()),
+            name=f"dsl-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        worker = _Worker(index, generation, process, requests, responses)
+        worker.reader = threading.Thread(target=self._read, args=(worker,), name=f"dsl-worker-reader-{index}", daemon=True)
+        worker.reader.start()
+        logger.info("Started worker %d pid=%s", index, process.pid)
+        return worker
+
+    def _forward_logs(self) -> None:
+        while True:
+            try:
+                record = self._log_queue.get()
+            except (EOFError, OSError):
+                break
+            if record is None:
+                break
+            # logger.handle 不再检查级别：工作进程已按同样的级别过滤
+            logging.getLogger(record.name).handle(record)
+
+    def _read(self, worker: _Worker) -> None:
+        while not worker.retired:
+            try:
+                req_id, ok, payload = worker.responses.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                fut = worker.pending.pop(req_id, None)
+            if fut is None or fut.done():
+                continue
+            if ok:
+                fut.set_result(payload)
+            else:
+                fut.set_exception(WorkerError(payload))
+
+    def _retire(self, worker: _Worker, reason: str) -> None:
+        worker.retired = True
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join(1.0)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+        with self._lock:
+            pending, worker.pending = worker.pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(WorkerError(reason))
+
+    def _restart(self, worker: _Worker, reason: str) -> None:
+        logger.warning("Restarting worker %d pid=%s: %s", worker.index, worker.process.pid, reason)
+        self._retire(worker, f"worker restarted: {reason}")
+        replacement = self._spawn(worker.index, worker.generation + 1)
+        with self._lock:
+            self._workers[worker.index] = replacement
+        self.restarts += 1
+
+    def _health_loop(self) -> None:
+        while not self._stop.wait(self.health_interval):
+            for worker in list(self._workers):
+                if self._stop.is_set():
+                    return
+                if not worker.process.is_alive():
+                    self._restart(worker, f"exited with code {worker.process.exitcode}")
+                    continue
+                if worker.ping is not None and not worker.ping.done():
+                    if time.monotonic() - worker.ping_sent > self.health_timeout:
+                        self._restart(worker, "health check timed out")
+                    continue
+                worker.ping_sent = time.monotonic()
+                worker.ping = self._send(worker.index, "ping")
@@ -0,0 +1,46 @@
+import pytest
+
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.parser import parse_script
+
+
+class FirstIntentService:
+    """确定性的意图服务：总是选当前状态的第一个意图；generate 返回 "gen:<prompt>"。"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def identify(self, text, state, intents):
+        self.calls += 1
+        return intents[0] if intents else None
+
+    async def generate(self, prompt, **kwargs):
+        return f"gen:{prompt}"
+
+
+@pytest.fixture
+def intent_service():
+    return FirstIntentService()
+
+
+@pytest.fixture
+def write_scenario(tmp_path):
+    """把脚本文本写成 tmp_path/<name>.dsl 并返回路径。"""
+
+    def write(text, name="demo"):
+        path = tmp_path / f"{name}.dsl"
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    return write
+
+
+@pytest.fixture
+def make_bot(write_scenario, intent_service):
+    """写入脚本、解析并创建 Interpreter；默认使用 intent_service fixture。"""
+
+    def make(text, service=None, name="demo", **kwargs):
+        scenario = parse_script(str(write_scenario(text, name)))
+        return Interpreter(scenario, service if service is not None else intent_service, **kwargs)
+
+    return make
@@ -47,4 +47,38 @@ def test_llm_intent_service_unknown_returns_none(monkeypatch):
     svc = LLMIntentService(api_base="http://example", api_key="k", model="m", client=client)
 
     result = asyncio.run(svc.identify("hi", "start", ["greeting"]))
-    assert result is None
\ No newline at end of file
+    assert result is None
+
+class _RecordingCompletions:
+    def __init__(self):
+        self.messages = []
+
+    def create(self, **kwargs):
+        self.messages.append(kwargs["messages"])
+        return _DummyResp("ASK_ORDER")
+
+
+def test_llm_intent_prompt_prefix_is_stable_and_memoized():
+    completions = _RecordingCompletions()
+    client = type("Client", (), {"chat": type("Chat", (), {"completions": completions})()})()
+    svc = LLMIntentService(
+        api_base="http://example",
+        api_key="k",
+        model="m",
+        client=client,
+        intent_descriptions={"ask_order": "查询订单"},
+    )
+    intents = ["ask_order", "ask_flight"]
+    assert asyncio.run(svc.identify("first", "routing", intents)) == "ask_order"
+    assert asyncio.run(svc.identify("second", "routing", intents)) == "ask_order"
+
+    first, second = completions.messages
+    assert first[0] == second[0]  # identical system message
+    prefix = svc._prompt_prefix("routing", intents)
+    assert "ask_order: 查询订单" in prefix
+    assert first[1]["content"].startswith(prefix) and first[1]["content"].endswith('"first".')
+    assert second[1]["content"].startswith(prefix)
+    # 前缀与意图集合只构造一次
+    assert svc._prompt_prefix("routing", intents) is prefix
+    assert svc._intent_set(intents) == frozenset({"ask_order", "ask_flight"})
+    assert len(svc._intent_sets) == 1
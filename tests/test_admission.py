@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from dsl_agent.admission import BATCH, INTERACTIVE, AdmissionController, LoadShedError, TokenBucket
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.LLM_integration import LLMIntentService
+from dsl_agent import parser
+
+
+def test_token_bucket_refills_over_time():
+    now = [0.0]
+    bucket = TokenBucket(rate=2.0, capacity=2.0, clock=lambda: now[0])
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.time_until_available() == pytest.approx(0.5)
+    now[0] = 0.5
+    assert bucket.try_acquire()
+
+
+def test_interactive_requests_are_admitted_before_batch():
+    order = []
+
+    async def run():
+        ctl = AdmissionController(max_concurrency=1)
+        await ctl.acquire()  # occupy the only slot
+
+        async def worker(name, priority):
+            async with ctl.admit(priority=priority):
+                order.append(name)
+
+        batch = asyncio.ensure_future(worker("batch", BATCH))
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(worker("interactive", INTERACTIVE))
+        await asyncio.sleep(0)
+        ctl.release()
+        await asyncio.gather(batch, interactive)
+
+    asyncio.run(run())
+    assert order == ["interactive", "batch"]
+
+
+def test_sheds_when_expected_delay_exceeds_budget():
+    async def run():
+        ctl = AdmissionController(bucket=TokenBucket(rate=1.0, capacity=1.0), max_queue_delay=0.2)
+        await ctl.acquire()
+        ctl.release()
+        with pytest.raises(LoadShedError):
+            await ctl.acquire()
+        return ctl.shed
+
+    assert asyncio.run(run()) == 1
+
+
+def test_full_queue_preempts_lower_priority():
+    async def run():
+        ctl = AdmissionController(max_concurrency=1, max_queue=1)
+        await ctl.acquire()
+        batch = asyncio.ensure_future(ctl.acquire(priority=BATCH))
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(ctl.acquire(priority=INTERACTIVE))
+        await asyncio.sleep(0)
+        with pytest.raises(LoadShedError):
+            await batch
+        ctl.release()
+        await interactive
+
+    asyncio.run(run())
+
+
+class _Client:
+    def __init__(self):
+        self.calls = 0
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.calls += 1
+        msg = type("Msg", (), {"content": "greeting"})
+        return type("Resp", (), {"choices": [type("Choice", (), {"message": msg})()]})()
+
+
+def test_shed_turn_answers_with_state_default():
+    scen = parser.parse_script("scenario/travel_bot.dsl")
+    client = _Client()
+    ctl = AdmissionController(bucket=TokenBucket(rate=0.001, capacity=1.0), max_queue_delay=0.1)
+    svc = LLMIntentService(api_base="http://example", api_key="k", model="m", client=client, admission=ctl)
+    bot = Interpreter(scen, svc)
+    assert "欢迎" in bot.process_input("hi")
+    bot.reset()
+    reply = bot.process_input("hi")
+    # second call is shed; the default transition is used without calling the provider
+    assert reply == "您好，欢迎使用旅行客服。请问您需要查询哪一项？"
+    assert client.calls == 1
+
+
+def test_shipped_config_does_not_throttle_by_default():
+    from dsl_agent.logic import _build_admission, _load_config
+
+    cfg = _load_config("config.ini")
+    settings = {"security": cfg["security"], "admission": cfg["admission"]}
+    # enable_rate_limit = true alone no longer installs a bucket
+    assert _build_admission(settings) is None
+
+    settings["admission"] = dict(cfg["admission"], enable_admission="true")
+    controller = _build_admission(settings)
+    # burst defaults to rate_limit_requests
+    assert controller.bucket.capacity == 100
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from dsl_agent.parser import DSLParser
+
+
+class SlowService:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def _enter(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+
+    async def identify(self, text, state, intents):
+        await self._enter()
+        return "greeting"
+
+    async def generate(self, prompt, max_tokens=None, temperature=None):
+        await self._enter()
+        return f"<{prompt}>"
+
+
+def _context(svc):
+    return {"intent_service": svc, "llm_client": svc, "state_name": "start", "state_intents": ["greeting"]}
+
+
+def test_binary_op_runs_llm_calls_concurrently():
+    node = DSLParser()._parse_expression('llm_generate("a") + llm_generate("b")')
+    svc = SlowService(0.2)
+    start = time.perf_counter()
+    result = asyncio.run(node.execute_async(_context(svc)))
+    elapsed = time.perf_counter() - start
+    assert result == "<a><b>"  # 结果顺序保持从左到右
+    assert svc.peak == 2
+    assert elapsed < 0.35
+
+
+def test_function_args_run_concurrently():
+    node = DSLParser()._parse_expression('f(intent(x), llm_generate(y))')
+    svc = SlowService(0.05)
+    ctx = _context(svc)
+    ctx.update({"x": "hi", "y": "there", "functions": {"f": lambda a, b: f"{a}|{b}"}})
+    assert asyncio.run(node.execute_async(ctx)) == "greeting|<there>"
+    assert svc.peak == 2
+
+
+def test_side_effecting_siblings_stay_sequential():
+    p = DSLParser()
+    node = p._parse_expression('f(llm_generate("a"), llm_generate("b"))')
+    # 用户函数作为参数时不可并发
+    node.args[1] = p._parse_expression('g(llm_generate("b"))')
+    svc = SlowService(0.01)
+    ctx = _context(svc)
+    ctx["functions"] = {"f": lambda a, b: a + b, "g": lambda v: v}
+    assert asyncio.run(node.execute_async(ctx)) == "<a><b>"
+    assert svc.peak == 1
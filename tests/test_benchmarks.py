@@ -0,0 +1,42 @@
+import json
+
+from benchmarks import run
+from benchmarks.cases import CASES
+
+
+def test_every_case_runs():
+    for name, factory in CASES.items():
+        op = factory()
+        op()
+        assert run.measure(op, min_time=0.0, repeat=1) > 0, name
+
+
+def test_compare_flags_regressions_relative_to_calibration():
+    base = {"ns": 1000.0, "score": 10.0}
+    baseline = {"benchmarks": {"a": base, "b": base, "c": base}}
+    # 本机校准慢一倍：a 实际未变慢，b 超出阈值，c 明显变快
+    results = {"a": (2000.0, 200.0), "b": (3000.0, 200.0), "c": (1000.0, 200.0), "d": (5.0, 200.0)}
+    rows = run.compare(results, baseline, 0.3)
+    status = {row["name"]: row["status"] for row in rows}
+    assert status == {"a": "ok", "b": "REGRESSED", "c": "improved", "d": "new"}
+
+
+def test_runner_exit_code_and_update(tmp_path):
+    path = tmp_path / "baseline.json"
+    args = ["--filter", "llm.normalize_result", "--baseline", str(path), "--min-time", "0.001", "--repeat", "1", "--retries", "0"]
+    assert run.main(args + ["--update"]) == 0
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert list(data["benchmarks"]) == ["llm.normalize_result"]
+
+    data["benchmarks"]["llm.normalize_result"]["score"] /= 100
+    path.write_text(json.dumps(data), encoding="utf-8")
+    assert run.main(args) == 1
+    assert run.main(args + ["--threshold", "1000"]) == 0
+
+
+def test_case_threshold_only_loosens_the_global_one():
+    baseline = {"benchmarks": {"tiny": {"ns": 100.0, "score": 1.0}, "big": {"ns": 100.0, "score": 1.0}}}
+    results = {"tiny": (170.0, 100.0), "big": (170.0, 100.0)}
+    rows = run.compare(results, baseline, 0.5, {"tiny": 1.0, "big": 0.1})
+    status = {row["name"]: row["status"] for row in rows}
+    assert status == {"tiny": "ok", "big": "REGRESSED"}
@@ -0,0 +1,58 @@
+import asyncio
+
+from dsl_agent.cache import GenerationCache
+from dsl_agent.LLM_integration import LLMIntentService
+
+
+class _DummyResp:
+    def __init__(self, content: str):
+        self.choices = [type("Choice", (), {"message": type("Msg", (), {"content": content})})()]
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return _DummyResp(f"answer {self.calls}")
+
+
+def _service(cache, **kwargs):
+    client = CountingClient()
+    svc = LLMIntentService(api_base="http://example", api_key="k", model="m", client=client, generation_cache=cache, **kwargs)
+    return svc, client
+
+
+def test_deterministic_generation_is_cached():
+    svc, client = _service(GenerationCache())
+    first = asyncio.run(svc.generate("hello"))
+    second = asyncio.run(svc.generate("hello"))
+    assert first == second == "answer 1"
+    assert client.calls == 1
+
+
+def test_non_deterministic_and_bypass_skip_cache():
+    svc, client = _service(GenerationCache())
+    asyncio.run(svc.generate("hello", temperature=0.7))
+    asyncio.run(svc.generate("hello", temperature=0.7))
+    assert client.calls == 2
+    asyncio.run(svc.generate("hello"))
+    asyncio.run(svc.generate("hello", use_cache=False))
+    assert client.calls == 4
+
+
+def test_cache_evicts_by_bytes_and_ttl():
+    now = [0.0]
+    cache = GenerationCache(max_bytes=300, ttl=10.0, clock=lambda: now[0])
+    for i in range(5):
+        cache.put(cache.make_key("m", f"prompt {i}", 8, 0.0), "x" * 40)
+    assert cache.current_bytes <= 300
+    assert cache.get(cache.make_key("m", "prompt 0", 8, 0.0)) is None
+    assert cache.get(cache.make_key("m", "prompt 4", 8, 0.0)) == "x" * 40
+    now[0] = 11.0
+    assert cache.get(cache.make_key("m", "prompt 4", 8, 0.0)) is None
+    # 超过总上限的单个条目不会被缓存
+    cache.put(cache.make_key("m", "big", 8, 0.0), "y" * 1000)
+    assert len(cache) == 0 or cache.get(cache.make_key("m", "big", 8, 0.0)) is None
@@ -0,0 +1,72 @@
+import asyncio
+import time
+import types
+
+from dsl_agent.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from dsl_agent.LLM_integration import LLMIntentService, StubIntentService
+
+
+class FlakyClient:
+    def __init__(self):
+        self.fail = True
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise TimeoutError("upstream timeout")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content="ask_order"))])
+
+
+def test_breaker_state_transitions():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, open_duration=10.0, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+
+    now[0] = 10.0
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False  # only one probe at a time
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(failure_threshold=1, slow_call_threshold=1.0)
+    breaker.record_success(0.5)
+    assert breaker.state == CLOSED
+    breaker.record_success(2.0)
+    assert breaker.state == OPEN
+
+
+def test_open_breaker_degrades_to_local_fallback_fast():
+    now = [0.0]
+    client = FlakyClient()
+    breaker = CircuitBreaker(failure_threshold=2, open_duration=30.0, clock=lambda: now[0])
+    fallback = StubIntentService(mapping={"routing": {"订单": "ask_order"}})
+    svc = LLMIntentService(
+        api_base="http://example", api_key="k", model="m", client=client,
+        max_retries=3, circuit_breaker=breaker, fallback_service=fallback,
+    )
+    # first turn: two failed attempts open the breaker, the third attempt is skipped
+    assert asyncio.run(svc.identify("查订单", "routing", ["ask_order"])) == "ask_order"
+    assert client.calls == 2
+    assert breaker.state == OPEN
+
+    start = time.perf_counter()
+    assert asyncio.run(svc.identify("我的订单", "routing", ["ask_order"])) == "ask_order"
+    assert time.perf_counter() - start < 0.1
+    assert client.calls == 2
+    assert asyncio.run(svc.generate("hello")) is None
+
+    # provider recovers: half-open probe succeeds and closes the breaker
+    client.fail = False
+    now[0] = 31.0
+    assert asyncio.run(svc.identify("anything", "routing", ["ask_order"])) == "ask_order"
+    assert client.calls == 3
+    assert breaker.state == CLOSED
@@ -0,0 +1,100 @@
+import os
+from pathlib import Path
+
+from dsl_agent.compiled import CompiledScenario, compile_cached, write_compiled
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.parser import parse_script
+
+SCENARIO_DIR = Path(__file__).resolve().parents[1] / "scenario"
+
+
+def _describe(scenario, names):
+    out = {}
+    for name in names:
+        state = scenario.get_state(name)
+        out[name] = (
+            {k: (repr(t.response), t.next_state) for k, t in state.intents.items()},
+            (repr(state.default.response), state.default.next_state),
+        )
+    return out
+
+
+def test_compiled_matches_parsed_for_all_scenarios(tmp_path):
+    for script in sorted(SCENARIO_DIR.glob("*.dsl")):
+        parsed = parse_script(str(script))
+        target = tmp_path / f"{script.stem}.dslc"
+        write_compiled(parsed, str(target))
+        compiled = CompiledScenario(str(target))
+        assert compiled.name == parsed.name
+        assert compiled.initial_state == parsed.initial_state
+        names = sorted(parsed._states)
+        assert sorted(compiled.state_names()) == names
+        assert _describe(compiled, names) == _describe(parsed, names)
+        compiled.close()
+
+
+def test_compiled_scenario_runs_and_cache_is_reused(tmp_path, write_scenario, intent_service):
+    script = write_scenario('response start.greet->next: llm_generate("hi " + user_input)\nresponse next.greet: "bye"\n')
+    first = compile_cached(str(script))
+    bot = Interpreter(first, intent_service)
+    assert bot.process_input("bob") == "gen:hi bob"
+    assert bot.process_input("x") == "bye"
+    cache = tmp_path / "__dslcache__" / "demo.dslc"
+    mtime = cache.stat().st_mtime_ns
+    second = compile_cached(str(script))
+    assert cache.stat().st_mtime_ns == mtime
+    assert second.get_state("start").intents["greet"].next_state == "next"
+
+    script.write_text('response start.greet: "changed"\n', encoding="utf-8")
+    st = script.stat()
+    os.utime(script, ns=(st.st_atime_ns, mtime + 10**9))
+    assert compile_cached(str(script)).get_state("start").intents["greet"].response == "changed"
+
+
+def test_cache_follows_content_not_mtime(tmp_path):
+    script = tmp_path / "demo.dsl"
+    script.write_text('response start.greet: "old"\n', encoding="utf-8")
+    old_mtime = script.stat().st_mtime_ns
+    compile_cached(str(script)).close()
+
+    # cp -p / rsync -a：新内容带着更早的 mtime
+    script.write_text('response start.greet: "new"\n', encoding="utf-8")
+    os.utime(script, ns=(old_mtime - 10**9, old_mtime - 10**9))
+    assert compile_cached(str(script)).get_state("start").intents["greet"].response == "new"
+
+
+def _lines(nodes):
+    out = []
+    pending = list(reversed(nodes))
+    while pending:
+        node = pending.pop()
+        out.append((type(node).__name__, node.line))
+        pending.extend(reversed(node.children()))
+    return out
+
+
+def test_source_lines_survive_compilation(tmp_path, write_scenario):
+    script = write_scenario(
+        "count = 0\n"
+        "\n"
+        "while count < 2 {\n"
+        "    count = count + 1\n"
+        "}\n"
+        'if user_input == "vip" {\n'
+        '    response start.vip: "hi"\n'
+        "}\n"
+        'response start.ask->start: llm_generate("count " + user_input)\n'
+    )
+    parsed = parse_script(str(script))
+    target = tmp_path / "lines.dslc"
+    write_compiled(parsed, str(target))
+    compiled = CompiledScenario(str(target))
+    try:
+        want = parsed.get_state("start").intents["ask"]
+        got = compiled.get_state("start").intents["ask"]
+        assert _lines(got.actions) == _lines(want.actions)
+        assert _lines([got.response]) == _lines([want.response])
+        assert [line for _, line in _lines(got.actions)][:3] == [1, 1, 3]
+        assert got.response.line == 9
+    finally:
+        compiled.close()
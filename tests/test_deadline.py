@@ -0,0 +1,88 @@
+import asyncio
+import time
+import types
+
+from dsl_agent import deadline, parser
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.LLM_integration import LLMIntentService
+
+
+class SlowIntentService:
+    def __init__(self, delay):
+        self.delay = delay
+        self.cancelled = False
+
+    async def identify(self, text, state, intents):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return "greeting"
+
+    async def generate(self, prompt, **kwargs):
+        await asyncio.sleep(self.delay)
+        return "late"
+
+
+def test_deadline_scope_nests_and_caps_timeouts():
+    assert deadline.remaining() is None
+    assert deadline.cap_timeout(15.0) == 15.0
+    with deadline.deadline_scope(1.0):
+        with deadline.deadline_scope(10.0):
+            assert deadline.remaining() <= 1.0
+            assert deadline.cap_timeout(15.0) <= 1.0
+    assert deadline.remaining() is None
+
+
+def test_slow_intent_is_cancelled_and_turn_uses_default():
+    scen = parser.parse_script("scenario/travel_bot.dsl")
+    svc = SlowIntentService(5.0)
+    bot = Interpreter(scen, svc, max_execution_time=0.1)
+
+    async def run():
+        start = time.perf_counter()
+        reply = await bot.process_input_async("hi")
+        return reply, time.perf_counter() - start
+
+    reply, elapsed = asyncio.run(run())
+    assert elapsed < 1.0
+    assert svc.cancelled
+    assert reply == "您好，欢迎使用旅行客服。请问您需要查询哪一项？"
+    assert bot.current_state == "routing"
+
+
+def test_slow_generation_times_out_with_per_call_timeout():
+    path = "tests/test_data/llm_generate_scenario.dsl"
+    scen = parser.parse_script(path)
+    svc = SlowIntentService(0.0)
+
+    async def slow_generate(prompt, **kwargs):
+        return await asyncio.sleep(5.0, result="late")
+
+    svc.generate = slow_generate
+    bot = Interpreter(scen, svc)
+    assert bot.process_input("hello", timeout=0.1) == ""
+
+
+def test_llm_http_timeout_capped_and_retries_skipped():
+    seen = []
+
+    class Client:
+        def __init__(self):
+            self.chat = types.SimpleNamespace(completions=self)
+
+        def create(self, timeout, **kwargs):
+            seen.append(timeout)
+            time.sleep(0.15)
+            raise TimeoutError("slow upstream")
+
+    svc = LLMIntentService(api_base="http://example", api_key="k", model="m", client=Client(), max_retries=5)
+
+    def call():
+        with deadline.deadline_scope(0.2):
+            return svc._call_llm("prompt")
+
+    assert call() is None
+    assert len(seen) < 5
+    assert all(t <= 0.2 for t in seen)
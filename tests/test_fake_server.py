@@ -0,0 +1,96 @@
+import asyncio
+import importlib
+import sys
+import time
+
+import pytest
+
+from dsl_agent.aliyun_shim import AliyunShim
+from benchmarks.fake_server import FakeLLMServer, Rule, count_tokens, fixed, parse_latency
+from dsl_agent.LLM_integration import LLMIntentService
+
+openai = pytest.importorskip("openai")
+
+RULES = [
+    Rule(r"余额", "balance"),
+    Rule(r"转账", "transfer"),
+    Rule(r"greeting", lambda messages: "您好，" + messages[-1]["content"][-6:]),
+]
+
+
+def _service(server, **kwargs):
+    client = openai.OpenAI(api_key="k", base_url=server.base_url, max_retries=kwargs.pop("sdk_retries", 0))
+    return LLMIntentService(api_base=server.base_url, api_key="k", model="m", client=client, **kwargs)
+
+
+def test_intent_service_over_http():
+    with FakeLLMServer(rules=RULES) as server:
+        svc = _service(server)
+        assert asyncio.run(svc.identify("我想查余额", "start", ["balance", "transfer"])) == "balance"
+        assert asyncio.run(svc.identify("随便聊聊", "start", ["balance", "transfer"])) is None
+        assert server.stats["requests"] == 2
+        assert server.requests[0]["model"] == "m"
+
+
+def test_completion_usage_and_streaming():
+    with FakeLLMServer(script=["第一条 scripted reply"]) as server:
+        client = openai.OpenAI(api_key="k", base_url=server.base_url, max_retries=0)
+        messages = [{"role": "user", "content": "hello world"}]
+        completion = client.chat.completions.create(model="m", messages=messages)
+        assert completion.choices[0].message.content == "第一条 scripted reply"
+        assert completion.usage.prompt_tokens == count_tokens("hello world") == 2
+        assert completion.usage.total_tokens == completion.usage.prompt_tokens + completion.usage.completion_tokens
+
+        server.default_reply = "streamed answer in pieces"
+        stream = client.chat.completions.create(
+            model="m", messages=messages, stream=True, stream_options={"include_usage": True}
+        )
+        pieces, usage = [], None
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+            usage = chunk.usage or usage
+        assert "".join(pieces) == "streamed answer in pieces"
+        assert len(pieces) == 4 and usage.completion_tokens == 4
+        assert server.stats["streamed"] == 1
+
+
+def test_error_injection_and_latency():
+    with FakeLLMServer(rules=RULES, latency=fixed(0.05)) as server:
+        server.fail_next(429)
+        svc = _service(server, max_retries=2)
+        started = time.perf_counter()
+        assert asyncio.run(svc.identify("转账给张三", "start", ["balance", "transfer"])) == "transfer"
+        # 一次注入的 429 + 一次成功，每次至少 50ms
+        assert time.perf_counter() - started >= 0.1
+        assert server.stats["429"] == 1 and server.stats["requests"] == 2
+
+        server.fail_next(503)
+        client = openai.OpenAI(api_key="k", base_url=server.base_url, max_retries=0)
+        with pytest.raises(openai.InternalServerError):
+            client.chat.completions.create(model="m", messages=[{"role": "user", "content": "余额"}])
+        assert server.stats["errors"] == 2
+
+
+def test_parse_latency():
+    import random
+
+    rng = random.Random(1)
+    assert parse_latency("fixed:0.2")(rng) == 0.2
+    assert 0.1 <= parse_latency("uniform:0.1:0.3")(rng) <= 0.3
+    assert parse_latency("lognormal:0.2:0.5")(rng) > 0
+    with pytest.raises(ValueError):
+        parse_latency("pareto:1")
+
+
+def test_aliyun_shim_over_http(monkeypatch):
+    # 其他测试可能把 requests 替换为假模块；这里确保使用真实的 requests
+    monkeypatch.delitem(sys.modules, "requests", raising=False)
+    monkeypatch.setitem(sys.modules, "requests", importlib.import_module("requests"))
+    with FakeLLMServer(rules=RULES) as server:
+        shim = AliyunShim(api_base=server.url, api_key="k", api_secret="s")
+        result = shim.create(
+            model="m", messages=[{"role": "user", "content": "greeting 张三"}], max_tokens=8, temperature=0.0
+        )
+        assert result.choices[0].message.content == "您好，ing 张三"
+        assert server.requests[0]["messages"][0]["content"] == "greeting 张三"
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+from dsl_agent.hedging import HedgePolicy
+from dsl_agent.LLM_integration import LLMIntentService
+
+
+class _DummyResp:
+    def __init__(self, content: str):
+        self.choices = [type("Choice", (), {"message": type("Msg", (), {"content": content})})()]
+
+
+class SlowClient:
+    def __init__(self, delays, content="ask_order"):
+        self._delays = list(delays)
+        self._lock = threading.Lock()
+        self.content = content
+        self.calls = 0
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        with self._lock:
+            delay = self._delays[self.calls] if self.calls < len(self._delays) else 0.0
+            self.calls += 1
+        time.sleep(delay)
+        return _DummyResp(self.content)
+
+
+def test_policy_delay_tracks_percentile_and_budget():
+    policy = HedgePolicy(percentile=0.95, initial_delay=2.0, min_samples=5, max_hedge_ratio=0.5)
+    assert policy.delay() == 2.0
+    for ms in range(1, 21):
+        policy.record_latency(ms / 100)
+    assert abs(policy.delay() - 0.19) < 1e-9
+    assert policy.try_acquire() is False
+    policy.record_request()
+    policy.record_request()
+    assert policy.try_acquire() is True
+    assert policy.try_acquire() is False
+    assert policy.metrics()["hedges_fired"] == 1
+
+
+def test_hedge_fires_and_secondary_wins():
+    primary = SlowClient([0.5])
+    secondary = SlowClient([0.0])
+    policy = HedgePolicy(initial_delay=0.05, max_hedge_ratio=1.0)
+    svc = LLMIntentService(
+        api_base="http://example", api_key="k", model="m",
+        client=primary, hedge_policy=policy, hedge_client=secondary,
+    )
+
+    async def run():
+        start = time.perf_counter()
+        result = await svc.identify("hi", "routing", ["ask_order"])
+        return result, time.perf_counter() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == "ask_order"
+    assert elapsed < 0.4
+    assert secondary.calls == 1
+    assert policy.hedges_fired == 1 and policy.hedges_won == 1
+
+
+def test_hedge_respects_budget():
+    primary = SlowClient([0.1])
+    policy = HedgePolicy(initial_delay=0.01, max_hedge_ratio=0.0)
+    svc = LLMIntentService(api_base="http://example", api_key="k", model="m", client=primary, hedge_policy=policy)
+    assert asyncio.run(svc.identify("hi", "routing", ["ask_order"])) == "ask_order"
+    assert primary.calls == 1
+    assert policy.hedges_fired == 0
@@ -0,0 +1,85 @@
+import asyncio
+
+from dsl_agent.incremental import IncrementalParser, split_chunks
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.parser import parse_script
+
+
+def _catalog(n, price=10):
+    lines = []
+    for i in range(n):
+        lines.append(f"stock_{i} = {price + i}")
+        lines.append(f'response item{i}.ask->item{i}: "商品 {i} 价格 {{stock_{i}}}"')
+    return "\n".join(lines) + "\n"
+
+
+def test_split_chunks_keeps_blocks_together():
+    text = 'x = 1\n\nif x == 1 {\n  y = 2\n} else {\n  y = 3\n}\nresponse start.a: "ok"\n'
+    assert [start for start, _ in split_chunks(text)] == [1, 3, 8]
+
+
+def test_only_changed_lines_are_reparsed(tmp_path, intent_service):
+    path = tmp_path / "catalog.dsl"
+    path.write_text(_catalog(200), encoding="utf-8")
+    parse = IncrementalParser()
+    first = parse(str(path))
+    assert parse.stats.parsed == parse.stats.chunks == 400
+
+    text = _catalog(200).replace("stock_7 = 17", "stock_7 = 99")
+    path.write_text(text, encoding="utf-8")
+    second = parse(str(path))
+    assert parse.stats.parsed == 1
+    assert parse.stats.states_reused == 199
+    assert second is not first
+    assert second.get_state("item8") is first.get_state("item8")
+    assert second.get_state("item7") is not first.get_state("item7")
+
+    bot = Interpreter(second, intent_service)
+    bot._current_state = "item7"
+    assert asyncio.run(bot.process_input_async("多少钱")) == "商品 7 价格 99.0"
+
+
+def test_inserted_lines_shift_reused_statements(tmp_path):
+    path = tmp_path / "catalog.dsl"
+    path.write_text(_catalog(3), encoding="utf-8")
+    parse = IncrementalParser()
+    parse(str(path))
+    path.write_text("# header\n\n" + _catalog(3), encoding="utf-8")
+    scenario = parse(str(path))
+    assert parse.stats.parsed == 0
+
+    expected = parse_script(str(path))
+    for name in ("item0", "item1", "item2"):
+        got = scenario.get_state(name).intents["ask"]
+        want = expected.get_state(name).intents["ask"]
+        assert [a.line for a in got.actions] == [a.line for a in want.actions]
+        assert got.response == want.response
+
+
+def test_failed_build_leaves_cache_untouched(tmp_path):
+    import pytest
+
+    path = tmp_path / "catalog.dsl"
+    path.write_text(_catalog(2), encoding="utf-8")
+    parse = IncrementalParser()
+    parse(str(path))
+    path.write_text("\n\n" + _catalog(2) + "x = 1\n", encoding="utf-8")
+    with pytest.raises(SyntaxError):
+        parse(str(path))
+    path.write_text(_catalog(2), encoding="utf-8")
+    scenario = parse(str(path))
+    assert parse.stats.parsed == 0
+    assert scenario.get_state("item1").intents["ask"].actions[0].line == 3
+
+
+def test_shifting_lines_leaves_previous_version_untouched(tmp_path):
+    path = tmp_path / "catalog.dsl"
+    path.write_text(_catalog(2), encoding="utf-8")
+    parse = IncrementalParser()
+    old = parse(str(path))
+    before = [a.line for a in old.get_state("item1").intents["ask"].actions]
+    path.write_text("# header\n\n" + _catalog(2), encoding="utf-8")
+    new = parse(str(path))
+    assert parse.stats.parsed == 0
+    assert [a.line for a in old.get_state("item1").intents["ask"].actions] == before
+    assert [a.line for a in new.get_state("item1").intents["ask"].actions] == [line + 2 for line in before]
@@ -0,0 +1,77 @@
+import struct
+
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.journal import JournalReader, JournalWriter, TurnRecord
+from dsl_agent.parser import Scenario, State, Transition
+
+
+def _record(i):
+    return TurnRecord(
+        session_id="s1",
+        scenario="demo",
+        state="start",
+        intent="查询余额",
+        next_state="start" if i % 2 else "",
+        user_input=f"第{i}句",
+        reply=f"reply {i}",
+        started_at=1000.0 + i,
+        elapsed_ms=1.5,
+        intent_ms=0.5,
+    )
+
+
+def test_round_trip_with_index(tmp_path):
+    path = str(tmp_path / "turns.journal")
+    with JournalWriter(path, sync=False) as writer:
+        for i in range(50):
+            writer.append(_record(i))
+    with JournalReader(path) as reader:
+        assert reader.indexed
+        assert len(reader) == 50
+        assert reader[7] == _record(7)
+        assert [r.user_input for r in reader][-1] == "第49句"
+
+
+def test_reopen_appends_and_recovers_torn_tail(tmp_path):
+    path = tmp_path / "turns.journal"
+    with JournalWriter(str(path), sync=False) as writer:
+        writer.append(_record(0))
+    with JournalWriter(str(path), sync=False) as writer:
+        writer.append(_record(1))
+    # 模拟崩溃：没有索引尾，且最后一条记录只写了一半
+    data = path.read_bytes()
+    (footer_start,) = struct.unpack_from("<Q", data, len(data) - 12)
+    path.write_bytes(data[:footer_start] + _record(2).encode()[:10])
+    with JournalReader(str(path)) as reader:
+        assert not reader.indexed
+        assert [r.user_input for r in reader] == ["第0句", "第1句"]
+    with JournalWriter(str(path), sync=False) as writer:
+        writer.append(_record(3))
+    with JournalReader(str(path)) as reader:
+        assert reader.indexed
+        assert [r.user_input for r in reader] == ["第0句", "第1句", "第3句"]
+
+
+class FakeIntentService:
+    async def identify(self, text, state, intents):
+        return "greet"
+
+
+def test_interpreter_journals_each_turn(tmp_path):
+    start = State(
+        "start",
+        intents={"greet": Transition("hi {user_input}", next_state="start")},
+        default=Transition("?", next_state="start"),
+    )
+    scenario = Scenario("demo", "start", {"start": start})
+    path = str(tmp_path / "demo.journal")
+    writer = JournalWriter(path, sync=False)
+    bot = Interpreter(scenario, FakeIntentService(), journal=writer, session_id="abc")
+    bot.process_input("hello")
+    bot.process_input("again")
+    writer.close()
+    with JournalReader(path) as reader:
+        records = list(reader)
+    assert [r.reply for r in records] == ["hi hello", "hi again"]
+    assert records[0].session_id == "abc" and records[0].intent == "greet"
+    assert records[0].elapsed_ms >= records[0].intent_ms
@@ -47,3 +47,17 @@ def test_llm_generate_demo_scenario():
     bot = Interpreter(scen, svc)
     reply = bot.process_input("world")
     assert "Hello from LLM" in reply
+
+
+def test_llm_generate_cache_flag_only_passed_when_accepted(tmp_path):
+    class LegacyStub:
+        async def identify(self, text, state, intents):
+            return None
+
+        async def generate(self, prompt, max_tokens=None, temperature=None):
+            return "stub:" + prompt
+
+    path = tmp_path / "legacy.dsl"
+    path.write_text('response start.default: llm_generate("X:" + user_input, false)', encoding="utf-8")
+    bot = Interpreter(parser.parse_script(str(path)), LegacyStub())
+    assert bot.process_input("hi") == "stub:X:hi"
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from dsl_agent.compiled import CompiledScenario
+from dsl_agent.loader import load_scenarios, main
+
+
+def _write_tree(root):
+    (root / "bank.dsl").write_text('response start.hello: "hi"\n', encoding="utf-8")
+    (root / "broken.dsl").write_text("if x {\n  y = 1\n", encoding="utf-8")
+    sub = root / "more"
+    sub.mkdir()
+    (sub / "shop.dsl").write_text('response start.buy->start: "ok"\n', encoding="utf-8")
+    (sub / "bank.dsl").write_text('response start.dup: "dup"\n', encoding="utf-8")
+
+
+def test_load_scenarios_in_process_pool(tmp_path):
+    _write_tree(tmp_path)
+    report = load_scenarios(str(tmp_path), workers=2)
+    assert report.workers == 2
+    assert sorted(report.scenarios) == ["bank", "shop"]
+    assert report.scenarios["shop"].get_state("start").intents["buy"].response == "ok"
+    errors = report.errors
+    assert "SyntaxError" in errors[str(tmp_path / "broken.dsl")]
+    assert "duplicate" in errors[str(tmp_path / "more" / "bank.dsl")]
+    assert len(report.files) == 4 and all(f.seconds >= 0 for f in report.files)
+
+
+def test_load_scenarios_compiled(tmp_path):
+    _write_tree(tmp_path)
+    cache = tmp_path / "cache"
+    report = load_scenarios(str(tmp_path), workers=1, compiled=True, cache_dir=str(cache), recursive=False)
+    assert sorted(report.scenarios) == ["bank"]
+    scenario = report.scenarios["bank"]
+    assert isinstance(scenario, CompiledScenario)
+    assert scenario.get_state("start").intents["hello"].response == "hi"
+    scenario.close()
+
+
+def test_load_scenarios_compiled_without_mapping(tmp_path):
+    _write_tree(tmp_path)
+    cache = tmp_path / "cache"
+    report = load_scenarios(
+        str(tmp_path), workers=2, compiled=True, cache_dir=str(cache), recursive=False, open_compiled=False
+    )
+    assert report.scenarios == {"bank": str(cache / "bank.dslc")}
+    scenario = CompiledScenario(report.scenarios["bank"])
+    assert scenario.get_state("start").intents["hello"].response == "hi"
+    scenario.close()
+
+
+def test_cli_reports_errors(tmp_path, capsys):
+    _write_tree(tmp_path)
+    with pytest.raises(SystemExit) as exc:
+        main([str(tmp_path), "--workers", "1", "--json"])
+    assert exc.value.code == 1
+    out = json.loads(capsys.readouterr().out)
+    assert len(out["files"]) == 4
@@ -0,0 +1,101 @@
+import json
+import logging
+
+from dsl_agent.logging_setup import BatchingRotatingFileHandler, JsonFormatter, setup_logging
+
+
+def _record(msg, **extra):
+    record = logging.LogRecord("dsl_agent.interpreter", logging.INFO, __file__, 1, msg, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_handler_rotates_by_size(tmp_path):
+    path = tmp_path / "bot.log"
+    handler = BatchingRotatingFileHandler(str(path), maxBytes=200, backupCount=2, encoding="utf-8", delay=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.begin_batch()
+    for i in range(20):
+        handler.handle(_record("x" * 30 + str(i)))
+    handler.end_batch()
+    handler.close()
+    assert path.stat().st_size < 200
+    assert (tmp_path / "bot.log.1").exists()
+    assert (tmp_path / "bot.log.2").exists()
+    assert not (tmp_path / "bot.log.3").exists()
+
+
+def test_json_formatter_expands_turn_record():
+    line = JsonFormatter().format(_record("turn done", turn={"state": "start", "intent": "greeting", "elapsed_ms": 1.5}))
+    data = json.loads(line)
+    assert data["message"] == "turn done"
+    assert data["state"] == "start" and data["intent"] == "greeting"
+
+
+def test_setup_logging_writes_through_background_listener(tmp_path):
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    path = tmp_path / "bot.log"
+    listener = setup_logging(str(path), structured=True)
+    try:
+        logging.getLogger("dsl_agent.interpreter").info("turn", extra={"turn": {"state": "s1"}})
+    finally:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved_handlers:
+            root.addHandler(handler)
+        root.setLevel(saved_level)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1])["state"] == "s1"
+
+
+def test_listener_stop_drains_queued_records(tmp_path):
+    import queue
+
+    from dsl_agent.logging_setup import BatchingQueueListener
+
+    path = tmp_path / "bot.log"
+    handler = BatchingRotatingFileHandler(str(path), encoding="utf-8", delay=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log_queue = queue.Queue()
+    listener = BatchingQueueListener(log_queue, handler, batch_size=8)
+    for i in range(100):
+        log_queue.put(_record(f"line {i}"))
+    listener.start()
+    listener.stop()
+    handler.close()
+    assert path.read_text(encoding="utf-8").splitlines()[-1] == "line 99"
+
+
+def test_cli_shuts_down_on_ctrl_c_during_a_turn(monkeypatch, tmp_path):
+    from dsl_agent import logic
+
+    closed = []
+
+    class FakeListener:
+        def stop(self):
+            closed.append("log")
+
+    class FakeJournal:
+        def __init__(self, path):
+            pass
+
+        def close(self):
+            closed.append("journal")
+
+    def interrupted(self, text, timeout=None):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(logic, "_setup_logging", lambda settings: FakeListener())
+    monkeypatch.setattr(logic, "JournalWriter", FakeJournal)
+    monkeypatch.setattr(logic.interpreter.Interpreter, "process_input", interrupted)
+    monkeypatch.setattr("builtins.input", lambda prompt="": "hi")
+    monkeypatch.setattr(
+        "sys.argv",
+        ["main", "scenario/flight_booking.dsl", "--use-stub", "--journal", str(tmp_path / "j"), "--log-file", str(tmp_path / "x.log")],
+    )
+    logic.run_logic()
+    assert closed == ["journal", "log"]
@@ -0,0 +1,42 @@
+import tracemalloc
+
+from dsl_agent.parser import DSLParser, iter_script_lines, parse_script
+
+
+def test_iter_script_lines_matches_split(tmp_path):
+    path = tmp_path / "demo.dsl"
+    text = 'x = 1\r\n\r\n# 注释\nresponse start.a: "好"\nresponse start.b: "ok"'
+    path.write_bytes(text.encode("utf-8"))
+    lines = list(iter_script_lines(path))
+    assert [line.strip() for line in lines] == [line.strip() for line in text.split("\n")]
+
+    empty = tmp_path / "empty.dsl"
+    empty.write_bytes(b"")
+    assert list(iter_script_lines(empty)) == []
+    assert parse_script(str(empty)).name == "empty"
+
+
+def test_streaming_parse_has_flat_memory_footprint(tmp_path):
+    path = tmp_path / "big.dsl"
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(20000):
+            f.write("# generated catalog padding " + "x" * 100 + "\n")
+        f.write('response start.a: "ok"\n')
+
+    tracemalloc.start()
+    try:
+        scenario = parse_script(str(path))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert scenario.get_state("start").intents["a"].response == "ok"
+    # 文件约 2.5MB；逐行读取时峰值只与单行及 AST 大小有关
+    assert peak < path.stat().st_size // 10
+
+
+def test_block_line_numbers_when_streaming(tmp_path):
+    path = tmp_path / "blocks.dsl"
+    path.write_text('\nif a {\n  b = 1\n}\nresponse start.x: "y"\n', encoding="utf-8")
+    action = parse_script(str(path)).get_state("start").intents["x"].actions[0]
+    assert action.line == 2 and action.then_block[0].line == 3
+    assert [n.line for n in DSLParser().parse(path.read_text(encoding="utf-8"))] == [2, 5]
@@ -37,3 +37,56 @@ def test_binary_ops_without_spaces():
     # top-level '+' expected, right side is '2*3'
     assert b.op == '+'
     assert isinstance(b.right, BinaryOpNode)
+
+
+def test_trailing_statements_without_response_are_rejected(tmp_path):
+    import pytest
+
+    from dsl_agent.parser import parse_script
+
+    path = tmp_path / "trailing.dsl"
+    path.write_text('response start.a: "ok"\nx = 1\nif x == 1 {\n  y = 2\n}\n', encoding="utf-8")
+    with pytest.raises(SyntaxError, match="line 2: statements after the last response line"):
+        parse_script(str(path))
+
+
+def _eval(expr, **variables):
+    return DSLParser()._parse_expression(expr).execute(dict(variables, variables={}, functions={}))
+
+
+def test_operator_chains_are_left_associative():
+    assert repr(DSLParser()._parse_expression('10 - 3 - 2')) == '((10.0 - 3.0) - 2.0)'
+    assert _eval('10 - 3 - 2') == 5
+    assert _eval('8 / 4 / 2') == 1
+    assert _eval('10-3+2') == 9
+
+
+def test_operator_precedence():
+    node = DSLParser()._parse_expression('1 + 2 > 2 and x == 3 or y')
+    assert node.op == 'or'
+    assert node.left.op == 'and'
+    assert node.left.left.op == '>'
+    assert _eval('1 + 2 * 3 - 4') == 3
+    assert _eval('a or b and c', a=False, b=True, c=False) is False
+
+
+def test_unary_minus_is_not_split():
+    assert _eval('x * -1', x=3) == -3
+    assert _eval('-2 + y', y=1) == -1
+    assert _eval('x - -1', x=3) == 4
+    assert repr(DSLParser()._parse_expression('x * -1')) == '(x * -1.0)'
+
+
+def test_scientific_notation_exponent_sign_is_not_split():
+    assert _eval('1e-3 + 2') == 2.001
+    assert _eval('2.5E+2 - 1') == 249
+    # 标识符末尾的 e 不是指数
+    assert _eval('size-1', size=3) == 2
+
+
+def test_parenthesised_operands_and_quoted_operators():
+    assert _eval('(1 + 2) * (3 - 1)') == 6
+    assert _eval('((1 + 2)) * 2') == 6
+    assert _eval('name + "a-b*c"', name='x') == 'xa-b*c'
+    node = DSLParser()._parse_expression('f(1 - 2, 3) - 1')
+    assert node.op == '-' and isinstance(node.left, FunctionCallNode)
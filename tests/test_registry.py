@@ -0,0 +1,113 @@
+import gc
+import os
+
+from dsl_agent.parser import parse_script
+from dsl_agent.registry import ScenarioRegistry
+
+BANK = 'response start.hello->start: "hi v{v}"\n'
+
+
+class FakeIntentService:
+    async def identify(self, text, state, intents):
+        return "hello"
+
+
+def _write(path, text, bump=0):
+    path.write_text(text, encoding="utf-8")
+    if bump:
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + bump))
+
+
+def test_reload_parses_only_changed_files(tmp_path):
+    parsed = []
+
+    def parse(path):
+        parsed.append(os.path.basename(path))
+        return parse_script(path)
+
+    _write(tmp_path / "bank.dsl", BANK.format(v=1))
+    _write(tmp_path / "shop.dsl", 'response start.buy: "ok"\n')
+    reg = ScenarioRegistry(str(tmp_path), parse=parse)
+    assert reg.refresh() == ["bank", "shop"]
+    assert reg.refresh() == []
+
+    parsed.clear()
+    _write(tmp_path / "bank.dsl", BANK.format(v=2), bump=10**9)
+    assert reg.refresh() == ["bank"]
+    assert parsed == ["bank.dsl"]
+    assert reg.get("bank").version == 2
+
+    # touch without content change: hashed but not re-parsed
+    _write(tmp_path / "shop.dsl", 'response start.buy: "ok"\n', bump=2 * 10**9)
+    assert reg.refresh() == []
+
+    (tmp_path / "shop.dsl").unlink()
+    assert reg.refresh() == ["shop"]
+    assert "shop" not in reg
+
+
+def test_sessions_stay_pinned_and_old_versions_are_freed(tmp_path):
+    path = tmp_path / "bank.dsl"
+    _write(path, BANK.format(v=1))
+    reg = ScenarioRegistry(str(tmp_path))
+    reg.refresh()
+    old = reg.open_session("bank", FakeIntentService())
+
+    _write(path, BANK.format(v=2), bump=10**9)
+    reg.refresh()
+    new = reg.open_session("bank", FakeIntentService())
+    assert old.process_input("x") == "hi v1"
+    assert new.process_input("x") == "hi v2"
+    assert reg.retired_alive() == 1
+
+    del old
+    gc.collect()
+    assert reg.retired_alive() == 0
+
+
+def test_parse_error_keeps_previous_version(tmp_path):
+    path = tmp_path / "bank.dsl"
+    _write(path, BANK.format(v=1))
+
+    def parse(p):
+        if "broken" in open(p, encoding="utf-8").read():
+            raise ValueError("bad script")
+        return parse_script(p)
+
+    reg = ScenarioRegistry(str(tmp_path), parse=parse)
+    reg.refresh()
+    _write(path, "broken", bump=10**9)
+    assert reg.refresh() == []
+    assert reg.get("bank").version == 1
+    assert "bank" in reg.errors
+
+
+def test_reverting_a_broken_file_clears_its_error(tmp_path):
+    path = tmp_path / "bank.dsl"
+    _write(path, BANK.format(v=1))
+    reg = ScenarioRegistry(str(tmp_path))
+    reg.refresh()
+    _write(path, "if x {\n  y = 1\n", bump=10**9)
+    reg.refresh()
+    assert "bank" in reg.errors
+    _write(path, BANK.format(v=1), bump=2 * 10**9)
+    assert reg.refresh() == []
+    assert reg.errors == {}
+    assert reg.get("bank").version == 1
+
+
+def test_default_parser_uses_the_hashed_bytes(tmp_path, monkeypatch):
+    path = tmp_path / "bank.dsl"
+    _write(path, BANK.format(v=1))
+    reg = ScenarioRegistry(str(tmp_path))
+    read_text = type(path).read_text
+
+    def racing_read_text(self, *args, **kwargs):
+        # 模拟在计算摘要之后、解析之前文件被再次修改
+        self.write_text(BANK.format(v=9), encoding="utf-8")
+        return read_text(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(path), "read_text", racing_read_text)
+    reg.refresh()
+    assert reg.open_session("bank", FakeIntentService()).process_input("x") == "hi v1"
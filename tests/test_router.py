@@ -0,0 +1,56 @@
+import asyncio
+
+from dsl_agent.LLM_integration import LLMIntentService, StubIntentService
+from dsl_agent.registry import ScenarioRegistry
+from dsl_agent.router import ScenarioRouter
+
+
+class FakeIntentService:
+    def __init__(self, label):
+        self.label = label
+
+    async def identify(self, text, state, intents):
+        return self.label
+
+
+def _registry(tmp_path):
+    (tmp_path / "banking.dsl").write_text('response start.balance: "余额 100"\n', encoding="utf-8")
+    (tmp_path / "weather.dsl").write_text('response start.today: "晴"\n', encoding="utf-8")
+    reg = ScenarioRegistry(str(tmp_path))
+    reg.refresh()
+    return reg
+
+
+def test_routes_by_keyword_and_falls_back_to_default(tmp_path):
+    classifier = StubIntentService(mapping={"router": {"天气": "weather", "余额": "banking"}})
+    created = []
+
+    def factory(name):
+        created.append(name)
+        return FakeIntentService({"weather": "today", "banking": "balance"}[name])
+
+    router = ScenarioRouter(_registry(tmp_path), classifier, factory, default_scenario="banking")
+
+    name, bot = asyncio.run(router.open_session("今天天气怎么样"))
+    assert name == "weather"
+    assert bot.process_input("今天天气怎么样") == "晴"
+
+    name, bot = asyncio.run(router.open_session("随便聊聊"))
+    assert name == "banking"
+    asyncio.run(router.open_session("查余额"))
+    # one service per scenario, reused across sessions
+    assert created == ["weather", "banking"]
+
+
+def test_unroutable_without_default(tmp_path):
+    router = ScenarioRouter(_registry(tmp_path), FakeIntentService("unknown"), lambda n: FakeIntentService(None))
+    assert asyncio.run(router.open_session("hi")) == (None, None)
+
+
+def test_for_scenario_shares_client_and_admission():
+    client = object()
+    base = LLMIntentService(api_base="", api_key="", model="m", client=client, admission="shared")
+    svc = base.for_scenario(intent_descriptions={"a": "desc"})
+    assert svc.client is client
+    assert svc.admission == "shared"
+    assert svc.intent_descriptions == {"a": "desc"}
@@ -0,0 +1,60 @@
+import asyncio
+import types
+
+import pytest
+
+from dsl_agent.LLM_integration import LLMIntentService
+from dsl_agent.routing import Endpoint, EndpointPool
+
+
+def _resp(content):
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))])
+
+
+class FakeClient:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.models = []
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, model, messages, max_tokens, temperature, timeout=15.0):
+        self.models.append(model)
+        if self.fail:
+            raise ConnectionError(f"{self.name} down")
+        return _resp("ask_order")
+
+
+def test_least_outstanding_prefers_idle_endpoint():
+    a, b = Endpoint("a", FakeClient("a")), Endpoint("b", FakeClient("b"))
+    pool = EndpointPool([a, b])
+    first = pool.select()
+    second = pool.select()
+    assert {first.name, second.name} == {"a", "b"}
+
+
+def test_failing_endpoint_is_ejected_and_recovers():
+    now = [0.0]
+    bad, good = FakeClient("bad", fail=True), FakeClient("good")
+    slow = Endpoint("good", good, model="region-model")
+    slow.ewma_latency = 5.0  # 初始时更偏好 bad 端点
+    pool = EndpointPool([Endpoint("bad", bad), slow], failure_threshold=2, base_ejection=10.0, clock=lambda: now[0])
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            pool.create(model="m", messages=[], max_tokens=8, temperature=0.0)
+    assert pool.stats()["bad"]["available"] is False
+
+    for _ in range(3):
+        pool.create(model="m", messages=[], max_tokens=8, temperature=0.0)
+    assert good.models == ["region-model"] * 3
+    assert pool.stats()["good"]["outstanding"] == 0
+
+    now[0] = 11.0
+    assert pool.stats()["bad"]["available"] is True
+
+
+def test_pool_plugs_into_intent_service():
+    pool = EndpointPool([Endpoint("a", FakeClient("a")), Endpoint("b", FakeClient("b"))], strategy="ewma")
+    svc = LLMIntentService(api_base="http://example", api_key="k", model="m", client=pool)
+    assert asyncio.run(svc.identify("hi", "routing", ["ask_order"])) == "ask_order"
+    assert sum(s["requests"] for s in pool.stats().values()) == 1
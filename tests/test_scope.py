@@ -0,0 +1,44 @@
+from dsl_agent.compiled import CompiledScenario, write_compiled
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.parser import parse_script
+from dsl_agent.scope import Scope
+
+SCRIPT = """
+city = user_input
+response start.ask_city->confirm: "好的，查询 {city} 的天气"
+count = 1
+response confirm.yes: "已为您查询 {city}（第 {count} 次），您说的是 {user_input}"
+"""
+
+
+def test_scope_layers_and_turn_reset():
+    scope = Scope(builtins={"svc": "service"})
+    scope.begin_turn("hello", "start", ["a"])
+    scope["x"] = 1
+    scope["user_input"] = "rewritten"
+    assert scope["x"] == 1 and scope["svc"] == "service"
+    assert scope.locals["user_input"] == "rewritten"
+    assert scope["variables"] is scope.variables
+    scope.begin_turn("next", "start", ["a"])
+    assert scope["x"] == 1
+    assert scope["user_input"] == "next"
+    assert "missing" not in scope and scope.get("missing") is None
+
+
+def test_assignments_carry_values_between_states(make_bot):
+    bot = make_bot(SCRIPT)
+    assert len(bot.scenario.get_state("start").intents["ask_city"].actions) == 1
+
+    scope = bot.scope
+    assert bot.process_input("北京") == "好的，查询 北京 的天气"
+    assert bot.process_input("是的") == "已为您查询 北京（第 1.0 次），您说的是 是的"
+    assert bot.scope is scope
+    bot.reset()
+    assert bot.scope.variables == {}
+
+
+def test_compiled_scenario_keeps_actions(tmp_path, write_scenario, intent_service):
+    target = tmp_path / "weather.dslc"
+    write_compiled(parse_script(str(write_scenario(SCRIPT))), str(target))
+    bot = Interpreter(CompiledScenario(str(target)), intent_service)
+    assert bot.process_input("上海") == "好的，查询 上海 的天气"
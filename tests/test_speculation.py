@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from dsl_agent.logic import _interpreter_options
+
+SCRIPT = (
+    'response start.default->chat: "欢迎"\n'
+    'response chat.default->chat: llm_generate("Reply to: " + user_input)\n'
+    'response chat.bye: "再见"\n'
+)
+
+
+class SlowService:
+    def __init__(self, intent=None, delay=0.2):
+        self.intent = intent
+        self.delay = delay
+        self.identified = 0
+        self.generated = []
+        self.cancelled = 0
+
+    async def identify(self, text, state, intents):
+        self.identified += 1
+        await asyncio.sleep(self.delay)
+        return self.intent
+
+    async def generate(self, prompt, **kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.generated.append(prompt)
+        return "生成:" + prompt
+
+
+def test_moot_classification_is_skipped(make_bot):
+    svc = SlowService(delay=0)
+    bot = make_bot(SCRIPT, svc, speculative_generation=True)
+    # start 只有一个转换，识别结果不影响本轮
+    assert bot.process_input("你好") == "欢迎"
+    assert svc.identified == 0
+    bot.process_input("聊聊")
+    assert svc.identified == 1
+
+
+def test_default_generation_overlaps_identify(make_bot):
+    svc = SlowService(intent=None)
+    bot = make_bot(SCRIPT, svc, speculative_generation=True)
+    bot.process_input("你好")
+
+    async def turn():
+        started = time.perf_counter()
+        reply = await bot.process_input_async("讲个笑话")
+        return reply, time.perf_counter() - started
+
+    reply, elapsed = asyncio.run(turn())
+    assert reply == "生成:Reply to: 讲个笑话"
+    # 识别与生成并行：约一个往返而不是两个
+    assert elapsed < 0.35
+    assert bot.speculation_stats == {"started": 1, "used": 1, "discarded": 0}
+
+
+def test_speculation_is_discarded_when_intent_differs(make_bot):
+    svc = SlowService(intent="bye", delay=0.05)
+    bot = make_bot(SCRIPT, svc, speculative_generation=True)
+    bot.process_input("你好")
+    assert bot.process_input("拜拜") == "再见"
+    assert bot.speculation_stats["discarded"] == 1
+    assert svc.cancelled == 1 and svc.generated == []
+    assert bot.ended
+
+
+def test_speculation_is_opt_in():
+    assert "speculative_generation" not in _interpreter_options({"dsl_interpreter": {}})
+    assert _interpreter_options({"dsl_interpreter": {"speculative_generation": "true"}})["speculative_generation"]
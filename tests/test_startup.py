@@ -0,0 +1,58 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from dsl_agent.LLM_integration import LLMIntentService
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_cli_import_does_not_load_openai():
+    code = "import sys, dsl_agent.logic; print('openai' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_startup_stays_within_budget(capsys):
+    from benchmarks import startup
+
+    assert startup.main(["--runs", "1", "--top", "0"]) == 0
+    # 预算小到不可能满足时以非零状态退出
+    assert startup.main(["--runs", "1", "--top", "0", "--max-import-ms", "0.001", "--max-prompt-ms", "0"]) == 1
+    assert "startup regression: import dsl_agent.logic" in capsys.readouterr().err
+
+
+def test_default_client_is_built_on_first_use():
+    svc = LLMIntentService(api_base="http://localhost:1", api_key="k", model="m")
+    assert svc._client is None
+    assert svc.client is svc.client
+
+
+def test_concurrent_first_use_builds_one_client(monkeypatch):
+    import threading
+
+    import openai
+
+    built = []
+    barrier = threading.Barrier(8)
+    real = openai.OpenAI
+
+    def counting_client(**kwargs):
+        built.append(kwargs)
+        return real(**kwargs)
+
+    monkeypatch.setattr(openai, "OpenAI", counting_client)
+    svc = LLMIntentService(api_base="http://localhost:1", api_key="k", model="m")
+    seen = []
+
+    def use():
+        barrier.wait()
+        seen.append(svc.client)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(built) == 1
+    assert all(c is seen[0] for c in seen)
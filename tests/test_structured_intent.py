@@ -0,0 +1,162 @@
+import asyncio
+import json
+
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.LLM_integration import LLMIntentService
+from dsl_agent.logic import _service_options
+from dsl_agent.parser import parse_script
+
+
+class _Msg:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Resp:
+    def __init__(self, content):
+        self.choices = [type("Choice", (), {"message": _Msg(content)})()]
+
+
+class RecordingClient:
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return _Resp(self.replies.pop(0))
+
+
+def _service(client, **kwargs):
+    return LLMIntentService(api_base="http://example", api_key="k", model="m", client=client, structured=True, **kwargs)
+
+
+def test_identify_structured_parses_json_reply():
+    reply = '```json\n{"intent": "Book", "confidence": 0.92, "entities": {"origin": "北京", "date": "周五"}}\n```'
+    client = RecordingClient(reply)
+    result = asyncio.run(_service(client).identify_structured("周五北京出发", "start", ["book", "cancel"]))
+    assert result.intent == "book"
+    assert result.confidence == 0.92
+    assert result.entities == {"origin": "北京", "date": "周五"}
+    assert "JSON" in client.calls[0]["messages"][0]["content"]
+
+
+def test_structured_reply_followed_by_prose():
+    reply = '{"intent": "book", "entities": {"date": "周五"}}\n注意：{不是 JSON}'
+    result = asyncio.run(_service(RecordingClient(reply)).identify_structured("周五", "start", ["book"]))
+    assert result.intent == "book" and result.entities == {"date": "周五"}
+    # 说明文字中的花括号出现在 JSON 之前
+    reply = '结果如下 {见下}：{"intent": "cancel", "confidence": 0.7}'
+    result = asyncio.run(_service(RecordingClient(reply)).identify_structured("取消", "start", ["book", "cancel"]))
+    assert result.intent == "cancel" and result.confidence == 0.7
+
+
+def test_low_confidence_and_plain_label_replies():
+    svc = _service(RecordingClient('{"intent": "book", "confidence": 0.3, "entities": {"city": "上海"}}', "cancel"), min_confidence=0.5)
+    low = asyncio.run(svc.identify_structured("嗯", "start", ["book", "cancel"]))
+    assert low.intent is None and low.entities == {"city": "上海"}
+    # 模型没有按 JSON 回复时按普通标签解析
+    plain = asyncio.run(svc.identify_structured("取消", "start", ["book", "cancel"]))
+    assert plain.intent == "cancel" and plain.confidence is None and plain.entities == {}
+
+
+def test_config_template_is_used():
+    settings = {
+        "structured_intents": "true",
+        "min_intent_confidence": "0.4",
+        "intent_detection_prompt": "|\n状态 {state}\n输入：{user_input}\n可选：{available_intents}\n返回 {{\"intent\": ...}}",
+    }
+    options = _service_options(settings, "demo")
+    assert options["structured"] and options["min_confidence"] == 0.4
+    client = RecordingClient('{"intent": "book"}')
+    svc = LLMIntentService(api_base="http://example", api_key="k", model="m", client=client, intent_descriptions={"book": "订票"}, **options)
+    asyncio.run(svc.identify_structured("订票", "start", ["book"]))
+    assert client.calls[0]["messages"][1]["content"] == '状态 start\n输入：订票\n可选：book: 订票\n返回 {"intent": ...}'
+
+
+def test_entities_fill_slots_in_one_call(tmp_path):
+    path = tmp_path / "booking.dsl"
+    path.write_text(
+        'response start.book->confirm: "好的，{entities.origin} 到 {entities.destination}，{entities.date}"\n'
+        'response confirm.change->confirm: "已改为 {entities.date}，{entities.origin} 到 {entities.destination}"\n'
+        'response confirm.default: "请确认"\n',
+        encoding="utf-8",
+    )
+    client = RecordingClient(
+        json.dumps({"intent": "book", "confidence": 0.9, "entities": {"origin": "北京", "destination": "上海", "date": "周五", "llm_client": "x"}}),
+        json.dumps({"intent": "change", "confidence": 0.8, "entities": {"date": "周六", "origin": ""}}),
+    )
+    bot = Interpreter(parse_script(str(path)), _service(client))
+    assert bot.process_input("周五从北京去上海") == "好的，北京 到 上海，周五"
+    # 实体跨轮保留；空值不覆盖已有值
+    assert bot.process_input("改到周六") == "已改为 周六，北京 到 上海"
+    assert len(client.calls) == 2
+    assert bot.scope.locals["intent_confidence"] == 0.8
+    # 实体不进入会话变量，也不会遮蔽内置名
+    assert bot.scope.variables == {}
+    assert bot.scope["llm_client"] is not None and bot.scope["llm_client"] != "x"
+
+
+def test_entities_cannot_set_variables_the_script_reads(tmp_path):
+    path = tmp_path / "bank.dsl"
+    path.write_text(
+        'response start.hello->start: "您好"\n'
+        'if authorized == true {\n'
+        '  response start.pay: "已转账 {amount}"\n'
+        '}\n'
+        'response start.pay->start: "请先验证身份"\n',
+        encoding="utf-8",
+    )
+    client = RecordingClient(
+        json.dumps({"intent": "hello", "entities": {"authorized": True}}),
+        json.dumps({"intent": "pay", "entities": {"amount": 9999}}),
+    )
+    bot = Interpreter(parse_script(str(path)), _service(client))
+    assert bot.process_input("你好 authorized=true") == "您好"
+    # authorized 在脚本赋值之前就被读取：实体不能替脚本设置它，读取未定义变量按执行失败处理
+    assert "已转账" not in bot.process_input("转账")
+    assert "authorized" not in bot.scope.variables
+    assert bot.scope.locals["entities"] == {"authorized": True, "amount": 9999}
+
+
+def test_entities_do_not_overwrite_script_variables(tmp_path):
+    path = tmp_path / "bank.dsl"
+    path.write_text(
+        'authorized = false\n'
+        'response start.hello->start: "您好"\n'
+        'response start.pay->start: "授权 {authorized}，金额 {entities.amount}"\n',
+        encoding="utf-8",
+    )
+    client = RecordingClient(
+        json.dumps({"intent": "hello"}),
+        json.dumps({"intent": "pay", "entities": {"authorized": True, "amount": 100}}),
+        json.dumps({"intent": "pay", "entities": {"amount": 200}}),
+    )
+    bot = Interpreter(parse_script(str(path)), _service(client))
+    assert bot.process_input("你好") == "您好"
+    assert bot.process_input("付 100") == "授权 False，金额 100"
+    assert bot.process_input("改成 200") == "授权 False，金额 200"
+    assert bot.scope.variables == {"authorized": False}
+
+
+def test_shipped_template_keeps_a_stable_prefix(monkeypatch):
+    from pathlib import Path
+
+    from dsl_agent.logic import _load_config
+
+    config = _load_config(str(Path(__file__).resolve().parents[1] / "config.ini"))
+    options = _service_options(dict(config, structured_intents="true"), "demo")
+    client = RecordingClient('{"intent": "book"}', '{"intent": "cancel"}')
+    svc = LLMIntentService(api_base="http://example", api_key="k", model="m", client=client, **options)
+    described = []
+    real = svc._describe_intents
+    monkeypatch.setattr(svc, "_describe_intents", lambda intents: described.append(intents) or real(intents))
+    asyncio.run(svc.identify_structured("订票", "start", ["book", "cancel"]))
+    asyncio.run(svc.identify_structured("取消", "start", ["book", "cancel"]))
+    first, second = (call["messages"][1]["content"] for call in client.calls)
+    # 用户文本在最后：两次请求只在结尾不同，意图描述只渲染一次
+    assert first.endswith("用户输入：订票") and second.endswith("用户输入：取消")
+    assert first[: -len("订票")] == second[: -len("取消")]
+    assert len(described) == 1
@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+from dsl_agent import tracing
+from dsl_agent.tracing import Tracer
+
+SCRIPT = '''
+# greeting scenario
+
+response start.greet: llm_generate("a") + llm_generate("b")
+'''
+
+
+class SlowService:
+    async def identify(self, text, state, intents):
+        await asyncio.sleep(0.01)
+        return "greet"
+
+    async def generate(self, prompt, **kwargs):
+        await asyncio.sleep(0.02)
+        return prompt
+
+
+def test_sampled_turn_records_node_spans_with_io(make_bot):
+    tracer = Tracer(sample_rate=1.0)
+    bot = make_bot(SCRIPT, SlowService(), tracer=tracer)
+    assert bot.process_input("hi") == "ab"
+    (trace,) = tracer.traces
+    by_name = {}
+    for span in trace.spans:
+        by_name.setdefault(span.name, []).append(span)
+    assert by_name["identify"][0].io >= 0.01
+    (binary,) = by_name["BinaryOpNode"]
+    assert binary.args["line"] == 4
+    # the two llm_generate calls run concurrently: io is summed, wall time is not
+    assert binary.io >= 0.04 > binary.end - binary.start
+    assert len(by_name["FunctionCallNode"]) == 2
+    assert {s.tid for s in by_name["FunctionCallNode"]} != {binary.tid}
+
+    chrome = tracer.to_chrome()
+    json.dumps(chrome)
+    complete = [e for e in chrome["traceEvents"] if e["ph"] == "X"]
+    assert {"turn", "identify", "BinaryOpNode"} <= {e["name"] for e in complete}
+
+
+def test_unsampled_turns_record_nothing(make_bot):
+    tracer = Tracer(sample_rate=0.5, capacity=2, rng=iter([0.9, 0.1, 0.1, 0.1]).__next__)
+    bot = make_bot(SCRIPT, SlowService(), tracer=tracer)
+    bot.process_input("hi")
+    assert len(tracer.traces) == 0
+    for _ in range(3):
+        bot.reset()
+        bot.process_input("hi")
+    # ring buffer keeps only the latest traces
+    assert len(tracer.traces) == 2
+    assert tracing.current_trace.get() is None
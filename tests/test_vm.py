@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from dsl_agent.compiled import CompiledScenario, write_compiled
+from dsl_agent.interpreter import Interpreter
+from dsl_agent.parser import DSLParser, parse_script
+from dsl_agent.scope import Scope
+from dsl_agent.vm import JUMP, JUMP_IF_FALSE, ExecutionLimitError, compile_program
+
+SCRIPT = """
+count = 0
+while count < 3 {
+    count = count + 1
+}
+if user_input == "vip" {
+    response start.vip: "尊贵的客户，您好"
+} else if count == 3 {
+    tier = "normal"
+} else {
+    tier = "none"
+}
+response start.ask->start: "等级 {tier}，计数 {count}"
+"""
+
+
+def test_parser_builds_nested_blocks():
+    nodes = DSLParser().parse(SCRIPT)
+    assert [type(n).__name__ for n in nodes] == [
+        "AssignmentNode",
+        "WhileNode",
+        "IfNode",
+        "ResponseNode",
+    ]
+    branch = nodes[2]
+    assert branch.line == 6
+    assert type(branch.else_block[0]).__name__ == "IfNode"
+    assert branch.else_block[0].else_block[0].line == 11
+
+
+def test_parser_rejects_unclosed_block():
+    with pytest.raises(SyntaxError):
+        DSLParser().parse("if x {\n  y = 1\n")
+    with pytest.raises(SyntaxError):
+        DSLParser().parse("}\n")
+
+
+def test_comparison_operators_are_not_split():
+    parser = DSLParser()
+    assert parser._parse_expression("a == b").op == "=="
+    assert parser._parse_expression("x >= -1").op == ">="
+    node = parser._parse_expression("a - b - c")
+    assert node.op == "-" and node.left.op == "-"
+
+
+def test_program_is_flat_with_jumps():
+    nodes = DSLParser().parse(SCRIPT)
+    program = compile_program(nodes[:3])
+    ops = [op for op, _, _ in program.code]
+    assert ops.count(JUMP_IF_FALSE) == 3
+    assert JUMP in ops
+    assert all(0 <= target <= len(program) for op, _, target in program.code if op != 0)
+
+
+def test_budgets_are_enforced():
+    nodes = DSLParser().parse("while true {\n  x = 1\n}\n")
+    scope = Scope()
+    with pytest.raises(ExecutionLimitError):
+        asyncio.run(compile_program(nodes).run(scope, max_steps=50))
+
+    nested = DSLParser().parse("if a {\n  if b {\n    x = 1\n  }\n}\n")
+    compile_program(nested, max_depth=3)
+    with pytest.raises(ExecutionLimitError):
+        compile_program(nested, max_depth=2)
+
+
+def test_branching_uses_session_variables_without_llm(make_bot, intent_service):
+    bot = make_bot(SCRIPT, max_execution_steps=100)
+
+    assert asyncio.run(bot.process_input_async("hello")) == "等级 normal，计数 3.0"
+    # 块内的 response 覆盖转换的回复
+    assert asyncio.run(bot.process_input_async("vip")) == "尊贵的客户，您好"
+    assert intent_service.calls == 2
+
+
+def test_blocks_survive_compilation(tmp_path, write_scenario, intent_service):
+    target = tmp_path / "blocks.dslc"
+    write_compiled(parse_script(str(write_scenario(SCRIPT))), str(target))
+    compiled = CompiledScenario(str(target))
+    try:
+        bot = Interpreter(compiled, intent_service)
+        assert asyncio.run(bot.process_input_async("hello")) == "等级 normal，计数 3.0"
+    finally:
+        compiled.close()
+
+
+def test_block_responses_fill_placeholders(make_bot):
+    bot = make_bot(
+        'amount = 100\n'
+        'if amount > 50 {\n'
+        '    response start.pay: "已转账 {amount}，{user_input}"\n'
+        '}\n'
+        'response start.pay->start: "金额过小"\n',
+        max_execution_steps=100,
+    )
+    assert asyncio.run(bot.process_input_async("转账")) == "已转账 100.0，转账"
+
+
+def test_runaway_loop_stops_without_configured_budget(make_bot):
+    bot = make_bot("x = 0\nwhile true {\n    x = x + 1\n}\nresponse start.ask: \"done\"\n")
+    # 默认指令数上限终止死循环，本轮按执行失败返回空回复
+    assert asyncio.run(bot.process_input_async("hi")) == ""
+    assert bot.scope["x"] < 10000
+
+
+def test_unbounded_loop_still_yields_to_deadline():
+    nodes = DSLParser().parse("while true {\n  x = 1\n}\n")
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(compile_program(nodes).run(Scope(), max_steps=0), timeout=0.05)
+
+    asyncio.run(main())
+
+
+def test_over_deep_blocks_are_rejected_when_the_scenario_is_built(write_scenario):
+    from dsl_agent.incremental import IncrementalParser
+
+    text = 'x = 1\nif a {\n    while b {\n        x = 2\n    }\n}\nresponse start.ask: "ok"\n'
+    path = str(write_scenario(text))
+    assert parse_script(path, max_depth=3).get_state("start").default.response == "ok"
+    with pytest.raises(SyntaxError, match="line 2: block nesting exceeds max_execution_depth=2"):
+        parse_script(path, max_depth=2)
+    with pytest.raises(SyntaxError, match="max_execution_depth=2"):
+        IncrementalParser(max_depth=2)(path)
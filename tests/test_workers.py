@@ -0,0 +1,104 @@
+import functools
+import os
+import time
+
+import pytest
+
+from dsl_agent.registry import ScenarioRegistry
+from dsl_agent.router import ScenarioRouter
+from dsl_agent.workers import WorkerError, WorkerPool
+
+
+class CrashingIntentService:
+    async def identify(self, text, state, intents):
+        if text == "crash":
+            os._exit(3)
+        return "count"
+
+
+def build_router(directory):
+    registry = ScenarioRegistry(directory)
+    registry.refresh()
+    return ScenarioRouter(registry, CrashingIntentService(), lambda name: CrashingIntentService(), default_scenario="counter")
+
+
+def _pool(tmp_path, **kwargs):
+    (tmp_path / "counter.dsl").write_text(
+        'response start.count->second: "one"\nresponse second.count: "two"\n', encoding="utf-8"
+    )
+    return WorkerPool(functools.partial(build_router, str(tmp_path)), **kwargs)
+
+
+def test_sessions_are_sticky_to_one_worker(tmp_path):
+    with _pool(tmp_path, num_workers=2, health_interval=60) as pool:
+        results = {sid: pool.handle(sid, "go", timeout=30) for sid in ("a", "b", "c")}
+        assert all(r["reply"] == "one" and r["scenario"] == "counter" for r in results.values())
+        # second turn continues the same conversation on the same worker
+        second = pool.handle("a", "go", timeout=30)
+        assert second["reply"] == "two" and second["ended"]
+        assert {pool.worker_for(s) for s in ("a", "b", "c")} <= {0, 1}
+
+
+def test_crashed_worker_is_restarted(tmp_path):
+    with _pool(tmp_path, num_workers=1, health_interval=0.1) as pool:
+        assert pool.handle("s1", "go", timeout=30)["reply"] == "one"
+        with pytest.raises(WorkerError):
+            pool.handle("s1", "crash", timeout=30)
+        deadline = time.monotonic() + 30
+        while pool.restarts == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.restarts == 1
+        # the session died with the worker and starts over
+        assert pool.handle("s1", "go", timeout=30)["reply"] == "one"
+
+
+def test_idle_sessions_are_swept(tmp_path):
+    with _pool(tmp_path, num_workers=1, health_interval=60, session_ttl=0.2) as pool:
+        assert pool.handle("idle", "go", timeout=30)["reply"] == "one"
+        time.sleep(0.6)
+        # the abandoned session was dropped; the next message starts over
+        assert pool.handle("idle", "go", timeout=30)["reply"] == "one"
+        assert pool._send(0, "ping").result(30)["sessions"] == 1
+
+
+class LoggingIntentService:
+    async def identify(self, text, state, intents):
+        import logging
+
+        logging.getLogger("dsl_agent.test_worker").info("worker pid=%s saw %s", os.getpid(), text)
+        return "count"
+
+
+def build_logging_router(directory):
+    registry = ScenarioRegistry(directory)
+    registry.refresh()
+    return ScenarioRouter(registry, LoggingIntentService(), lambda name: LoggingIntentService(), default_scenario="counter")
+
+
+def test_worker_log_records_reach_the_parent_handlers(tmp_path):
+    import logging
+
+    (tmp_path / "counter.dsl").write_text('response start.count: "one"\n', encoding="utf-8")
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(record)
+
+    root = logging.getLogger()
+    handler, level = Collect(), root.level
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    try:
+        pool = WorkerPool(functools.partial(build_logging_router, str(tmp_path)), num_workers=1, health_interval=60)
+        with pool:
+            assert pool.handle("s", "hello", timeout=30)["reply"] == "one"
+            pid = pool.stats()[0]["pid"]
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(level)
+    messages = {r.getMessage() for r in records if r.name == "dsl_agent.test_worker"}
+    # 路由分类与解释器各调用一次 identify
+    assert messages == {f"worker pid={pid} saw hello"}
+    # 解释器的逐轮结构化记录同样被转发
+    assert any(isinstance(getattr(r, "turn", None), dict) for r in records)